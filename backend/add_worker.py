@@ -14,7 +14,7 @@ by the application.
 import os
 import sys
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from utils.db import get_client
 from datetime import datetime
 import bcrypt
 import getpass
@@ -58,12 +58,7 @@ def connect_db():
         sys.exit(1)
 
     try:
-        client = MongoClient(
-            mongo_uri,
-            tls=True,
-            tlsAllowInvalidCertificates=True,
-            serverSelectionTimeoutMS=8000,
-        )
+        client = get_client()
         client.admin.command("ping")
         db = client.get_database()
         print(f"✅ Connected to MongoDB: {db.name}\n")
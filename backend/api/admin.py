@@ -1,147 +1,184 @@
 from flask import Flask, Blueprint, request, jsonify, current_app, url_for
 from bson.objectid import ObjectId
-from datetime import datetime, timedelta
-from utils.auth_middleware import admin_required
+from datetime import datetime
+from utils.auth_middleware import admin_required, revoke_tokens
 from utils.notifications import send_thank_you_notifications, send_status_change_notification, send_ticket_resolved_notification, send_ticket_escalation_notification, send_feedback_request
 from utils.rewards import award_points
+from utils.pagination import InvalidCursor, keyset_sort, paginate, parse_limit, parse_order
+from utils.enrichment import enrich_complaints
+from utils.projections import complaint_projection
+from utils.streaming import stream_requested, stream_response
+from utils.etags import list_etag, not_modified, with_etag
+from utils.stats_counters import read_counters, reconcile_counters
+from utils.complaint_writes import complaint_written, complaints_written, comment_added
+from utils.rollups import backfill_rollups, parse_range_days, range_stats
+from utils.jobs import format_job, get_job, start_job
+from utils.escalation import escalation_deadline
 from werkzeug.security import generate_password_hash
 
 admin_bp = Blueprint('admin', __name__)
 
-# Helper function to format complaint for response
-def format_complaint(complaint):
-    if not complaint:
+def _list_param(name):
+    values = [v.strip() for v in request.args.get(name, '').split(',') if v.strip()]
+    if not values:
         return None
-    
-    # Convert ObjectId to string for JSON serialization
-    complaint['_id'] = str(complaint['_id'])
-    
-    # Convert user_id to string if it exists
-    if 'user_id' in complaint:
-        complaint['user_id'] = str(complaint['user_id'])
-    
-    # Convert assigned_to to string if it exists
-    if 'assigned_to' in complaint and complaint['assigned_to']:
-        complaint['assigned_to'] = str(complaint['assigned_to'])
-    
-    # Format dates for JSON serialization
-    for date_field in ['createdAt', 'updatedAt', 'assignedAt', 'inProgressAt', 'resolvedAt', 'escalatedAt']:
-        if date_field in complaint and complaint[date_field]:
-            complaint[date_field] = complaint[date_field].isoformat()
-    
-    # Format comments if they exist
-    if 'comments' in complaint and complaint['comments']:
-        for comment in complaint['comments']:
-            if '_id' in comment:
-                comment['_id'] = str(comment['_id'])
-            if 'user_id' in comment:
-                comment['user_id'] = str(comment['user_id'])
-            if 'createdAt' in comment:
-                comment['createdAt'] = comment['createdAt'].isoformat()
-    
-    return complaint
+    return values[0] if len(values) == 1 else {'$in': values}
+
+
+def _date_param(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO 8601 date')
+
+
+def build_complaint_filter():
+    """
+    MongoDB filter from the complaint list query string.
+
+    status, category and priority accept comma-separated values;
+    assigned_to is a user id or "none" for unassigned complaints; from/to
+    bound createdAt (from inclusive, to exclusive).
+    """
+    query = {}
+    for field in ('status', 'category', 'priority'):
+        condition = _list_param(field)
+        if condition is not None:
+            query[field] = condition
+
+    assigned_to = request.args.get('assigned_to')
+    if assigned_to:
+        if assigned_to == 'none':
+            query['assigned_to'] = None
+        elif ObjectId.is_valid(assigned_to):
+            query['assigned_to'] = ObjectId(assigned_to)
+        else:
+            raise ValueError('assigned_to must be a user id or "none"')
+
+    created_from, created_to = _date_param('from'), _date_param('to')
+    if created_from or created_to:
+        query['createdAt'] = {}
+        if created_from:
+            query['createdAt']['$gte'] = created_from
+        if created_to:
+            query['createdAt']['$lt'] = created_to
+    return query
+
 
 @admin_bp.route('/complaints', methods=['GET'])
 @admin_required
 def get_all_complaints(current_user):
+    """
+    One page of complaints, newest first (order=asc for oldest first).
+
+    Query parameters: status, category, priority, assigned_to, from, to
+    (see build_complaint_filter), order, limit (default 50, max 200) and
+    cursor (the next_cursor of the previous page, fetched with the same
+    filter and order). view/fields select the projection (see
+    utils.projections; default "summary").
+
+    With Accept: application/x-ndjson or ?stream=1 every matching complaint
+    is streamed instead (limit and cursor are ignored).
+    """
     db = current_app.config['db']
 
-    # Get all complaints
-    all_complaints = list(db.complaints.find().sort('createdAt', -1))
+    if stream_requested():
+        try:
+            query = build_complaint_filter()
+            order = parse_order(request.args.get('order'))
+            projection = complaint_projection(request.args)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        cursor = db.complaints.find(query, projection).sort(keyset_sort(order))
+        return stream_response(cursor, transform=lambda batch: enrich_complaints(db, batch))
+
+    try:
+        query = build_complaint_filter()
+        order = parse_order(request.args.get('order'))
+        limit = parse_limit(request.args.get('limit'))
+        projection = complaint_projection(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Any change to the filtered set changes the ETag of every page of it
+    etag = list_etag(db.complaints, query, order)
+    cached = not_modified(etag)
+    if cached:
+        return cached
 
-    # Enrich with assignedTo worker name before formatting
-    for complaint in all_complaints:
-        if complaint.get('assigned_to'):
-            worker = db.users.find_one(
-                {'_id': complaint['assigned_to']},
-                {'name': 1, 'email': 1}
-            )
-            if worker:
-                complaint['assignedTo'] = {
-                    'name': worker.get('name', 'Unknown'),
-                    'email': worker.get('email', ''),
-                    'id': str(worker['_id'])
-                }
+    try:
+        all_complaints, next_cursor = paginate(db.complaints, query, limit, request.args.get('cursor'), projection, order)
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
 
-    # Format complaints for response (converts ObjectIds to strings)
-    formatted_complaints = [format_complaint(complaint) for complaint in all_complaints]
+    # Enrich with assignedTo worker name (one users query per page)
+    enrich_complaints(db, all_complaints)
 
-    return jsonify(formatted_complaints)
+    # ObjectIds and datetimes are serialized by the app's JSON provider
+    return with_etag(jsonify({'complaints': all_complaints, 'next_cursor': next_cursor}), etag)
 
 
 
 @admin_bp.route('/stats', methods=['GET'])
 @admin_required
 def get_admin_stats(current_user):
+    """
+    Dashboard statistics. ``days`` (default 30, max 366) sets the range of
+    the timeline and of the ``range`` totals (created/resolved/escalated,
+    average resolution time and resolution-time histogram).
+    """
     db = current_app.config['db']
     
-    # Get counts for different status types
-    total = db.complaints.count_documents({})
-    pending = db.complaints.count_documents({'status': 'pending'})
-    in_progress = db.complaints.count_documents({'status': 'in-progress'})
-    resolved = db.complaints.count_documents({'status': 'resolved'})
-    escalated = db.complaints.count_documents({'status': 'escalated'})
-    
-    # Get counts by category
-    pipeline = [
-        {'$group': {'_id': '$category', 'count': {'$sum': 1}}}
-    ]
-    category_results = list(db.complaints.aggregate(pipeline))
-    category_counts = {item['_id']: item['count'] for item in category_results}
-    
-    # Get timeline data (complaints per day for the last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    
-    pipeline = [
-        {'$match': {'createdAt': {'$gte': thirty_days_ago}}},
-        {'$group': {
-            '_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$createdAt'}},
-            'count': {'$sum': 1}
-        }},
-        {'$sort': {'_id': 1}}
-    ]
-    
-    timeline_results = list(db.complaints.aggregate(pipeline))
-    
-    # Format timeline data
-    timeline = [{'date': item['_id'], 'count': item['count']} for item in timeline_results]
+    try:
+        days = parse_range_days(request.args.get('days'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Get user count
-    user_count = db.users.count_documents({'is_admin': False})
-    
-    # Get average resolution time (in hours)
-    pipeline = [
-        {'$match': {'status': 'resolved', 'resolvedAt': {'$exists': True}}},
-        {'$project': {
-            'resolution_time': {
-                '$divide': [
-                    {'$subtract': ['$resolvedAt', '$createdAt']},
-                    3600000  # Convert milliseconds to hours
-                ]
-            }
-        }},
-        {'$group': {
-            '_id': None,
-            'avg_resolution_time': {'$avg': '$resolution_time'}
-        }}
-    ]
+    # Status, category and resolution-time totals are kept up to date by the
+    # complaint write paths (see utils/stats_counters.py): one document read
+    stats = read_counters(db)
     
-    resolution_time_result = list(db.complaints.aggregate(pipeline))
-    avg_resolution_time = resolution_time_result[0]['avg_resolution_time'] if resolution_time_result else 0
+    # Timeline and range totals from the daily rollups (utils/rollups.py)
+    stats['range'] = range_stats(db, days)
+    stats['timeline'] = stats['range'].pop('timeline')
     
-    return jsonify({
-        'statusCounts': {
-            'total': total,
-            'pending': pending,
-            'inProgress': in_progress,
-            'resolved': resolved,
-            'escalated': escalated
-        },
-        'categoryCounts': category_counts,
-        'timeline': timeline,
-        'userCount': user_count,
-        'avgResolutionTime': round(avg_resolution_time, 2)
-    })
+    # Get user count
+    stats['userCount'] = db.users.count_documents({'is_admin': False})
+    
+    return jsonify(stats)
+
+@admin_bp.route('/stats/reconcile', methods=['POST'])
+@admin_required
+def reconcile_stats(current_user):
+    """
+    Recompute the dashboard counters from the complaints collection and
+    report which counters had drifted. The daily rollups are corrected by a
+    background job (GET /api/admin/jobs/<job_id>); a correction already
+    running is reused.
+    """
+    db = current_app.config['db']
+    report = reconcile_counters(db)
+    job, _ = start_job(
+        current_app._get_current_object(),
+        'rollups_backfill',
+        lambda db, checkpoint: backfill_rollups(db),
+        key='rollups_backfill',
+        requested_by=ObjectId(current_user['id'])
+    )
+    report['rollupsJob'] = {'job_id': str(job['_id']), 'status': job['status']}
+    return jsonify(report)
+
+@admin_bp.route('/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_job_status(current_user, job_id):
+    """Status, progress and result of a background job"""
+    job = get_job(current_app.config['db'], job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(format_job(job))
 
 @admin_bp.route('/complaints/<complaint_id>/manage', methods=['PUT'])
 @admin_required
@@ -185,6 +222,10 @@ def manage_complaint(current_user, complaint_id):
         except:
             return jsonify({'error': 'Invalid assigned_to ID'}), 400
     
+    # A priority change moves the escalation deadline
+    if 'priority' in update_data and update_data['priority'] != complaint.get('priority'):
+        update_data['escalateAt'] = escalation_deadline(dict(complaint, priority=update_data['priority']))
+    
     # Add updated timestamp
     update_data['updatedAt'] = datetime.utcnow()
     
@@ -193,6 +234,7 @@ def manage_complaint(current_user, complaint_id):
         {'_id': complaint_obj_id},
         {'$set': update_data}
     )
+    complaint_written(db, complaint, dict(complaint, **update_data))
     
     # Send notifications for status changes
     if new_status and new_status != current_status:
@@ -290,26 +332,21 @@ def manage_complaint(current_user, complaint_id):
         # Add comment to complaint
         db.complaints.update_one(
             {'_id': complaint_obj_id},
-            {'$push': {'comments': system_comment}}
+            {
+                '$push': {'comments': system_comment},
+                '$set': {'updatedAt': system_comment['createdAt']}
+            }
         )
+        comment_added(db)
     # Get the updated complaint
     updated_complaint = db.complaints.find_one({'_id': complaint_obj_id})
     
     # If complaint has assigned_to, get the agent details
-    if 'assigned_to' in updated_complaint and updated_complaint['assigned_to']:
-        agent = db.users.find_one({'_id': updated_complaint['assigned_to']})
-        if agent:
-            updated_complaint['assignedTo'] = {
-                'name': agent['name'],
-                'email': agent['email']
-            }
-    
-    # Format complaint for response
-    formatted_complaint = format_complaint(updated_complaint)
+    enrich_complaints(db, [updated_complaint])
     
     return jsonify({
         'message': 'Complaint updated successfully',
-        'complaint': formatted_complaint
+        'complaint': updated_complaint
     }), 200
 
 
@@ -321,8 +358,8 @@ def get_workers(current_user):
     workers = list(db.users.find({'$or': [{'role': 'worker'}, {'is_worker': True}]}, {'password': 0}))
     
     formatted_workers = [{
-        'id': str(worker['_id']),
-        '_id': str(worker['_id']),
+        'id': worker['_id'],
+        '_id': worker['_id'],
         'name': worker.get('name', 'Unknown'),
         'email': worker.get('email', ''),
         'skills': worker.get('skills', []),
@@ -330,7 +367,7 @@ def get_workers(current_user):
         'is_worker': True,
         'role': 'worker',
         'is_active': worker.get('is_active', worker.get('active', True)),
-        'createdAt': worker.get('createdAt', datetime.utcnow()).isoformat() if worker.get('createdAt') else None
+        'createdAt': worker.get('createdAt')
     } for worker in workers]
     
     return jsonify(formatted_workers)
@@ -400,6 +437,8 @@ def update_worker(current_user, worker_id):
         {'_id': worker_obj_id},
         {'$set': update_data}
     )
+    # Role/identity changed: revoke tokens carrying the old claims
+    revoke_tokens(worker_id)
     
     return jsonify({'message': 'Worker updated successfully'})
 
@@ -423,12 +462,14 @@ def delete_worker(current_user, worker_id):
         {'_id': worker_obj_id},
         {'$set': {'active': False}}
     )
+    revoke_tokens(worker_id)
     
     # Reassign active complaints
-    db.complaints.update_many(
-        {'assigned_to': worker_obj_id, 'status': {'$in': ['open', 'in_progress']}},
-        {'$set': {'assigned_to': None, 'status': 'open'}}
-    )
+    active = {'assigned_to': worker_obj_id, 'status': {'$in': ['open', 'in_progress']}}
+    reassignment = {'assigned_to': None, 'status': 'open', 'updatedAt': datetime.utcnow()}
+    reassigned = list(db.complaints.find(active, {'status': 1, 'category': 1, 'createdAt': 1, 'resolvedAt': 1}))
+    db.complaints.update_many(active, {'$set': reassignment})
+    complaints_written(db, [(complaint, dict(complaint, **reassignment)) for complaint in reassigned])
     
     return jsonify({'message': 'Worker deactivated successfully'})
 
@@ -455,6 +496,7 @@ def delete_complaint(current_user, complaint_id):
         result = db.complaints.delete_one({'_id': ObjectId(complaint_id)})
         
         if result.deleted_count > 0:
+            complaint_written(db, complaint, None)
             return jsonify({'message': 'Complaint deleted successfully'}), 200
         else:
             return jsonify({'error': 'Failed to delete complaint'}), 500
@@ -463,35 +505,40 @@ def delete_complaint(current_user, complaint_id):
         print(f"Error deleting complaint: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
 
+def format_user(user):
+    formatted_user = {
+        'id': user['_id'],  # Add id field for frontend
+        '_id': user['_id'],
+        'name': user.get('name', 'Unknown'),
+        'email': user.get('email', 'Unknown'),
+        'reward_points': user.get('reward_points', 0),
+        'is_worker': user.get('is_worker', False),
+        'role': user.get('role', 'user')
+    }
+    
+    for date_field in ['createdAt', 'updatedAt', 'lastLogin']:
+        if date_field in user and user[date_field]:
+            formatted_user[date_field] = user[date_field]
+    
+    return formatted_user
+
+
 @admin_bp.route('/users', methods=['GET'])
 @admin_required
 def get_all_users(current_user):
     db = current_app.config['db']
     
     # Get all non-admin users
-    users = list(db.users.find({'is_admin': False}, {
+    cursor = db.users.find({'is_admin': False}, {
         'password': 0  # Exclude password field
-    }))
+    })
+    
+    # Streamed (NDJSON / chunked array) on request; see utils.streaming
+    if stream_requested():
+        return stream_response(cursor, transform=lambda batch: [format_user(user) for user in batch])
     
     # Format users for response
-    formatted_users = []
-    for user in users:
-        formatted_user = {
-            'id': str(user['_id']),  # Add id field for frontend
-            '_id': str(user['_id']),
-            'name': user.get('name', 'Unknown'),
-            'email': user.get('email', 'Unknown'),
-            'reward_points': user.get('reward_points', 0),
-            'is_worker': user.get('is_worker', False),
-            'role': user.get('role', 'user')
-        }
-        
-        # Format dates
-        for date_field in ['createdAt', 'updatedAt', 'lastLogin']:
-            if date_field in user and user[date_field]:
-                formatted_user[date_field] = user[date_field].isoformat()
-        
-        formatted_users.append(formatted_user)
+    formatted_users = [format_user(user) for user in cursor]
     
     return jsonify(formatted_users)
 
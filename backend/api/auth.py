@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
-from passlib.hash import pbkdf2_sha256
-import jwt
-from datetime import datetime, timedelta
+from utils.passwords import password_hasher, PasswordHasherBusy
+from utils.auth_middleware import authenticate_request, generate_token
+from datetime import datetime
 from bson.objectid import ObjectId
 import re
 
@@ -12,21 +12,17 @@ def is_valid_email(email):
     email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(email_regex, email) is not None
 
-# Helper function to generate JWT token
-def generate_token(user_id, is_admin=False, is_worker=False):
-    print(f"Generating token for user {user_id} with is_admin={is_admin}, is_worker={is_worker}")
-    payload = {
-        'exp': datetime.utcnow() + timedelta(days=1),
-        'iat': datetime.utcnow(),
-        'sub': str(user_id),
-        'admin': is_admin,
-        'worker': is_worker
-    }
-    return jwt.encode(
-        payload,
-        current_app.config['SECRET_KEY'],
-        algorithm='HS256'
-    )
+# Helper function to build the $set applied after a successful login.
+# Rehashes the password when the stored hash uses an old scheme or round count.
+def login_update(user, password):
+    update = {'lastLogin': datetime.utcnow()}
+    if password_hasher.needs_update(user.get('password', '')):
+        try:
+            update['password'] = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            # Not worth failing the login over; upgrade on a later login
+            pass
+    return update
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -57,7 +53,10 @@ def register():
             return jsonify({'error': 'Email already registered'}), 409
         
         # Hash password
-        hashed_password = pbkdf2_sha256.hash(data['password'])
+        try:
+            hashed_password = password_hasher.hash(data['password'])
+        except PasswordHasherBusy:
+            return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
         
         # Create user document
         user = {
@@ -79,7 +78,7 @@ def register():
         print(f"User created with ID: {user_id}")
         
         # Generate token
-        token = generate_token(user_id)
+        token = generate_token(user_id, name=user['name'], email=user['email'])
         
         # Update last login
         db.users.update_one(
@@ -120,25 +119,10 @@ def login():
         return jsonify({'error': 'Invalid email or password'}), 401
     
     # Verify password - support both pbkdf2_sha256 (app) and bcrypt (add_worker.py)
-    password_valid = False
-    stored_password = user.get('password', '')
-    
     try:
-        # Try pbkdf2_sha256 first (the main app's hashing method)
-        password_valid = pbkdf2_sha256.verify(data['password'], stored_password)
-    except Exception:
-        pass
-    
-    if not password_valid:
-        # Try bcrypt (used by add_worker.py script)
-        try:
-            import bcrypt
-            password_valid = bcrypt.checkpw(
-                data['password'].encode('utf-8'),
-                stored_password.encode('utf-8') if isinstance(stored_password, str) else stored_password
-            )
-        except Exception:
-            pass
+        password_valid = password_hasher.verify(data['password'], user.get('password', ''))
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
     
     if not password_valid:
         return jsonify({'error': 'Invalid email or password'}), 401
@@ -148,12 +132,17 @@ def login():
     is_admin = user.get('is_admin', False)
     
     # Generate token with appropriate roles
-    token = generate_token(user['_id'], is_admin, is_worker)
+    token = generate_token(
+        user['_id'], is_admin, is_worker,
+        name=user.get('name'),
+        email=user['email'],
+        token_version=user.get('token_version', 0)
+    )
     
-    # Update last login
+    # Update last login, upgrading the stored hash if the policy changed
     db.users.update_one(
         {'_id': user['_id']},
-        {'$set': {'lastLogin': datetime.utcnow()}}
+        {'$set': login_update(user, data['password'])}
     )
     
     # Return user info and token
@@ -194,16 +183,29 @@ def worker_login():
     })
     
     # Check if worker exists and password is correct
-    if not worker or not pbkdf2_sha256.verify(data['password'], worker['password']):
+    if not worker:
+        return jsonify({'error': 'Invalid email or password'}), 401
+    
+    try:
+        password_valid = password_hasher.verify(data['password'], worker.get('password', ''))
+    except PasswordHasherBusy:
+        return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
+    
+    if not password_valid:
         return jsonify({'error': 'Invalid email or password'}), 401
     
     # Generate token with worker role
-    token = generate_token(worker['_id'], worker.get('is_admin', False), True)
+    token = generate_token(
+        worker['_id'], worker.get('is_admin', False), True,
+        name=worker.get('name'),
+        email=worker['email'],
+        token_version=worker.get('token_version', 0)
+    )
     
-    # Update last login
+    # Update last login, upgrading the stored hash if the policy changed
     db.users.update_one(
         {'_id': worker['_id']},
-        {'$set': {'lastLogin': datetime.utcnow()}}
+        {'$set': login_update(worker, data['password'])}
     )
     
     # Return worker info and token
@@ -229,40 +231,33 @@ def verify_token():
     if not token:
         return jsonify({'error': 'Token is required'}), 400
     
-    try:
-        # Decode token
-        payload = jwt.decode(
-            token,
-            current_app.config['SECRET_KEY'],
-            algorithms=['HS256']
-        )
-        
-        # Get user from database
-        db = current_app.config['db']
-        user = db.users.find_one({'_id': ObjectId(payload['sub'])})
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        # Check roles from token and user record
-        is_worker = payload.get('worker', False) or user.get('role') == 'worker' or user.get('is_worker', False)
-        is_admin = payload.get('admin', False) or user.get('is_admin', False)
-        
-        # Return user info
-        return jsonify({
-            'user': {
-                'id': str(user['_id']),
-                'name': user['name'],
-                'email': user['email'],
-                'is_admin': is_admin,
-                'is_worker': is_worker,
-                'role': user.get('role', 'user'),
-                'phone': user.get('phone', ''),
-                'department': user.get('department', ''),
-                'createdAt': user.get('createdAt')
-            }
-        })
-    except jwt.ExpiredSignatureError:
-        return jsonify({'error': 'Token has expired'}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({'error': 'Invalid token'}), 401
\ No newline at end of file
+    # Same checks as the auth middleware, including revoked token versions
+    principal, payload, error = authenticate_request(token)
+    if error:
+        return error
+    
+    # Get user from database
+    db = current_app.config['db']
+    user = db.users.find_one({'_id': ObjectId(payload['sub'])})
+    
+    if not user:
+        return jsonify({'error': 'User not found'}), 404
+    
+    # Check roles from token and user record
+    is_worker = payload.get('worker', False) or user.get('role') == 'worker' or user.get('is_worker', False)
+    is_admin = payload.get('admin', False) or user.get('is_admin', False)
+    
+    # Return user info
+    return jsonify({
+        'user': {
+            'id': str(user['_id']),
+            'name': user['name'],
+            'email': user['email'],
+            'is_admin': is_admin,
+            'is_worker': is_worker,
+            'role': user.get('role', 'user'),
+            'phone': user.get('phone', ''),
+            'department': user.get('department', ''),
+            'createdAt': user.get('createdAt')
+        }
+    })
\ No newline at end of file
@@ -4,25 +4,38 @@ from datetime import datetime
 import os
 import base64
 import tempfile
-# Optional ML dependencies - only import if available
-try:
-    import speech_recognition as sr
-    import numpy as np
-    from pydub import AudioSegment
-    # from ultralytics import YOLO  # Commented out for lighter deployment
-    # import cv2  # Commented out for lighter deployment
-    ML_FEATURES_AVAILABLE = True
-except ImportError:
-    ML_FEATURES_AVAILABLE = False
-    print("ML features not available - some functionality will be limited")
 from utils.auth_middleware import token_required
 import uuid
-import google.generativeai as genai
 from utils.notifications import send_thank_you_notifications, send_ticket_creation_notification
+from utils.metrics import GEMINI_LATENCY
+from utils.complaint_writes import complaint_written
+from utils.escalation import escalation_deadline
 import re
 
 chatbot_bp = Blueprint('chatbot', __name__)
 
+# Optional ML dependencies - imported on first use so they don't slow down
+# worker start-up. None until load_audio_libraries() has run.
+ML_FEATURES_AVAILABLE = None
+sr = None
+AudioSegment = None
+
+def load_audio_libraries():
+    global ML_FEATURES_AVAILABLE, sr, AudioSegment
+    if ML_FEATURES_AVAILABLE is None:
+        try:
+            import speech_recognition
+            from pydub import AudioSegment as audio_segment
+            # from ultralytics import YOLO  # Commented out for lighter deployment
+            # import cv2  # Commented out for lighter deployment
+            sr = speech_recognition
+            AudioSegment = audio_segment
+            ML_FEATURES_AVAILABLE = True
+        except ImportError:
+            ML_FEATURES_AVAILABLE = False
+            print("ML features not available - some functionality will be limited")
+    return ML_FEATURES_AVAILABLE
+
 # Auto-categorization function
 def auto_categorize_complaint(description):
     # Define keyword patterns for each category
@@ -123,6 +136,8 @@ def initialize_gemini():
         return None
     
     try:
+        # Imported here: google.generativeai takes most of the app's import time
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         # Use the correct model name for the current API version
         return genai.GenerativeModel('gemini-2.5-flash')
@@ -196,15 +211,16 @@ Only include ticketData when suggestTicket is true."""
 
         
         # Generate response using Gemini
-        response = gemini_model.generate_content(
-            f"{system_prompt}\n\nUser message: {message}",
-            generation_config={
-                "temperature": 0.3,
-                "top_p": 0.9,
-                "top_k": 40,
-                "max_output_tokens": 1024,
-            }
-        )
+        with GEMINI_LATENCY.labels(operation='chat').time():
+            response = gemini_model.generate_content(
+                f"{system_prompt}\n\nUser message: {message}",
+                generation_config={
+                    "temperature": 0.3,
+                    "top_p": 0.9,
+                    "top_k": 40,
+                    "max_output_tokens": 1024,
+                }
+            )
         
         # Parse the response
         try:
@@ -326,6 +342,12 @@ def process_voice(current_user):
     
     audio_file = request.files['audio']
     
+    if not load_audio_libraries():
+        return jsonify({
+            'error': 'Voice processing is not available on this server',
+            'transcribed': False
+        }), 503
+    
     # Create a temporary file to save the audio
     with tempfile.NamedTemporaryFile(delete=False, suffix='.webm') as temp_audio:
         audio_file.save(temp_audio.name)
@@ -412,20 +434,21 @@ def transcribe_audio(current_user):
     try:
         audio_b64 = base64.b64encode(audio_bytes).decode('utf-8')
 
-        response = gemini_model.generate_content([
-            {
-                "inline_data": {
-                    "mime_type": mime_type,
-                    "data": audio_b64
-                }
-            },
-            (
-                "You are a transcription assistant. "
-                "Transcribe the spoken words in this audio recording exactly as said. "
-                "Return ONLY the transcribed text — no labels, no commentary, no quotes. "
-                "If the audio is silent or inaudible, return exactly: [inaudible]"
-            )
-        ])
+        with GEMINI_LATENCY.labels(operation='transcribe').time():
+            response = gemini_model.generate_content([
+                {
+                    "inline_data": {
+                        "mime_type": mime_type,
+                        "data": audio_b64
+                    }
+                },
+                (
+                    "You are a transcription assistant. "
+                    "Transcribe the spoken words in this audio recording exactly as said. "
+                    "Return ONLY the transcribed text — no labels, no commentary, no quotes. "
+                    "If the audio is silent or inaudible, return exactly: [inaudible]"
+                )
+            ])
 
         transcript = response.text.strip() if response.text else ''
 
@@ -775,10 +798,12 @@ def create_ticket(current_user):
         'imageUrl': data.get('imageUrl'),
         'detectedObjects': data.get('detectedObjects', [])
     }
+    complaint['escalateAt'] = escalation_deadline(complaint)
     
     # Insert complaint into database
     result = db.complaints.insert_one(complaint)
     complaint_id = result.inserted_id
+    complaint_written(db, None, complaint)
     
     # Send notification to user about ticket creation
     notification_result = send_ticket_creation_notification(
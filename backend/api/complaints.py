@@ -1,91 +1,74 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, url_for
 from bson.objectid import ObjectId
 from datetime import datetime
 from utils.auth_middleware import token_required, admin_required
 from utils.rewards import award_points
 from utils.notifications import send_ticket_creation_notification
+from utils.enrichment import enrich_complaints
+from utils.projections import complaint_projection
+from utils.stats import user_complaint_stats, worker_complaint_stats
+from utils.complaint_writes import complaint_written, comment_added
+from utils.escalation import ESCALATION_BATCH_SIZE, SWEEP_PROJECTION, apply_escalations, escalation_deadline
+from utils.escalation_rules import SERVICE_LEVEL_RULES, compile_rules, evaluate_rules
+from utils.etags import document_version, document_etag, list_etag, not_modified, with_etag
+from utils.jobs import format_job, get_job, start_job
+from utils.request_params import dry_run_requested
 import json
+import time
 
 complaints_bp = Blueprint('complaints', __name__)
 
-# Helper function to format complaint for response
-def format_complaint(complaint):
-    if not complaint:
-        return None
-    
-    # Convert ObjectId to string for JSON serialization
-    complaint['_id'] = str(complaint['_id'])
-    
-    # Convert user_id to string if it exists
-    if 'user_id' in complaint:
-        complaint['user_id'] = str(complaint['user_id'])
-    
-    # Convert assigned_to to string if it exists
-    if 'assigned_to' in complaint and complaint['assigned_to']:
-        complaint['assigned_to'] = str(complaint['assigned_to'])
-    
-    # Format dates for JSON serialization
-    for date_field in ['createdAt', 'updatedAt', 'assignedAt', 'inProgressAt', 'resolvedAt', 'escalatedAt']:
-        if date_field in complaint and complaint[date_field]:
-            complaint[date_field] = complaint[date_field].isoformat()
-    
-    # Format comments if they exist
-    if 'comments' in complaint and complaint['comments']:
-        for comment in complaint['comments']:
-            if '_id' in comment:
-                comment['_id'] = str(comment['_id'])
-            if 'user_id' in comment:
-                comment['user_id'] = str(comment['user_id'])
-            if 'createdAt' in comment:
-                comment['createdAt'] = comment['createdAt'].isoformat()
-    
-    return complaint
-
 @complaints_bp.route('/', methods=['GET'])
 @token_required
 def get_user_complaints(current_user):
     db = current_app.config['db']
     
-    # Get all complaints for the current user
-    user_complaints = list(db.complaints.find({'user_id': ObjectId(current_user['id'])}))
+    try:
+        projection = complaint_projection(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = {'user_id': ObjectId(current_user['id'])}
+    etag = list_etag(db.complaints, query)
+    cached = not_modified(etag)
+    if cached:
+        return cached
     
-    # Format complaints for response
-    formatted_complaints = [format_complaint(complaint) for complaint in user_complaints]
+    # Get all complaints for the current user
+    user_complaints = list(db.complaints.find(query, projection))
     
-    return jsonify(formatted_complaints)
+    # ObjectIds and datetimes are serialized by the app's JSON provider
+    return with_etag(jsonify(user_complaints), etag)
 
 @complaints_bp.route('/user', methods=['GET'])
 @token_required
 def get_user_complaints_endpoint(current_user):
     db = current_app.config['db']
     
-    # Get all complaints for the current user
-    user_complaints = list(db.complaints.find({'user_id': ObjectId(current_user['id'])}))
+    try:
+        projection = complaint_projection(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    # Format complaints for response
-    formatted_complaints = [format_complaint(complaint) for complaint in user_complaints]
+    query = {'user_id': ObjectId(current_user['id'])}
+    etag = list_etag(db.complaints, query)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    # Get all complaints for the current user
+    user_complaints = list(db.complaints.find(query, projection))
     
-    return jsonify(formatted_complaints)
+    # ObjectIds and datetimes are serialized by the app's JSON provider
+    return with_etag(jsonify(user_complaints), etag)
 
 @complaints_bp.route('/stats', methods=['GET'])
 @token_required
 def get_user_complaint_stats(current_user):
     db = current_app.config['db']
     
-    # Get counts for different status types
-    total = db.complaints.count_documents({'user_id': ObjectId(current_user['id'])})
-    pending = db.complaints.count_documents({'user_id': ObjectId(current_user['id']), 'status': 'pending'})
-    in_progress = db.complaints.count_documents({'user_id': ObjectId(current_user['id']), 'status': 'in-progress'})
-    resolved = db.complaints.count_documents({'user_id': ObjectId(current_user['id']), 'status': 'resolved'})
-    escalated = db.complaints.count_documents({'user_id': ObjectId(current_user['id']), 'status': 'escalated'})
-    
-    return jsonify({
-        'total': total,
-        'pending': pending,
-        'inProgress': in_progress,
-        'resolved': resolved,
-        'escalated': escalated
-    })
+    # Counts for each status type in one aggregation
+    return jsonify(user_complaint_stats(db, current_user['id']))
 
 @complaints_bp.route('/', methods=['POST'])
 @token_required
@@ -128,14 +111,15 @@ def create_complaint(current_user):
         'imageUrl': data.get('imageUrl'),
         'detectedObjects': data.get('detectedObjects', [])
     }
+    complaint['escalateAt'] = escalation_deadline(complaint)
     
     # Insert complaint into database
     result = db.complaints.insert_one(complaint)
     complaint_id = result.inserted_id
+    complaint_written(db, None, complaint)
     
     # Get the created complaint
     created_complaint = db.complaints.find_one({'_id': complaint_id})
-    formatted_complaint = format_complaint(created_complaint)
     
     # Send notification to user about ticket creation
     notification_result = send_ticket_creation_notification(
@@ -151,7 +135,7 @@ def create_complaint(current_user):
     reward_result = award_points(current_user['id'], 'create_ticket', str(complaint_id))
     
     response = {
-        'complaint': formatted_complaint,
+        'complaint': created_complaint,
         'notifications': notification_result
     }
     
@@ -194,29 +178,29 @@ def claim_complaint(current_user, complaint_id):
     
     # Assign complaint to worker
     now = datetime.utcnow()
+    claim = {
+        'assigned_to': ObjectId(current_user['id']),
+        'assignedAt': now,
+        'status': 'in-progress',
+        'inProgressAt': now,
+        'updatedAt': now
+    }
     result = db.complaints.update_one(
         {'_id': complaint_obj_id, 'assigned_to': None},  # Ensure it's still unassigned
-        {
-            '$set': {
-                'assigned_to': ObjectId(current_user['id']),
-                'assignedAt': now,
-                'status': 'in-progress',
-                'inProgressAt': now,
-                'updatedAt': now
-            }
-        }
+        {'$set': claim}
     )
     
     if result.modified_count == 0:
         return jsonify({'error': 'Failed to claim complaint, it may have been claimed by another worker'}), 409
     
+    complaint_written(db, complaint, dict(complaint, **claim))
+    
     # Get updated complaint
     updated_complaint = db.complaints.find_one({'_id': complaint_obj_id})
-    formatted_complaint = format_complaint(updated_complaint)
     
     return jsonify({
         'message': 'Complaint claimed successfully',
-        'complaint': formatted_complaint
+        'complaint': updated_complaint
     }), 200
 
 
@@ -254,21 +238,22 @@ def escalate_complaint(current_user, complaint_id):
     
     # Update complaint status to escalated
     now = datetime.utcnow()
+    escalation = {
+        'status': 'escalated',
+        'escalatedAt': now,
+        'escalationReason': reason,
+        'updatedAt': now
+    }
     result = db.complaints.update_one(
         {'_id': complaint_obj_id},
-        {
-            '$set': {
-                'status': 'escalated',
-                'escalatedAt': now,
-                'escalationReason': reason,
-                'updatedAt': now
-            }
-        }
+        {'$set': escalation}
     )
     
     if result.modified_count == 0:
         return jsonify({'error': 'Failed to escalate complaint'}), 500
     
+    complaint_written(db, complaint, dict(complaint, **escalation))
+    
     # Add system comment about escalation
     comment = {
         '_id': ObjectId(),
@@ -284,18 +269,32 @@ def escalate_complaint(current_user, complaint_id):
     
     db.complaints.update_one(
         {'_id': complaint_obj_id},
-        {'$push': {'comments': comment}}
+        {
+            '$push': {'comments': comment},
+            '$set': {'updatedAt': now}
+        }
     )
+    comment_added(db)
     
     # Get updated complaint
     updated_complaint = db.complaints.find_one({'_id': complaint_obj_id})
-    formatted_complaint = format_complaint(updated_complaint)
     
     return jsonify({
         'message': 'Complaint escalated successfully',
-        'complaint': formatted_complaint
+        'complaint': updated_complaint
     }), 200
 
+def can_view_complaint(current_user, complaint):
+    """Owner, admin, or the worker the complaint is assigned to"""
+    is_owner = str(complaint['user_id']) == current_user['id']
+    is_admin_user = current_user.get('is_admin', False)
+    is_assigned_worker = (
+        current_user.get('is_worker', False) and
+        complaint.get('assigned_to') and
+        str(complaint['assigned_to']) == current_user['id']
+    )
+    return bool(is_owner or is_admin_user or is_assigned_worker)
+
 @complaints_bp.route('/<complaint_id>', methods=['GET'])
 @token_required
 def get_complaint_detail(current_user, complaint_id):
@@ -307,43 +306,36 @@ def get_complaint_detail(current_user, complaint_id):
     except:
         return jsonify({'error': 'Invalid complaint ID'}), 400
     
-    # Get complaint from database
-    complaint = db.complaints.find_one({'_id': complaint_obj_id})
+    # Look up the complaint's version first; if the client's copy is current
+    # the full document is never read
+    version = document_version(db.complaints, complaint_obj_id)
     
-    if not complaint:
+    if not version:
         return jsonify({'error': 'Complaint not found'}), 404
     
-    # Check authorization: user owns it, OR admin, OR worker assigned to it
-    is_owner = str(complaint['user_id']) == current_user['id']
-    is_admin_user = current_user.get('is_admin', False)
-    is_assigned_worker = (
-        current_user.get('is_worker', False) and
-        complaint.get('assigned_to') and
-        str(complaint['assigned_to']) == current_user['id']
-    )
-
-    if not (is_owner or is_admin_user or is_assigned_worker):
+    if not can_view_complaint(current_user, version):
         return jsonify({'error': 'Unauthorized to view this complaint'}), 403
     
-    # If complaint has assigned_to, get the agent details
-    if 'assigned_to' in complaint and complaint['assigned_to']:
-        agent = db.users.find_one({'_id': complaint['assigned_to']})
-        if agent:
-            complaint['assignedTo'] = {
-                'name': agent['name'],
-                'email': agent['email']
-            }
-    
     # Update lastViewedAt timestamp when user views complaint
     db.complaints.update_one(
         {'_id': complaint_obj_id},
         {'$set': {'lastViewedAt': datetime.utcnow()}}
     )
     
-    # Format complaint for response
-    formatted_complaint = format_complaint(complaint)
+    cached = not_modified(document_etag(version))
+    if cached:
+        return cached
     
-    return jsonify(formatted_complaint)
+    # Get complaint from database
+    complaint = db.complaints.find_one({'_id': complaint_obj_id})
+    
+    if not complaint:
+        return jsonify({'error': 'Complaint not found'}), 404
+    
+    # If complaint has assigned_to, get the agent details
+    enrich_complaints(db, [complaint])
+    
+    return with_etag(jsonify(complaint), document_etag(complaint))
 
 @complaints_bp.route('/<complaint_id>', methods=['GET', 'DELETE'])
 @admin_required
@@ -369,93 +361,157 @@ def delete_complaint(current_user, complaint_id):
     result = db.complaints.delete_one({'_id': complaint_obj_id})
     
     if result.deleted_count > 0:
+        complaint_written(db, complaint, None)
         return jsonify({'message': 'Complaint deleted successfully'}), 200
     else:
         return jsonify({'error': 'Complaint deletion failed'}), 500
 
+def _escalation_fields(complaint, current_time):
+    return {
+        'needs_escalation': True,
+        'escalation_reasons': complaint['escalationReasons'],
+        'escalatedAt': current_time,
+        'status': 'escalated',
+        'updatedAt': current_time
+    }
+
+
+def _escalation_check_job(db, checkpoint):
+    """Full escalation check, run as a background job with progress per batch"""
+    current_time = datetime.utcnow()
+    timings = {}
+    matched, timings['evaluate'] = evaluate_rules(
+        db, SERVICE_LEVEL_RULES, current_time, None, SWEEP_PROJECTION
+    )
+    checkpoint(matched=len(matched), processed=0, escalated=0)
+    
+    started = time.perf_counter()
+    escalated = []
+    for start in range(0, len(matched), ESCALATION_BATCH_SIZE):
+        batch = matched[start:start + ESCALATION_BATCH_SIZE]
+        escalated += apply_escalations(db, [
+            (complaint, _escalation_fields(complaint, current_time), None) for complaint in batch
+        ])
+        checkpoint(processed=start + len(batch), escalated=len(escalated))
+    timings['update'] = round((time.perf_counter() - started) * 1000, 2)
+    
+    # Counted over the complaints actually written
+    by_rule = {rule['name']: 0 for rule in SERVICE_LEVEL_RULES}
+    for complaint in escalated:
+        for name in complaint['matchedRules']:
+            by_rule[name] += 1
+    return {'matched': len(matched), 'escalated': len(escalated), 'byRule': by_rule, 'timings': timings}
+
+
 @complaints_bp.route('/escalation-check', methods=['POST'])
 @token_required
 def check_escalation(current_user):
-    """Check if complaints need escalation based on various criteria"""
+    """
+    Check if complaints need escalation based on various criteria
+
+    The criteria are SERVICE_LEVEL_RULES (see utils/escalation_rules.py):
+    no response to a pending complaint within 2 hours, a non-complex
+    complaint not resolved within 24 hours, and pending high priority
+    complaints. They run as one query that returns only the complaints
+    to escalate. With dry_run (?dry_run=1 or {"dry_run": true}) nothing is
+    written and the response lists what would be escalated.
+
+    A single complaint (complaint_id) is checked in the request. A check of
+    every active complaint runs as a background job: the response is 202
+    with the job id, GET /escalation-check/<job_id> reports its progress,
+    and a request made while one is running gets that job back.
+    """
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True) or {}
         complaint_id = data.get('complaint_id')
+        dry_run = dry_run_requested(data)
         db = current_app.config['db']
         
+        if not complaint_id and not dry_run:
+            job, started = start_job(
+                current_app._get_current_object(),
+                'escalation_check',
+                _escalation_check_job,
+                key='escalation_check',
+                requested_by=ObjectId(current_user['id'])
+            )
+            status_url = url_for('complaints.get_escalation_check_job', job_id=str(job['_id']))
+            response = jsonify({
+                'message': 'Escalation check started' if started else 'Escalation check already running',
+                'job_id': str(job['_id']),
+                'status': job['status'],
+                'status_url': status_url
+            })
+            response.headers['Location'] = status_url
+            return response, 202
+        
+        timings = {}
+        query = None
+        
         # If complaint_id is provided, check specific complaint
         if complaint_id:
-            complaint = db.complaints.find_one({'_id': ObjectId(complaint_id)})
-            if not complaint:
+            query = {'_id': ObjectId(complaint_id)}
+            if not db.complaints.count_documents(query, limit=1):
                 return jsonify({'error': 'Complaint not found'}), 404
-            
-            complaints_to_check = [complaint]
-        else:
-            # Check all active complaints
-            complaints_to_check = list(db.complaints.find({
-                'status': {'$in': ['pending', 'in-progress']}
-            }))
         
-        escalation_results = []
         current_time = datetime.utcnow()
+        matched, timings['evaluate'] = evaluate_rules(
+            db, SERVICE_LEVEL_RULES, current_time, query, SWEEP_PROJECTION
+        )
         
-        for complaint in complaints_to_check:
-            escalation_needed = False
-            reasons = []
-            
-            # Check response time (2 hours for initial response)
-            if complaint['status'] == 'pending' and \
-               (current_time - complaint['createdAt']).total_seconds() > 7200:
-                escalation_needed = True
-                reasons.append('No response within 2 hours')
-            
-            # Check resolution time (24 hours for standard complaints)
-            if complaint['status'] == 'in-progress' and \
-               not complaint.get('is_complex', False) and \
-               (current_time - complaint['createdAt']).total_seconds() > 86400:
-                escalation_needed = True
-                reasons.append('Not resolved within 24 hours')
-            
-            # Check priority level
-            if complaint.get('priority') == 'high' and complaint['status'] == 'pending':
-                escalation_needed = True
-                reasons.append('High priority ticket requires immediate attention')
-            
-            if escalation_needed:
-                # Update complaint status and add escalation note
-                update_data = {
-                    '$set': {
-                        'needs_escalation': True,
-                        'escalation_reasons': reasons,
-                        'escalatedAt': current_time,
-                        'status': 'escalated'
-                    }
-                }
-                
-                db.complaints.update_one(
-                    {'_id': complaint['_id']},
-                    update_data
-                )
-                
-                escalation_results.append({
-                    'complaint_id': str(complaint['_id']),
-                    'escalated': True,
-                    'reasons': reasons
-                })
-            else:
-                escalation_results.append({
-                    'complaint_id': str(complaint['_id']),
+        def results(escalated_ids):
+            rows = [{
+                'complaint_id': str(complaint['_id']),
+                'escalated': complaint['_id'] in escalated_ids,
+                'rules': complaint['matchedRules'],
+                'reasons': complaint['escalationReasons']
+            } for complaint in matched]
+            for row in rows:
+                if not row['escalated'] and not dry_run:
+                    row['message'] = 'Complaint changed status before it could be escalated'
+            if complaint_id and not matched:
+                rows.append({
+                    'complaint_id': complaint_id,
                     'escalated': False,
                     'message': 'No escalation needed'
                 })
+            return rows
+        
+        if dry_run:
+            return jsonify({
+                'message': f'Dry run: {len(matched)} complaints would be escalated',
+                'dry_run': True,
+                'rules': [rule['name'] for rule in SERVICE_LEVEL_RULES],
+                'filter': compile_rules(SERVICE_LEVEL_RULES, current_time),
+                'results': results(set()),
+                'timings': timings
+            }), 200
+        
+        # Update complaint status and add escalation note
+        started = time.perf_counter()
+        escalated = apply_escalations(db, [
+            (complaint, _escalation_fields(complaint, current_time), None) for complaint in matched
+        ])
+        timings['update'] = round((time.perf_counter() - started) * 1000, 2)
         
         return jsonify({
             'message': 'Escalation check completed',
-            'results': escalation_results
+            'results': results({complaint['_id'] for complaint in escalated}),
+            'timings': timings
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@complaints_bp.route('/escalation-check/<job_id>', methods=['GET'])
+@token_required
+def get_escalation_check_job(current_user, job_id):
+    """Status, progress and result of a background escalation check"""
+    job = get_job(current_app.config['db'], job_id)
+    if not job or job.get('type') != 'escalation_check':
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(format_job(job)), 200
+
 @complaints_bp.route('/worker', methods=['GET'])
 @token_required
 def get_worker_complaints(current_user):
@@ -470,22 +526,28 @@ def get_worker_complaints(current_user):
     
     worker_id = ObjectId(current_user['id'])
     
+    try:
+        projection = complaint_projection(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    assigned_query = {'assigned_to': worker_id}
+    unassigned_query = {'assigned_to': None, 'status': 'pending'}
+    etag = list_etag(db.complaints, {'$or': [assigned_query, unassigned_query]})
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
     # Get complaints assigned to this worker
-    assigned_complaints = list(db.complaints.find({
-        'assigned_to': worker_id
-    }).sort('createdAt', -1))
+    assigned_complaints = list(db.complaints.find(assigned_query, projection).sort('createdAt', -1))
     
     # Get unassigned complaints that workers can claim
-    unassigned_complaints = list(db.complaints.find({
-        'assigned_to': None,
-        'status': 'pending'
-    }).sort('createdAt', -1))
+    unassigned_complaints = list(db.complaints.find(unassigned_query, projection).sort('createdAt', -1))
     
-    # Combine and format complaints
+    # Combine complaints
     all_complaints = assigned_complaints + unassigned_complaints
-    formatted_complaints = [format_complaint(c) for c in all_complaints]
     
-    return jsonify(formatted_complaints)
+    return with_etag(jsonify(all_complaints), etag)
 
 @complaints_bp.route('/worker/stats', methods=['GET'])
 @token_required
@@ -499,43 +561,9 @@ def get_worker_stats(current_user):
     if not current_user.get('is_worker', False) and not current_user.get('is_admin', False):
         return jsonify({'error': 'Worker privileges required'}), 403
     
-    worker_id = ObjectId(current_user['id'])
-    
-    # Get counts for different statuses
-    assigned_count = db.complaints.count_documents({'assigned_to': worker_id})
-    pending_count = db.complaints.count_documents({'assigned_to': worker_id, 'status': 'pending'})
-    in_progress_count = db.complaints.count_documents({'assigned_to': worker_id, 'status': 'in-progress'})
-    resolved_count = db.complaints.count_documents({'assigned_to': worker_id, 'status': 'resolved'})
-    
-    # Get available complaints count
-    available_count = db.complaints.count_documents({'assigned_to': None, 'status': 'pending'})
-    
-    # Get average resolution time for this worker
-    resolved_complaints = list(db.complaints.find({
-        'assigned_to': worker_id,
-        'status': 'resolved',
-        'assignedAt': {'$exists': True},
-        'resolvedAt': {'$exists': True}
-    }))
-    
-    total_resolution_time = 0
-    for complaint in resolved_complaints:
-        assigned_time = complaint.get('assignedAt')
-        resolved_time = complaint.get('resolvedAt')
-        if assigned_time and resolved_time:
-            resolution_time = (resolved_time - assigned_time).total_seconds() / 3600  # in hours
-            total_resolution_time += resolution_time
-    
-    avg_resolution_time = round(total_resolution_time / len(resolved_complaints), 2) if resolved_complaints else 0
-    
-    return jsonify({
-        'assigned': assigned_count,
-        'pending': pending_count,
-        'inProgress': in_progress_count,
-        'resolved': resolved_count,
-        'available': available_count,
-        'avgResolutionTime': avg_resolution_time
-    })
+    # Status counts, available count and average resolution time (hours)
+    # in one aggregation
+    return jsonify(worker_complaint_stats(db, current_user['id']))
 
 @complaints_bp.route('/<complaint_id>/comments', methods=['POST'])
 @token_required
@@ -587,13 +615,14 @@ def add_comment(current_user, complaint_id):
             '$set': {'updatedAt': datetime.utcnow()}
         }
     )
+    comment_added(db)
     
     # Format comment for response
     formatted_comment = {
-        '_id': str(comment['_id']),
+        '_id': comment['_id'],
         'content': comment['content'],
         'user': comment['user'],
-        'createdAt': comment['createdAt'].isoformat()
+        'createdAt': comment['createdAt']
     }
     
     return jsonify(formatted_comment), 201
\ No newline at end of file
@@ -4,6 +4,11 @@ from datetime import datetime, timedelta
 from utils.auth_middleware import token_required, admin_required
 from utils.notifications import send_thank_you_notifications, send_notification
 from utils.rewards import award_points
+from utils.enrichment import enrich_complaints
+from utils.complaint_writes import complaint_written
+from utils.etags import document_version, document_etag, not_modified, with_etag
+from utils.escalation import run_escalation_sweep
+from utils.request_params import dry_run_requested
 from scheduled_tasks import check_and_escalate_complaints
 
 complaint_updates_bp = Blueprint('complaint_updates', __name__)
@@ -20,8 +25,29 @@ def test_endpoint():
 def trigger_escalation_check(current_user):
     """
     Admin endpoint to manually trigger the escalation check
+
+    With ?dry_run=1 (or {"dry_run": true}) the deadline rules are only
+    evaluated and the complaints that would be escalated are listed.
     """
     try:
+        if dry_run_requested(request.get_json(silent=True)):
+            sweep = run_escalation_sweep(current_app.config['db'], dry_run=True)
+            return jsonify({
+                'success': True,
+                'dry_run': True,
+                'message': f"Dry run: {len(sweep['escalated'])} complaints would be escalated.",
+                'escalated_complaints': [{
+                    'id': complaint['_id'],
+                    'subject': complaint.get('subject', 'No subject'),
+                    'status': complaint.get('status'),
+                    'priority': complaint.get('priority', 'medium'),
+                    'category': complaint.get('category', 'General'),
+                    'escalateAt': complaint.get('escalateAt'),
+                    'reasons': complaint['escalationReasons']
+                } for complaint in sweep['escalated']],
+                'timings': sweep['timings']
+            }), 200
+        
         # Run the escalation check
         escalated_complaints = check_and_escalate_complaints()
         
@@ -37,12 +63,12 @@ def trigger_escalation_check(current_user):
                     
                     if complaint_obj:
                         formatted_complaint = {
-                            'id': str(complaint_obj['_id']),
+                            'id': complaint_obj['_id'],
                             'subject': complaint_obj.get('subject', 'No subject'),
                             'status': 'escalated',
                             'priority': complaint_obj.get('priority', 'medium'),
                             'category': complaint_obj.get('category', 'General'),
-                            'escalatedAt': complaint_obj.get('escalatedAt', datetime.utcnow()).isoformat()
+                            'escalatedAt': complaint_obj.get('escalatedAt', datetime.utcnow())
                         }
                         formatted_complaints.append(formatted_complaint)
                 except Exception as complaint_error:
@@ -113,12 +139,12 @@ def get_complaint_updates(current_user):
         
         # Create update object
         update = {
-            'complaintId': str(complaint['_id']),
+            'complaintId': complaint['_id'],
             'ticketNumber': str(complaint['_id'])[-6:].upper(),  # Use last 6 chars of ID as ticket number
             'subject': complaint.get('subject', 'No subject'),
             'status': complaint.get('status', 'unknown'),
             'message': status_message,
-            'updatedAt': complaint.get('updatedAt', datetime.utcnow()).isoformat()
+            'updatedAt': complaint.get('updatedAt', datetime.utcnow())
         }
         
         updates.append(update)
@@ -145,41 +171,54 @@ def get_complaint_status(current_user, complaint_id):
     except:
         return jsonify({'error': 'Invalid complaint ID'}), 400
     
-    # Get complaint from database
-    complaint = db.complaints.find_one({'_id': complaint_obj_id})
+    # This endpoint is polled; look up the complaint's version first and skip
+    # the full read when the client's copy is current
+    version = document_version(db.complaints, complaint_obj_id)
     
-    if not complaint:
+    if not version:
         return jsonify({'error': 'Complaint not found'}), 404
     
     # Check if user is authorized to view this complaint
-    if str(complaint['user_id']) != current_user['id'] and not current_user.get('is_admin', False):
+    if str(version['user_id']) != current_user['id'] and not current_user.get('is_admin', False):
         return jsonify({'error': 'Unauthorized to view this complaint'}), 403
     
+    # Update lastViewedAt to mark this complaint as viewed
+    db.complaints.update_one(
+        {'_id': complaint_obj_id},
+        {'$set': {'lastViewedAt': datetime.utcnow()}}
+    )
+    
+    cached = not_modified(document_etag(version, 'status'))
+    if cached:
+        return cached
+    
+    # Get complaint from database
+    complaint = db.complaints.find_one({'_id': complaint_obj_id})
+    
+    if not complaint:
+        return jsonify({'error': 'Complaint not found'}), 404
+    
     # Format status response
     status_info = {
-        'complaintId': str(complaint['_id']),
+        'complaintId': complaint['_id'],
         'ticketNumber': str(complaint['_id'])[-6:].upper(),
         'subject': complaint.get('subject', 'No subject'),
         'status': complaint.get('status', 'unknown'),
         'priority': complaint.get('priority', 'medium'),
         'category': complaint.get('category', 'other'),
-        'createdAt': complaint.get('createdAt', datetime.min).isoformat(),
-        'updatedAt': complaint.get('updatedAt', datetime.min).isoformat(),
+        'createdAt': complaint.get('createdAt', datetime.min),
+        'updatedAt': complaint.get('updatedAt', datetime.min),
     }
     
     # Add timestamps for status changes if available
     for field in ['assignedAt', 'inProgressAt', 'resolvedAt', 'escalatedAt']:
         if field in complaint and complaint[field]:
-            status_info[field] = complaint[field].isoformat()
+            status_info[field] = complaint[field]
     
     # Add assigned agent info if available
-    if 'assigned_to' in complaint and complaint['assigned_to']:
-        agent = db.users.find_one({'_id': complaint['assigned_to']})
-        if agent:
-            status_info['assignedTo'] = {
-                'name': agent.get('name', 'Unknown'),
-                'email': agent.get('email', 'Unknown')
-            }
+    enrich_complaints(db, [complaint])
+    if 'assignedTo' in complaint:
+        status_info['assignedTo'] = complaint['assignedTo']
     
     # Add estimated resolution time if available or calculate based on priority
     if 'estimatedResolutionTime' in complaint:
@@ -198,15 +237,9 @@ def get_complaint_status(current_user, complaint_id):
         else:  # low
             est_resolution = created_at + timedelta(hours=120)
         
-        status_info['estimatedResolutionTime'] = est_resolution.isoformat()
+        status_info['estimatedResolutionTime'] = est_resolution
     
-    # Update lastViewedAt to mark this complaint as viewed
-    db.complaints.update_one(
-        {'_id': complaint_obj_id},
-        {'$set': {'lastViewedAt': datetime.utcnow()}}
-    )
-    
-    return jsonify(status_info)
+    return with_etag(jsonify(status_info), document_etag(complaint, 'status'))
 
 @complaint_updates_bp.route('/resolve/<complaint_id>', methods=['POST'])
 @token_required
@@ -233,17 +266,18 @@ def mark_complaint_resolved(current_user, complaint_id):
         return jsonify({'error': 'Unauthorized to resolve this complaint'}), 403
     
     # Update complaint status to resolved
+    now = datetime.utcnow()
+    resolution = {
+        'status': 'resolved',
+        'resolvedAt': now,
+        'updatedAt': now,
+        'lastViewedAt': now
+    }
     db.complaints.update_one(
         {'_id': complaint_obj_id},
-        {
-            '$set': {
-                'status': 'resolved',
-                'resolvedAt': datetime.utcnow(),
-                'updatedAt': datetime.utcnow(),
-                'lastViewedAt': datetime.utcnow()
-            }
-        }
+        {'$set': resolution}
     )
+    complaint_written(db, complaint, dict(complaint, **resolution))
     
     # Get user details
     user = db.users.find_one({'_id': ObjectId(current_user['id'])})
@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime
 from utils.auth_middleware import token_required, admin_required
 from utils.rewards import award_points
+from utils.streaming import stream_requested, stream_response
 from models.complaint import Complaint
 from models.feedback import Feedback
 from bson import ObjectId
@@ -146,6 +147,18 @@ def get_user_feedback(current_user):
     print(f"Retrieved user feedback for user {current_user['id']}: {formatted_feedback}")
     return jsonify(formatted_feedback)
 
+def format_feedback(feedback):
+    return {
+        'id': str(feedback['_id']),
+        'complaint_id': str(feedback.get('complaint_id', '')),
+        'user_id': str(feedback.get('user_id', '')),
+        'user_name': feedback.get('user_name', 'Unknown'),
+        'rating': feedback.get('rating', 0),
+        'comment': feedback.get('comment', ''),
+        'resolved': feedback.get('resolved', False),
+        'createdAt': feedback.get('createdAt', datetime.utcnow())
+    }
+
 @feedback_bp.route('/admin', methods=['GET'])
 @admin_required
 def get_all_feedback(current_user):
@@ -155,18 +168,13 @@ def get_all_feedback(current_user):
     db = current_app.config['db']
     
     # Get all feedback from database
-    all_feedback = list(db.feedback.find().sort('createdAt', -1))
+    cursor = db.feedback.find().sort('createdAt', -1)
+    
+    # Streamed (NDJSON / chunked array) on request; see utils.streaming
+    if stream_requested():
+        return stream_response(cursor, transform=lambda batch: [format_feedback(feedback) for feedback in batch])
     
     # Format feedback for response
-    formatted_feedback = [{
-        'id': str(feedback['_id']),
-        'complaint_id': str(feedback.get('complaint_id', '')),
-        'user_id': str(feedback.get('user_id', '')),
-        'user_name': feedback.get('user_name', 'Unknown'),
-        'rating': feedback.get('rating', 0),
-        'comment': feedback.get('comment', ''),
-        'resolved': feedback.get('resolved', False),
-        'createdAt': feedback.get('createdAt', datetime.utcnow()).isoformat()
-    } for feedback in all_feedback]
+    formatted_feedback = [format_feedback(feedback) for feedback in cursor]
     
     return jsonify(formatted_feedback)
\ No newline at end of file
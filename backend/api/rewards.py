@@ -2,7 +2,8 @@ from flask import Blueprint, request, jsonify, current_app
 from bson.objectid import ObjectId
 from datetime import datetime
 from utils.auth_middleware import token_required, admin_required
-from utils.rewards import award_points, get_user_rewards, get_user_level, get_reward_levels
+from utils.rewards import award_points, get_user_rewards, get_user_level, get_reward_levels, format_reward, reward_history_cursor
+from utils.streaming import stream_requested, stream_response
 
 rewards_bp = Blueprint('rewards', __name__)
 
@@ -11,7 +12,16 @@ rewards_bp = Blueprint('rewards', __name__)
 def get_user_reward_info(current_user):
     """
     Get the current user's reward information
+    
+    With Accept: application/x-ndjson or ?stream=1 only the reward history
+    is returned, streamed one reward per row.
     """
+    if stream_requested():
+        return stream_response(
+            reward_history_cursor(current_user['id']),
+            transform=lambda batch: [format_reward(reward) for reward in batch]
+        )
+    
     # Get user rewards history
     rewards_history = get_user_rewards(current_user['id'])
     
@@ -1,9 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
-from passlib.hash import pbkdf2_sha256
+from utils.passwords import password_hasher, PasswordHasherBusy
 import jwt
 from datetime import datetime
 from bson.objectid import ObjectId
-from utils.auth_middleware import token_required
+from utils.auth_middleware import token_required, invalidate_principal, revoke_tokens, generate_token
+from utils.stats import user_complaint_count
 
 users_bp = Blueprint('users', __name__)
 
@@ -18,7 +19,7 @@ def get_profile(current_user):
         return jsonify({'error': 'User not found'}), 404
     
     # Get complaint count for user
-    complaint_count = db.complaints.count_documents({'user_id': ObjectId(current_user['id'])})
+    complaint_count = user_complaint_count(db, current_user['id'])
     
     # Return user profile data
     return jsonify({
@@ -47,16 +48,19 @@ def update_profile(current_user):
     
     # Check if changing password
     if 'currentPassword' in data and 'newPassword' in data:
-        # Verify current password
-        if not pbkdf2_sha256.verify(data['currentPassword'], user['password']):
-            return jsonify({'error': 'Current password is incorrect'}), 401
-        
-        # Validate new password
-        if len(data['newPassword']) < 6:
-            return jsonify({'error': 'New password must be at least 6 characters'}), 400
-        
-        # Hash new password
-        data['password'] = pbkdf2_sha256.hash(data['newPassword'])
+        try:
+            # Verify current password
+            if not password_hasher.verify(data['currentPassword'], user['password']):
+                return jsonify({'error': 'Current password is incorrect'}), 401
+            
+            # Validate new password
+            if len(data['newPassword']) < 6:
+                return jsonify({'error': 'New password must be at least 6 characters'}), 400
+            
+            # Hash new password
+            data['password'] = password_hasher.hash(data['newPassword'])
+        except PasswordHasherBusy:
+            return jsonify({'error': 'Server busy, please try again'}), 503, {'Retry-After': '1'}
         
         # Remove password fields from data
         data.pop('currentPassword', None)
@@ -80,12 +84,19 @@ def update_profile(current_user):
         {'_id': ObjectId(current_user['id'])},
         {'$set': update_data}
     )
+    invalidate_principal(current_user['id'])
+    
+    # Tokens carry the name (served from the claims in JWT_STATELESS mode),
+    # and a password change should end other sessions: revoke the old
+    # tokens and hand this session a new one
+    reissue = 'password' in update_data or update_data.get('name', user.get('name')) != user.get('name')
+    if reissue:
+        revoke_tokens(current_user['id'])
     
     # Get updated user
     updated_user = db.users.find_one({'_id': ObjectId(current_user['id'])})
     
-    # Return updated user data
-    return jsonify({
+    response = {
         'id': str(updated_user['_id']),
         'name': updated_user['name'],
         'email': updated_user['email'],
@@ -94,4 +105,16 @@ def update_profile(current_user):
         'is_admin': updated_user.get('is_admin', False),
         'createdAt': updated_user.get('createdAt'),
         'updatedAt': updated_user.get('updatedAt')
-    })
\ No newline at end of file
+    }
+    if reissue:
+        response['token'] = generate_token(
+            updated_user['_id'],
+            updated_user.get('is_admin', False),
+            updated_user.get('role') == 'worker' or updated_user.get('is_worker', False),
+            name=updated_user.get('name'),
+            email=updated_user['email'],
+            token_version=updated_user.get('token_version', 0)
+        )
+    
+    # Return updated user data
+    return jsonify(response)
\ No newline at end of file
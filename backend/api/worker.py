@@ -2,79 +2,101 @@ from flask import Blueprint, request, jsonify, current_app
 from bson.objectid import ObjectId
 from datetime import datetime, timedelta
 from utils.auth_middleware import worker_required
+from utils.pagination import InvalidCursor, keyset_stages, parse_limit, split_page
+from utils.complaint_writes import complaint_written, comment_added
 
 worker_bp = Blueprint('worker', __name__)
 
+# Complaint fields the worker dashboard lists
+DASHBOARD_COMPLAINT_FIELDS = {
+    'subject': 1, 'description': 1, 'category': 1, 'status': 1, 'priority': 1,
+    'user_id': 1, 'user': 1, 'createdAt': 1, 'updatedAt': 1
+}
+
 @worker_bp.route('/dashboard', methods=['GET'])
 @worker_required
 def worker_dashboard(current_user):
     """
     Get worker dashboard data including assigned complaints
+
+    The assigned complaints are paginated newest first: limit (default 50,
+    max 200) and cursor (the next_cursor of the previous page). Stats and
+    recent activity always cover every assigned complaint.
     """
+    try:
+        limit = parse_limit(request.args.get('limit'))
+        page_stages = keyset_stages(limit, request.args.get('cursor'))
+    except (ValueError, InvalidCursor) as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         db = current_app.config['db']
         worker_id = ObjectId(current_user['id'])
+        one_week_ago = datetime.utcnow() - timedelta(days=7)
         
-        # Get assigned complaints
-        assigned_complaints = list(db.complaints.find({
-            'assigned_to': worker_id
-        }).sort('createdAt', -1))
+        # Complaint page, status counts and recent activity in one aggregation
+        # over the worker's complaints. Submitter name/email come from the
+        # user block embedded in each complaint.
+        result = next(db.complaints.aggregate([
+            {'$match': {'assigned_to': worker_id}},
+            {'$facet': {
+                'complaints': page_stages + [{'$project': DASHBOARD_COMPLAINT_FIELDS}],
+                'stats': [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}],
+                'recentActivity': [
+                    {'$match': {'updatedAt': {'$gte': one_week_ago}}},
+                    {'$sort': {'updatedAt': -1}},
+                    {'$limit': 5},
+                    {'$project': {'subject': 1, 'status': 1, 'updatedAt': 1}}
+                ]
+            }}
+        ]), None) or {}
+        
+        assigned_complaints, next_cursor = split_page(result.get('complaints', []), limit)
         
         # Format complaints for response
         formatted_complaints = []
         for complaint in assigned_complaints:
             formatted_complaint = {
-                'id': str(complaint['_id']),
+                'id': complaint['_id'],
                 'subject': complaint.get('subject', 'No subject'),
                 'description': complaint.get('description', ''),
                 'category': complaint.get('category', 'General'),
                 'status': complaint.get('status', 'pending'),
                 'priority': complaint.get('priority', 'medium'),
-                'createdAt': complaint.get('createdAt').isoformat() if 'createdAt' in complaint else None,
-                'updatedAt': complaint.get('updatedAt').isoformat() if 'updatedAt' in complaint else None
+                'createdAt': complaint.get('createdAt'),
+                'updatedAt': complaint.get('updatedAt')
             }
             
             # Add user info if available
-            if 'user_id' in complaint:
-                user = db.users.find_one({'_id': complaint['user_id']})
-                if user:
-                    formatted_complaint['user'] = {
-                        'id': str(user['_id']),
-                        'name': user.get('name', 'Unknown'),
-                        'email': user.get('email', '')
-                    }
+            if complaint.get('user') and complaint.get('user_id'):
+                formatted_complaint['user'] = {
+                    'id': str(complaint['user_id']),
+                    'name': complaint['user'].get('name', 'Unknown'),
+                    'email': complaint['user'].get('email', '')
+                }
             
             formatted_complaints.append(formatted_complaint)
         
         # Get worker stats
-        total_assigned = len(formatted_complaints)
-        pending = sum(1 for c in assigned_complaints if c.get('status') == 'pending')
-        in_progress = sum(1 for c in assigned_complaints if c.get('status') == 'in-progress')
-        resolved = sum(1 for c in assigned_complaints if c.get('status') == 'resolved')
-        
-        # Get recent activity
-        one_week_ago = datetime.utcnow() - timedelta(days=7)
-        recent_activity = list(db.complaints.find({
-            'assigned_to': worker_id,
-            'updatedAt': {'$gte': one_week_ago}
-        }).sort('updatedAt', -1).limit(5))
+        status_counts = {row['_id']: row['count'] for row in result.get('stats', [])}
         
         formatted_activity = []
-        for activity in recent_activity:
+        for activity in result.get('recentActivity', []):
             formatted_activity.append({
-                'id': str(activity['_id']),
+                'id': activity['_id'],
                 'subject': activity.get('subject', 'No subject'),
                 'status': activity.get('status', 'pending'),
-                'updatedAt': activity.get('updatedAt').isoformat() if 'updatedAt' in activity else None
+                'updatedAt': activity.get('updatedAt')
             })
         
         return jsonify({
             'complaints': formatted_complaints,
+            'next_cursor': next_cursor,
             'stats': {
-                'total': total_assigned,
-                'pending': pending,
-                'inProgress': in_progress,
-                'resolved': resolved
+                'total': sum(status_counts.values()),
+                'pending': status_counts.get('pending', 0),
+                'inProgress': status_counts.get('in-progress', 0),
+                'resolved': status_counts.get('resolved', 0)
             },
             'recentActivity': formatted_activity
         })
@@ -130,6 +152,7 @@ def update_complaint(current_user, complaint_id):
             {'_id': complaint_obj_id},
             {'$set': update_data}
         )
+        complaint_written(db, complaint, dict(complaint, **update_data))
         
         # Add comment if provided
         if 'comment' in data and data['comment']:
@@ -147,23 +170,27 @@ def update_complaint(current_user, complaint_id):
             
             db.complaints.update_one(
                 {'_id': complaint_obj_id},
-                {'$push': {'comments': comment}}
+                {
+                    '$push': {'comments': comment},
+                    '$set': {'updatedAt': comment['createdAt']}
+                }
             )
+            comment_added(db)
         
         # Get updated complaint
         updated_complaint = db.complaints.find_one({'_id': complaint_obj_id})
         
         # Format for response
         formatted_complaint = {
-            'id': str(updated_complaint['_id']),
+            'id': updated_complaint['_id'],
             'subject': updated_complaint.get('subject', 'No subject'),
             'description': updated_complaint.get('description', ''),
             'category': updated_complaint.get('category', 'General'),
             'status': updated_complaint.get('status', 'pending'),
             'priority': updated_complaint.get('priority', 'medium'),
             'resolution': updated_complaint.get('resolution', ''),
-            'createdAt': updated_complaint.get('createdAt').isoformat() if 'createdAt' in updated_complaint else None,
-            'updatedAt': updated_complaint.get('updatedAt').isoformat() if 'updatedAt' in updated_complaint else None
+            'createdAt': updated_complaint.get('createdAt'),
+            'updatedAt': updated_complaint.get('updatedAt')
         }
         
         return jsonify({
@@ -1,193 +1,248 @@
 import os
+import threading
 from flask import Flask, jsonify, current_app
 from flask_cors import CORS
 from dotenv import load_dotenv
-from pymongo import MongoClient
 from flask_mail import Mail
-from twilio.rest import Client
 from datetime import datetime
+from utils.principal_cache import principal_cache
+from utils.db import LazyDatabase, get_client, pool_stats
+from utils.leases import SCHEDULER_LEASE, lease_status
+from utils.escalation_timer import escalation_timer
+from utils.db_metrics import init_db_metrics
+from utils.metrics import init_request_metrics, render_metrics
+from utils.profiling import init_profiling
+from utils.json_provider import init_json
 
-# Import scheduler
-from scheduled_tasks import init_scheduler
-
-# Import routes
-from api.auth import auth_bp
-from api.complaints import complaints_bp
-from api.admin import admin_bp
-from api.chatbot import chatbot_bp
-from api.users import users_bp
-from api.categories import categories_bp
-from api.complaints_updates import complaint_updates_bp
-from api.rewards import rewards_bp
-from api.reward_levels import reward_levels_bp
-from api.feedback import feedback_bp
-
-# Initialize mail and WhatsApp services
+# Initialize mail service (Twilio is created on first use, see
+# utils.notifications.get_twilio_client)
 mail = Mail()
-twilio_client = None
 
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
-
-# Configure CORS with explicit settings
-CORS(app, 
-     origins=["http://localhost:3000"], 
-     supports_credentials=True,
-     allow_headers=["Content-Type", "Authorization"],
-     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"])
-
-# MongoDB Atlas connection
-print('Connecting to MongoDB Atlas cloud database...')
-MONGO_URI = os.getenv('MONGO_URI')
-if not MONGO_URI:
-    print('MONGO_URI environment variable not set. Please configure your MongoDB Atlas connection string.')
-    print('Creating mock database for development...')
-    from unittest.mock import MagicMock
-    mock_db = MagicMock()
-    app.config['db'] = mock_db
-    print('Mock database created. Application will run with limited functionality.')
+
+def create_mock_database(app):
+    print('Creating in-memory database for development...')
+    from utils.memory_db import MemoryDatabase
+    app.config['db'] = MemoryDatabase()
+    print('In-memory database created. Data will be lost when the server stops.')
+
+
+def init_database(app):
+    """
+    Configure app.config['db'].
+
+    The MongoClient is created per process on first use (see utils.db), so
+    no connection is made here unless MONGO_PING_ON_STARTUP is set.
+    """
+    # MongoDB Atlas connection
+    print('Connecting to MongoDB Atlas cloud database...')
+    MONGO_URI = os.getenv('MONGO_URI')
+    if os.getenv('DB_BACKEND', 'mongo').lower() == 'memory':
+        create_mock_database(app)
+        return
+    if not MONGO_URI:
+        print('MONGO_URI environment variable not set. Please configure your MongoDB Atlas connection string.')
+        create_mock_database(app)
+        return
     
-    # Initialize collections in the mock database
-    mock_db.users = MagicMock()
-    mock_db.complaints = MagicMock()
-    mock_db.categories = MagicMock()
-    mock_db.agents = MagicMock()
-else:
-    try:
-        # Configure MongoDB client with TLS for cloud connection
-        client = MongoClient(
-            MONGO_URI,
-            tls=True,
-            tlsAllowInvalidCertificates=True,  # Disable certificate verification (for development only)
-            serverSelectionTimeoutMS=5000  # Reduce timeout for faster feedback
-        )
-        # Test the connection
-        client.admin.command('ping')
-        print('Successfully connected to MongoDB Atlas!')
-        db = client.get_database()
-        # Make db available to routes
-        app.config['db'] = db
-    except Exception as e:
-        print('Failed to connect to MongoDB Atlas:')
-        print(f'Error: {str(e)}')
-        # Create a mock database for development if MongoDB connection fails
-        print('Creating mock database for development...')
-        from unittest.mock import MagicMock
-        mock_db = MagicMock()
-        app.config['db'] = mock_db
-        print('Mock database created. Application will run with limited functionality.')
-        
-        # Initialize collections in the mock database
-        mock_db.users = MagicMock()
-        mock_db.complaints = MagicMock()
-        mock_db.categories = MagicMock()
-        mock_db.agents = MagicMock()
-
-# Secret key for JWT
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-
-# Configure email settings
-app.config['MAIL_SERVER'] = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = int(os.getenv('SMTP_PORT', 587))
-app.config['MAIL_USE_TLS'] = True  # Always use TLS for security
-app.config['MAIL_USERNAME'] = os.getenv('SMTP_USERNAME')
-app.config['MAIL_PASSWORD'] = os.getenv('SMTP_PASSWORD')
-app.config['MAIL_DEFAULT_SENDER'] = os.getenv('FROM_EMAIL')
-mail.init_app(app)
-
-# Configure Twilio for WhatsApp
-TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
-TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN')
-TWILIO_WHATSAPP_NUMBER = os.getenv('TWILIO_WHATSAPP_NUMBER')
-
-if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
-    try:
-        twilio_client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
-        app.config['twilio_client'] = twilio_client
-        print('Successfully initialized Twilio client')
-    except Exception as e:
-        print(f'Failed to initialize Twilio client: {str(e)}')
-
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-from api.worker import worker_bp
-
-app.register_blueprint(complaints_bp, url_prefix='/api/complaints')
-app.register_blueprint(admin_bp, url_prefix='/api/admin')
-app.register_blueprint(chatbot_bp, url_prefix='/api/chatbot')
-app.register_blueprint(users_bp, url_prefix='/api/users')
-app.register_blueprint(categories_bp, url_prefix='/api/categories')
-app.register_blueprint(complaint_updates_bp, url_prefix='/api/complaint_updates')
-app.register_blueprint(rewards_bp, url_prefix='/api/rewards')
-app.register_blueprint(reward_levels_bp, url_prefix='/api/reward-levels')
-app.register_blueprint(feedback_bp, url_prefix='/api/feedback')
-app.register_blueprint(worker_bp, url_prefix='/api/worker')
-
-# Root route
-@app.route('/')
-def index():
-    return jsonify({
-        'message': 'GrievAI - Grievance Management System API',
-        'status': 'healthy',
-        'version': '1.0.0',
-        'database': 'connected' if 'db' in app.config and hasattr(app.config['db'], 'name') else 'mock'
-    })
-
-# Explicit static uploads route with CORS — allows React (localhost:3000)
-# to load images stored in backend/static/uploads/
-@app.route('/static/uploads/<path:filename>')
-def serve_upload(filename):
-    from flask import send_from_directory, make_response
-    uploads_dir = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
-    response = make_response(send_from_directory(uploads_dir, filename))
-    response.headers['Access-Control-Allow-Origin'] = 'http://localhost:3000'
-    response.headers['Access-Control-Allow-Credentials'] = 'true'
-    response.headers['Cache-Control'] = 'public, max-age=86400'
-    return response
-
-
-
-# Health check endpoint
-@app.route('/api/health')
-def health_check():
-    # Check database connection
-    db_status = 'connected'
-    try:
-        # Try to ping the database
-        current_app.config['db'].command('ping')
-    except Exception as e:
-        db_status = f'error: {str(e)}'
+    # Make db available to routes
+    app.config['db'] = LazyDatabase()
     
-    return jsonify({
-        'status': 'ok',
-        'timestamp': datetime.utcnow().isoformat(),
-        'database': db_status,
-        'version': '1.0.0'
-    })
-
-# Error handlers
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({
-        'error': 'Not Found',
-        'message': 'The requested resource was not found on this server.'
-    }), 404
-
-@app.errorhandler(500)
-def server_error(error):
-    return jsonify({
-        'error': 'Internal Server Error',
-        'message': 'An unexpected error occurred.'
-    }), 500
-
-# Health check endpoint for Railway (removed duplicate route)
-
-# Initialize the scheduler
-init_scheduler(app)
+    # Test the connection (optional, costs a round-trip at startup)
+    if os.getenv('MONGO_PING_ON_STARTUP', 'false').lower() == 'true':
+        try:
+            get_client().admin.command('ping')
+            print('Successfully connected to MongoDB Atlas!')
+        except Exception as e:
+            print('Failed to connect to MongoDB Atlas:')
+            print(f'Error: {str(e)}')
+            # Create a mock database for development if MongoDB connection fails
+            create_mock_database(app)
+
+
+def register_blueprints(app):
+    # Import routes
+    from api.auth import auth_bp
+    from api.complaints import complaints_bp
+    from api.admin import admin_bp
+    from api.chatbot import chatbot_bp
+    from api.users import users_bp
+    from api.categories import categories_bp
+    from api.complaints_updates import complaint_updates_bp
+    from api.rewards import rewards_bp
+    from api.reward_levels import reward_levels_bp
+    from api.feedback import feedback_bp
+    from api.worker import worker_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(complaints_bp, url_prefix='/api/complaints')
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    app.register_blueprint(chatbot_bp, url_prefix='/api/chatbot')
+    app.register_blueprint(users_bp, url_prefix='/api/users')
+    app.register_blueprint(categories_bp, url_prefix='/api/categories')
+    app.register_blueprint(complaint_updates_bp, url_prefix='/api/complaint_updates')
+    app.register_blueprint(rewards_bp, url_prefix='/api/rewards')
+    app.register_blueprint(reward_levels_bp, url_prefix='/api/reward-levels')
+    app.register_blueprint(feedback_bp, url_prefix='/api/feedback')
+    app.register_blueprint(worker_bp, url_prefix='/api/worker')
+
+
+def register_routes(app):
+    # Root route
+    @app.route('/')
+    def index():
+        return jsonify({
+            'message': 'GrievAI - Grievance Management System API',
+            'status': 'healthy',
+            'version': '1.0.0',
+            'database': 'connected' if isinstance(app.config.get('db'), LazyDatabase) else 'memory'
+        })
+
+    # Explicit static uploads route with CORS — allows React (localhost:3000)
+    # to load images stored in backend/static/uploads/
+    @app.route('/static/uploads/<path:filename>')
+    def serve_upload(filename):
+        from flask import send_from_directory, make_response
+        uploads_dir = os.path.join(os.path.dirname(__file__), 'static', 'uploads')
+        response = make_response(send_from_directory(uploads_dir, filename))
+        response.headers['Access-Control-Allow-Origin'] = 'http://localhost:3000'
+        response.headers['Access-Control-Allow-Credentials'] = 'true'
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+        return response
+
+    # Health check endpoint
+    @app.route('/api/health')
+    def health_check():
+        # Check database connection
+        db_status = 'connected'
+        try:
+            # Try to ping the database
+            current_app.config['db'].command('ping')
+            if not isinstance(current_app.config['db'], LazyDatabase):
+                db_status = 'memory'
+        except Exception as e:
+            db_status = f'error: {str(e)}'
+
+        # Which process runs the scheduled jobs (see utils/leases.py)
+        try:
+            scheduler_lease = lease_status(current_app.config['db'], SCHEDULER_LEASE,
+                                           current_app.extensions.get('scheduler_lease'))
+        except Exception as e:
+            scheduler_lease = {'error': str(e)}
+        
+        return jsonify({
+            'status': 'ok',
+            'timestamp': datetime.utcnow().isoformat(),
+            'database': db_status,
+            'version': '1.0.0',
+            'principalCache': principal_cache.stats(),
+            'mongoPool': pool_stats() if isinstance(current_app.config['db'], LazyDatabase) else None,
+            'scheduler': 'running' if 'scheduler' in current_app.extensions else 'not started',
+            'schedulerLease': scheduler_lease,
+            'escalationTimer': escalation_timer.stats()
+        })
+
+    # Prometheus metrics endpoint (text exposition format)
+    @app.route('/api/metrics')
+    def metrics():
+        body, content_type = render_metrics()
+        return body, 200, {'Content-Type': content_type}
+
+    # Error handlers
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({
+            'error': 'Not Found',
+            'message': 'The requested resource was not found on this server.'
+        }), 404
+
+    @app.errorhandler(500)
+    def server_error(error):
+        return jsonify({
+            'error': 'Internal Server Error',
+            'message': 'An unexpected error occurred.'
+        }), 500
+
+
+def enable_scheduler(app):
+    """Start the escalation scheduler for this app (idempotent)"""
+    from scheduled_tasks import init_scheduler
+    with app.extensions['scheduler_lock']:
+        if 'scheduler' not in app.extensions:
+            app.extensions['scheduler'] = init_scheduler(app)
+    return app.extensions['scheduler']
+
+
+def create_app(scheduler_mode=None):
+    """
+    Build and configure the Flask application.
+
+    Heavy optional integrations are not touched here: Gemini and the audio
+    libraries load on the first chatbot request that needs them, Twilio on
+    the first WhatsApp send. The scheduler is controlled by ``scheduler_mode``
+    (default: the SCHEDULER_MODE env var):
+
+    - ``lazy``  (default) start on the first request this process serves
+    - ``eager`` start now
+    - ``off``   never start automatically; call enable_scheduler(app)
+    """
+    # Initialize Flask app
+    app = Flask(__name__)
+    # jsonify() serializes ObjectId and datetime directly (orjson when installed)
+    init_json(app)
+
+    # Configure CORS with explicit settings
+    CORS(app, 
+         origins=["http://localhost:3000"], 
+         supports_credentials=True,
+         allow_headers=["Content-Type", "Authorization"],
+         methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"])
+
+    init_database(app)
+
+    # Secret key for JWT
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
+    # Build current_user from signed token claims instead of a per-request user lookup
+    app.config['JWT_STATELESS'] = os.getenv('JWT_STATELESS', 'false').lower() == 'true'
+
+    # Configure email settings
+    app.config['MAIL_SERVER'] = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
+    app.config['MAIL_PORT'] = int(os.getenv('SMTP_PORT', 587))
+    app.config['MAIL_USE_TLS'] = True  # Always use TLS for security
+    app.config['MAIL_USERNAME'] = os.getenv('SMTP_USERNAME')
+    app.config['MAIL_PASSWORD'] = os.getenv('SMTP_PASSWORD')
+    app.config['MAIL_DEFAULT_SENDER'] = os.getenv('FROM_EMAIL')
+    mail.init_app(app)
+
+    # Report per-request DB command counts in Server-Timing and request logs
+    init_db_metrics(app)
+    # Per-endpoint latency histograms and in-flight gauge for /api/metrics
+    init_request_metrics(app)
+    # Capture profiles of slow / sampled requests (PROFILE_SLOW_MS, PROFILE_SAMPLE_RATE)
+    init_profiling(app)
+
+    # Register blueprints
+    register_blueprints(app)
+    register_routes(app)
+
+    # Initialize the scheduler
+    app.extensions['scheduler_lock'] = threading.Lock()
+    scheduler_mode = scheduler_mode or os.getenv('SCHEDULER_MODE', 'lazy')
+    if scheduler_mode == 'eager':
+        enable_scheduler(app)
+    elif scheduler_mode == 'lazy':
+        @app.before_request
+        def _start_scheduler_on_first_request():
+            if 'scheduler' not in app.extensions:
+                enable_scheduler(app)
+
+    return app
+
+
+app = create_app()
 
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
@@ -199,4 +254,4 @@ if __name__ == '__main__':
         # 'watchdog' causes "not a socket" crashes on Windows — use 'stat' instead
         reloader_type='stat' if is_dev else None,
         threaded=True
-    )
\ No newline at end of file
+    )
\ No newline at end of file
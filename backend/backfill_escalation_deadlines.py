@@ -0,0 +1,32 @@
+import os
+import sys
+from dotenv import load_dotenv
+from utils.db import get_client
+from utils.escalation import backfill_escalation_deadlines
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB Atlas connection
+MONGO_URI = os.getenv('MONGO_URI')
+if not MONGO_URI:
+    print('MONGO_URI environment variable not set. Please configure your MongoDB Atlas connection string.')
+    sys.exit(1)
+
+try:
+    # Same client options as the app (see utils/db.py)
+    client = get_client()
+    client.admin.command('ping')
+    print('Successfully connected to MongoDB Atlas!')
+    db = client.get_database()
+    
+    # Index the escalation sweep queries (also created by init_db.py)
+    db.complaints.create_index([('status', 1), ('escalateAt', 1)])
+    
+    # Set escalateAt = createdAt + priority threshold on complaints created before deadlines were stored
+    updated = backfill_escalation_deadlines(db)
+    print(f"Set escalation deadlines on {updated} complaints.")
+
+except Exception as e:
+    print(f'Error: {str(e)}')
+    sys.exit(1)
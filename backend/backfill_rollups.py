@@ -0,0 +1,38 @@
+import os
+import sys
+from dotenv import load_dotenv
+from utils.db import get_client
+from utils.rollups import backfill_rollups
+from utils.stats_counters import reconcile_counters
+
+# Load environment variables
+load_dotenv()
+
+# MongoDB Atlas connection
+MONGO_URI = os.getenv('MONGO_URI')
+if not MONGO_URI:
+    print('MONGO_URI environment variable not set. Please configure your MongoDB Atlas connection string.')
+    sys.exit(1)
+
+try:
+    # Same client options as the app (see utils/db.py)
+    client = get_client()
+    client.admin.command('ping')
+    print('Successfully connected to MongoDB Atlas!')
+    db = client.get_database()
+    
+    # Rebuild the dashboard counters and the daily rollups from the complaints collection
+    report = reconcile_counters(db)
+    if report['drift']:
+        print(f"Corrected {len(report['drift'])} drifted counters:")
+        for path, values in report['drift'].items():
+            print(f"  {path}: {values['stored']} -> {values['actual']}")
+    else:
+        print('Stats counters were up to date.')
+    
+    result = backfill_rollups(db)
+    print(f"Corrected {result['corrected']} of {result['buckets']} daily rollup documents from {result['complaints']} complaints.")
+
+except Exception as e:
+    print(f'Error: {str(e)}')
+    sys.exit(1)
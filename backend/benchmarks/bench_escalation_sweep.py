@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+bench_escalation_sweep.py — Compare the escalation sweep before and after escalateAt.
+
+Usage:
+    python benchmarks/bench_escalation_sweep.py [--complaints 100000]
+        [--overdue 0.01] [--users 1000] [--repeat 3] [--mongo]
+        [--database bench_escalation]
+
+Run this from the backend directory. It fills a complaints collection with
+active complaints (pending/in-progress, with escalateAt set as the app now
+stores it) owned by --users users, and times one full escalation sweep two
+ways, refilling the collection before every run:
+
+  loop   the sweep before escalateAt: every active complaint is read and its
+         age compared with the priority threshold in Python; each overdue
+         one gets its own update_one, stats bookkeeping and user lookup
+  sweep  run_escalation_sweep (utils/escalation.py): the DEADLINE_RULES
+         aggregation over the (status, escalateAt) index, bulk_write batches
+         of ESCALATION_BATCH_SIZE and one $in user lookup for the digests
+
+Emails are not sent by either: the loop looks the user up and stops there,
+and the sweep's digests are built and handed to a no-op queue, so the
+numbers compare database and Python work only.
+
+--overdue is the fraction of complaints past their deadline. With --mongo
+the collection is created in --database on MONGO_URI (dropped afterwards)
+and the documents examined by each sweep's candidate query are reported
+from explain(); otherwise the in-memory backend (utils/memory_db.py) is
+used, which has no indexes, so only the difference in documents decoded,
+compared and written shows.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+import utils.escalation as escalation
+from utils.complaint_writes import complaint_written
+from utils.escalation import ACTIVE_STATUSES, due_query, escalation_deadline, run_escalation_sweep, threshold_hours
+
+INSERT_BATCH = 10000
+
+
+def make_complaints(count, overdue, now, user_ids):
+    priorities = ['high', 'medium', 'low']
+    for i in range(count):
+        priority = priorities[i % 3]
+        threshold = threshold_hours(priority)
+        if random.random() < overdue:
+            age = threshold + random.uniform(0.1, 48)
+        else:
+            age = random.uniform(0, threshold - 0.1)
+        complaint = {
+            'subject': f'Complaint {i}',
+            'category': 'hardware',
+            'status': ACTIVE_STATUSES[i % 2],
+            'priority': priority,
+            'user_id': user_ids[i % len(user_ids)],
+            'createdAt': now - timedelta(hours=age),
+            'comments': []
+        }
+        complaint['escalateAt'] = escalation_deadline(complaint)
+        yield complaint
+
+
+def fill(db, count, overdue, now, user_ids, seed):
+    random.seed(seed)
+    db.complaints.delete_many({})
+    db.complaints.create_index([('status', 1), ('escalateAt', 1)])
+    batch = []
+    for complaint in make_complaints(count, overdue, now, user_ids):
+        batch.append(complaint)
+        if len(batch) >= INSERT_BATCH:
+            db.complaints.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db.complaints.insert_many(batch, ordered=False)
+
+
+def loop(db, now):
+    """The scheduled sweep before escalateAt, minus sending the emails"""
+    escalated = 0
+    for complaint in db.complaints.find({'status': {'$in': ACTIVE_STATUSES}}):
+        created_at = complaint.get('createdAt')
+        if not created_at:
+            continue
+        priority = complaint.get('priority', 'low').lower()
+        hours = (now - created_at).total_seconds() / 3600
+        if hours < threshold_hours(priority):
+            continue
+        fields = {'status': 'escalated', 'escalatedAt': now, 'updatedAt': now}
+        db.complaints.update_one(
+            {'_id': complaint['_id']},
+            {'$set': fields, '$push': {'comments': escalation_comment(priority, now)}}
+        )
+        complaint_written(db, complaint, dict(complaint, **fields))
+        if complaint.get('user_id'):
+            db.users.find_one({'_id': complaint['user_id']})
+        escalated += 1
+    return escalated
+
+
+def escalation_comment(priority, now):
+    return escalation.system_comment(
+        f"Complaint automatically escalated due to exceeding time threshold for {priority} priority.", now
+    )
+
+
+def sweep(db, now):
+    return len(run_escalation_sweep(db, now)['escalated'])
+
+
+def examined(db, query):
+    stats = db.complaints.find(query).explain().get('executionStats', {})
+    return stats.get('totalDocsExamined'), stats.get('totalKeysExamined')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--complaints', type=int, default=100000)
+    parser.add_argument('--overdue', type=float, default=0.01)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--mongo', action='store_true', help='use MONGO_URI instead of the in-memory backend')
+    parser.add_argument('--database', default='bench_escalation')
+    args = parser.parse_args()
+
+    if args.mongo:
+        from utils.db import get_client
+        client = get_client()
+        client.drop_database(args.database)
+        db = client[args.database]
+    else:
+        from utils.memory_db import MemoryDatabase
+        db = MemoryDatabase(args.database)
+
+    # Digests are built but not sent
+    escalation.queue_escalation_digest = lambda email, name, complaints: None
+
+    user_ids = [ObjectId() for _ in range(args.users)]
+    db.users.insert_many([
+        {'_id': user_id, 'name': f'User {i}', 'email': f'user{i}@example.com'}
+        for i, user_id in enumerate(user_ids)
+    ])
+
+    now = datetime.utcnow()
+    print(f"{args.complaints} active complaints, {args.overdue:.1%} overdue, {args.users} users "
+          f"({'MongoDB' if args.mongo else 'in-memory'})\n")
+
+    results = []
+    for name, run in (('loop', loop), ('sweep', sweep)):
+        durations = []
+        for repeat in range(args.repeat):
+            fill(db, args.complaints, args.overdue, now, user_ids, seed=42 + repeat)
+            started = time.perf_counter()
+            found = run(db, now)
+            durations.append(time.perf_counter() - started)
+        results.append((name, statistics.median(durations) * 1000, found))
+
+    if results[0][2] != results[1][2]:
+        print(f"WARNING: loop escalated {results[0][2]} complaints, sweep escalated {results[1][2]}\n")
+
+    baseline = results[0][1]
+    print(f"{'sweep':<6} {'median ms':>10} {'escalated':>10} {'speedup':>8}")
+    for name, median_ms, found in results:
+        print(f"{name:<6} {median_ms:>10.1f} {found:>10} {baseline / median_ms:>7.1f}x")
+
+    if args.mongo:
+        fill(db, args.complaints, args.overdue, now, user_ids, seed=42)
+        print("\ncandidate query documents / index keys examined")
+        print(f"  loop   {examined(db, {'status': {'$in': ACTIVE_STATUSES}})}")
+        print(f"  sweep  {examined(db, due_query(now))}")
+        client.drop_database(args.database)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+bench_import_time.py — Guard the cold-start cost of `import app`.
+
+Usage:
+    python benchmarks/bench_import_time.py [--runs 5] [--budget-ms 800] [--top 15]
+
+Run this from the backend directory. It imports the app in fresh interpreters
+with `python -X importtime`, reports the median total import time and the
+slowest modules, and exits non-zero if the median exceeds the budget or if
+any of the deferred integrations (Gemini, Twilio, audio libraries,
+APScheduler) were imported at start-up.
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that create_app() must not import; they load on first use
+DEFERRED_MODULES = [
+    'google.generativeai',
+    'twilio.rest',
+    'speech_recognition',
+    'pydub',
+    'numpy',
+    'apscheduler.schedulers.background',
+]
+
+
+def measure_once():
+    """Import the app once and return {module: cumulative_us}"""
+    env = dict(os.environ, SCHEDULER_MODE='off')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        sys.exit(f"import app failed with exit code {result.returncode}")
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=800)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.runs)]
+    totals_ms = [run['app'] / 1000 for run in runs]
+    median_ms = statistics.median(totals_ms)
+    last = runs[-1]
+
+    print(f"import app: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {min(totals_ms):.1f}, max {max(totals_ms):.1f}, budget {args.budget_ms:.0f})")
+    print(f"\nSlowest modules (cumulative, last run):")
+    for name, cumulative in sorted(last.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failures = []
+    loaded = [name for name in DEFERRED_MODULES if name in last]
+    if loaded:
+        failures.append(f"deferred modules imported at start-up: {', '.join(loaded)}")
+    if median_ms > args.budget_ms:
+        failures.append(f"median import time {median_ms:.1f} ms exceeds budget {args.budget_ms:.0f} ms")
+
+    if failures:
+        print()
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+bench_json_serialization.py — Compare complaint list serialization paths.
+
+Usage:
+    python benchmarks/bench_json_serialization.py [--complaints 10000]
+        [--comments 20] [--repeat 5]
+
+Run this from the backend directory. It builds complaint documents shaped
+like pymongo returns them (ObjectIds, datetimes, embedded comments) and
+times turning the list into a response body three ways:
+
+  legacy    format_complaint() per document + Flask's default provider
+            (the code path before utils/json_provider.py)
+  stdlib    JSONProvider with the standard library encoder
+  orjson    JSONProvider with orjson (skipped if it is not installed)
+
+Document generation and the copies the legacy path needs (it mutates its
+input) are excluded from the timings.
+"""
+
+import os
+import sys
+import copy
+import time
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+import utils.json_provider as json_provider
+
+
+def legacy_format_complaint(complaint):
+    """format_complaint as it was duplicated in api/complaints.py and api/admin.py"""
+    if not complaint:
+        return None
+    complaint['_id'] = str(complaint['_id'])
+    if 'user_id' in complaint:
+        complaint['user_id'] = str(complaint['user_id'])
+    if 'assigned_to' in complaint and complaint['assigned_to']:
+        complaint['assigned_to'] = str(complaint['assigned_to'])
+    for date_field in ['createdAt', 'updatedAt', 'assignedAt', 'inProgressAt', 'resolvedAt', 'escalatedAt']:
+        if date_field in complaint and complaint[date_field]:
+            complaint[date_field] = complaint[date_field].isoformat()
+    if 'comments' in complaint and complaint['comments']:
+        for comment in complaint['comments']:
+            if '_id' in comment:
+                comment['_id'] = str(comment['_id'])
+            if 'user_id' in comment:
+                comment['user_id'] = str(comment['user_id'])
+            if 'createdAt' in comment:
+                comment['createdAt'] = comment['createdAt'].isoformat()
+    return complaint
+
+
+def make_complaints(count, comments):
+    now = datetime.utcnow()
+    user_ids = [ObjectId() for _ in range(50)]
+    complaints = []
+    for i in range(count):
+        created = now - timedelta(minutes=i)
+        complaints.append({
+            '_id': ObjectId(),
+            'subject': f'Printer on floor {i % 7} is not working',
+            'description': 'The printer shows a paper jam error even though the tray is empty. ' * 3,
+            'category': ['hardware', 'software', 'network', 'billing'][i % 4],
+            'subcategory': 'printer',
+            'status': ['pending', 'in-progress', 'resolved', 'escalated'][i % 4],
+            'priority': ['low', 'medium', 'high'][i % 3],
+            'user_id': user_ids[i % 50],
+            'user': {'name': f'User {i % 50}', 'email': f'user{i % 50}@example.com'},
+            'assigned_to': user_ids[(i + 1) % 50] if i % 2 else None,
+            'createdAt': created,
+            'updatedAt': created + timedelta(hours=1),
+            'lastViewedAt': created + timedelta(hours=2),
+            'comments': [{
+                '_id': ObjectId(),
+                'user_id': user_ids[j % 50],
+                'content': f'Update {j}: technician checked the device.',
+                'isSystem': j % 5 == 0,
+                'createdAt': created + timedelta(minutes=j)
+            } for j in range(comments)],
+            'imageUrl': None,
+            'detectedObjects': ['printer', 'paper']
+        })
+    return complaints
+
+
+def time_path(name, serialize, complaints, repeat, needs_copy):
+    durations = []
+    size = 0
+    for _ in range(repeat):
+        data = copy.deepcopy(complaints) if needs_copy else complaints
+        started = time.perf_counter()
+        body = serialize(data)
+        durations.append(time.perf_counter() - started)
+        size = len(body)
+    return {'name': name, 'median_ms': statistics.median(durations) * 1000,
+            'min_ms': min(durations) * 1000, 'size_mb': size / 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--complaints', type=int, default=10000)
+    parser.add_argument('--comments', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    legacy_provider = DefaultJSONProvider(app)
+    provider = json_provider.JSONProvider(app)
+    orjson = json_provider.orjson
+
+    complaints = make_complaints(args.complaints, args.comments)
+    print(f"{args.complaints} complaints x {args.comments} comments, median of {args.repeat} runs\n")
+
+    def legacy(data):
+        return legacy_provider.dumps([legacy_format_complaint(c) for c in data], separators=(',', ':')).encode()
+
+    def stdlib(data):
+        json_provider.orjson = None
+        try:
+            return provider.dumps_bytes(data)
+        finally:
+            json_provider.orjson = orjson
+
+    results = [
+        time_path('legacy', legacy, complaints, args.repeat, needs_copy=True),
+        time_path('stdlib', stdlib, complaints, args.repeat, needs_copy=False),
+    ]
+    if orjson is not None:
+        results.append(time_path('orjson', provider.dumps_bytes, complaints, args.repeat, needs_copy=False))
+    else:
+        print("orjson is not installed; skipping the orjson path\n")
+
+    baseline = results[0]['median_ms']
+    print(f"{'path':<8} {'median ms':>10} {'min ms':>9} {'body MB':>8} {'speedup':>8}")
+    for result in results:
+        print(f"{result['name']:<8} {result['median_ms']:>10.1f} {result['min_ms']:>9.1f} "
+              f"{result['size_mb']:>8.2f} {baseline / result['median_ms']:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+bench_password_hashing.py — Measure login throughput of the password hasher.
+
+Usage:
+    python benchmarks/bench_password_hashing.py [--rounds 10000 29000 100000]
+        [--workers 1 2 4] [--queue 16] [--clients 32] [--logins 200]
+
+Run this from the backend directory. For each combination of pbkdf2 rounds
+and executor size it fires ``--logins`` verifications from ``--clients``
+concurrent request threads and reports logins/sec, p95 latency and how many
+logins were shed with 503 because the queue was full.
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def run(rounds, workers, queue, clients, logins):
+    hasher = PasswordHasher(rounds=rounds, max_workers=workers, max_queue=queue)
+    stored_hash = hasher.hash('correct horse battery staple')
+
+    def login(_):
+        started = time.perf_counter()
+        try:
+            ok = hasher.verify('correct horse battery staple', stored_hash)
+        except PasswordHasherBusy:
+            return None
+        assert ok
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(r for r in results if r is not None)
+    served = len(latencies)
+    p95 = latencies[int(served * 0.95) - 1] if served else 0.0
+    return {
+        'served': served,
+        'rejected': logins - served,
+        'logins_per_sec': served / elapsed if elapsed else 0.0,
+        'p95_ms': p95 * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10000, 29000, 100000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, os.cpu_count() or 4])
+    parser.add_argument('--queue', type=int, default=16)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--logins', type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>8} {'workers':>8} {'logins/s':>10} {'p95 ms':>9} {'served':>7} {'503s':>6}")
+    for rounds in args.rounds:
+        for workers in args.workers:
+            result = run(rounds, workers, args.queue, args.clients, args.logins)
+            print(f"{rounds:>8} {workers:>8} {result['logins_per_sec']:>10.1f} "
+                  f"{result['p95_ms']:>9.1f} {result['served']:>7} {result['rejected']:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+import os
+import shutil
+
+# Gunicorn picks this file up automatically when started from the backend
+# directory, e.g. `gunicorn app:app`.
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Metrics from every worker are aggregated through this directory
+# (see utils/metrics.py). It has to exist before the app is imported, which
+# happens before on_starting when preload_app is on, so it is created here.
+# This file is read again on SIGHUP while workers keep running, so clearing
+# out a previous run's samples is left to on_starting, which runs once.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/grievai-metrics')
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
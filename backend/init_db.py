@@ -1,8 +1,10 @@
 import os
-from pymongo import MongoClient
 from passlib.hash import pbkdf2_sha256
 from datetime import datetime
 from dotenv import load_dotenv
+from utils.db import get_client
+from utils.etags import VERSION_INDEX
+from utils.jobs import ACTIVE_JOB_INDEX
 
 # Load environment variables
 load_dotenv()
@@ -14,13 +16,8 @@ if not MONGO_URI:
 
 try:
     print('Attempting to connect to MongoDB Atlas...')
-    # Configure MongoDB client with appropriate options for Atlas
-    client = MongoClient(
-        MONGO_URI,
-        tls=True,
-        tlsAllowInvalidCertificates=True,  # For development only
-        serverSelectionTimeoutMS=5000  # Reduce timeout for faster feedback
-    )
+    # Same client options as the app (see utils/db.py)
+    client = get_client()
     # Test the connection
     client.admin.command('ping')
     print('Successfully connected to MongoDB Atlas!')
@@ -79,8 +76,24 @@ def init_db():
     # Create indexes
     db.users.create_index('email', unique=True)
     db.complaints.create_index('user_id')
-    db.complaints.create_index('status')
-    db.complaints.create_index('createdAt')
+    # Keyset pagination for the admin complaint list (see utils/pagination.py):
+    # each filter field followed by the (createdAt, _id) sort key. These also
+    # serve plain status/createdAt lookups, so status_1 and createdAt_1 from
+    # older deployments can be dropped.
+    db.complaints.create_index([('createdAt', -1), ('_id', -1)])
+    for field in ('status', 'category', 'priority', 'assigned_to'):
+        db.complaints.create_index([(field, 1), ('createdAt', -1), ('_id', -1)])
+    # Version lookups for ETags (see utils/etags.py), answered from the index
+    db.complaints.create_index(VERSION_INDEX)
+    # Escalation sweep: active complaints past their deadline (see utils/escalation.py)
+    db.complaints.create_index([('status', 1), ('escalateAt', 1)])
+    # Daily rollups are read by day range (see utils/rollups.py)
+    db.stats_daily.create_index('day')
+    # Drop scheduler leases long after they expired (see utils/leases.py)
+    db.leases.create_index('expiresAt', expireAfterSeconds=86400)
+    # One active background job per dedupe key (see utils/jobs.py)
+    db.jobs.create_index(ACTIVE_JOB_INDEX, unique=True, partialFilterExpression={'active': True})
+    db.jobs.create_index('createdAt')
     db.rewards.create_index('user_id')
     db.rewards.create_index('timestamp')
     
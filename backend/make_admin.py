@@ -1,7 +1,7 @@
-from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 import sys
+from utils.db import get_client
 
 # Load environment variables
 load_dotenv()
@@ -13,13 +13,8 @@ if not MONGO_URI:
     sys.exit(1)
 
 try:
-    # Configure MongoDB client with TLS for cloud connection
-    client = MongoClient(
-        MONGO_URI,
-        tls=True,
-        tlsAllowInvalidCertificates=True,  # Disable certificate verification (for development only)
-        serverSelectionTimeoutMS=5000  # Reduce timeout for faster feedback
-    )
+    # Same client options as the app (see utils/db.py)
+    client = get_client()
     # Test the connection
     client.admin.command('ping')
     print('Successfully connected to MongoDB Atlas!')
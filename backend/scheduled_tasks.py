@@ -1,25 +1,20 @@
-import os
 import time
 import atexit
 from datetime import datetime, timedelta
-from flask import Flask
-from apscheduler.schedulers.background import BackgroundScheduler  # type: ignore[import]
-from pymongo import MongoClient
-from typing import Any
 from dotenv import load_dotenv
-from bson import ObjectId
 
 # Import utility functions
-from utils.notifications import send_notification
+from utils.metrics import ESCALATION_JOB_LAST_DURATION, ESCALATION_JOB_LAST_RUN
+from utils.stats_counters import reconcile_counters
+from utils.rollups import backfill_rollups, rollups_backfilled
+from utils.escalation import run_escalation_sweep
+from utils.leases import Lease, SCHEDULER_LEASE, LEASE_RENEW_SECONDS
+from utils.escalation_timer import escalation_timer, TICK_SECONDS
 
 # Load environment variables
 load_dotenv()
 
-# MongoDB Atlas connection - will be set by Flask app context
-client = None
-db = None
-
-def check_and_escalate_complaints():
+def check_and_escalate_complaints(should_continue=None):
     """
     Automatically checks for complaints that need escalation based on priority and time thresholds:
     - High priority: 24 hours
@@ -28,6 +23,15 @@ def check_and_escalate_complaints():
     
     If a complaint exceeds its threshold and is still in 'pending' or 'in-progress' status,
     it will be automatically escalated.
+    
+    The thresholds are stored on each complaint as its escalateAt deadline
+    (see utils/escalation.py), so only complaints that are already overdue
+    are read, through the (status, escalateAt) index. The check itself is
+    DEADLINE_RULES in utils/escalation_rules.py.
+    
+    should_continue, if given, is checked between update batches; the
+    scheduler passes its lease's is_held so a sweep that outlives the lease
+    stops writing once a standby may have taken over.
     """
     print(f"[{datetime.now()}] Running scheduled escalation check...")
     
@@ -38,93 +42,19 @@ def check_and_escalate_complaints():
         print("Database not available in app context")
         return []
     
-    # Define time thresholds for each priority level
-    thresholds = {
-        'high': 24,  # 24 hours for high priority
-        'medium': 72,  # 72 hours for medium priority
-        'low': 120  # 120 hours for low priority
-    }
+    # Select, bulk-update and notify in batches (see utils/escalation.py)
+    sweep = run_escalation_sweep(db, should_continue=should_continue)
     
     escalated_complaints = []
-    
-    # Get all complaints that are pending or in-progress
-    complaints = db.complaints.find({
-        'status': {'$in': ['pending', 'in-progress']}
-    })
-    
-    for complaint in complaints:
-        # Get the complaint creation time (use camelCase createdAt used by API)
+    for complaint in sweep['escalated']:
         created_at = complaint.get('createdAt')
-        if not created_at:
-            continue
-        
-        # Get the complaint priority
-        priority = complaint.get('priority', 'low').lower()
-        
-        # Calculate the threshold in hours
-        threshold_hours = thresholds.get(priority, 120)  # Default to 120 hours if priority not found
-        
-        # Calculate the time difference
-        time_diff = datetime.utcnow() - created_at
-        hours_diff = time_diff.total_seconds() / 3600
-        
-        # Check if the complaint needs escalation
-        if hours_diff >= threshold_hours:
-            # Update the complaint status to 'escalated'
-            complaint_id = complaint.get('_id')
-
-            # Add a system comment about the escalation
-            system_comment = {
-                '_id': ObjectId(),
-                'content': f"Complaint automatically escalated due to exceeding time threshold for {priority} priority.",
-                'user_id': ObjectId(),
-                'user': {
-                    'name': 'System',
-                    'email': 'system@example.com'
-                },
-                'createdAt': datetime.utcnow(),
-                'isSystem': True
-            }
-
-            # Update the complaint in the database
-            db.complaints.update_one(
-                {'_id': complaint_id},
-                {
-                    '$set': {
-                        'status': 'escalated',
-                        'escalatedAt': datetime.utcnow(),
-                        'updatedAt': datetime.utcnow()
-                    },
-                    '$push': {'comments': system_comment}
-                }
-            )
-            
-            # Send notification to the user
-            user_id = complaint.get('user_id')
-            user = db.users.find_one({'_id': user_id}) if user_id else None
-            
-            if user:
-                from utils.notifications import send_email
-                try:
-                    send_email(
-                        recipient_email=user['email'],
-                        subject="Your complaint has been escalated",
-                        body=f"Your complaint (ID: {str(complaint_id)[-6:].upper()}) has been escalated due to exceeding the resolution time threshold."
-                    )
-                except Exception as e:
-                    print(f"Failed to send escalation notification: {e}")
-            
-            # Format complaint data for return
-            escalated_complaint = {
-                'complaintId': str(complaint_id),
-                'subject': complaint.get('subject', 'No subject'),
-                'priority': priority,
-                'createdAt': created_at.isoformat() if created_at else None,
-                'escalatedAt': datetime.utcnow().isoformat()
-            }
-            
-            # Add to the list of escalated complaints
-            escalated_complaints.append(escalated_complaint)
+        escalated_complaints.append({
+            'complaintId': str(complaint['_id']),
+            'subject': complaint.get('subject', 'No subject'),
+            'priority': str(complaint.get('priority', 'low')).lower(),
+            'createdAt': created_at.isoformat() if created_at else None,
+            'escalatedAt': datetime.utcnow().isoformat()
+        })
     
     # Log the results
     if escalated_complaints:
@@ -133,24 +63,52 @@ def check_and_escalate_complaints():
             print(f"  - Complaint ID: {complaint['complaintId']}, Subject: {complaint['subject']}, Priority: {complaint['priority']}")
     else:
         print(f"[{datetime.now()}] No complaints needed escalation.")
+    print(f"[{datetime.now()}] Escalation sweep phases (ms): {sweep['timings']}, {sweep['digests']} digest emails queued")
     
     return escalated_complaints
 
 def init_scheduler(app):
     """
     Initialize the scheduler with the Flask app context
+
+    Every process starts a scheduler, but jobs only run in the one holding
+    the scheduler lease in MongoDB (see utils/leases.py). The others keep
+    trying to take it and stand by until the holder releases it or dies
+    and its lease runs out.
     """
+    # Imported here so importing this module (e.g. for check_and_escalate_complaints)
+    # doesn't pull in APScheduler
+    from apscheduler.schedulers.background import BackgroundScheduler  # type: ignore[import]
     scheduler = BackgroundScheduler()
+    lease = Lease(app.config['db'], SCHEDULER_LEASE)
+    app.extensions['scheduler_lease'] = lease
+
+    # Take or keep the lease; runs right away and then every LEASE_RENEW_SECONDS
+    scheduler.add_job(
+        func=lease.renew,
+        trigger='interval',
+        seconds=LEASE_RENEW_SECONDS,
+        id='scheduler_lease',
+        next_run_time=datetime.now(),
+        replace_existing=True
+    )
 
     # Wrap job to ensure Flask application context is available for notifications
     def _job_with_app_context():
+        if not lease.is_held():
+            return
+        started = time.perf_counter()
         try:
             with app.app_context():
-                check_and_escalate_complaints()
+                check_and_escalate_complaints(lease.is_held)
         except Exception as e:
             print(f"Error during scheduled escalation check: {e}")
+        finally:
+            ESCALATION_JOB_LAST_DURATION.set(time.perf_counter() - started)
+            ESCALATION_JOB_LAST_RUN.set_to_current_time()
 
-    # Schedule the escalation check to run every hour
+    # Sweep every active complaint once an hour as well, in case a deadline
+    # was missed by the timer below (e.g. while the lease changed hands)
     scheduler.add_job(
         func=_job_with_app_context,
         trigger='interval',
@@ -158,10 +116,79 @@ def init_scheduler(app):
         id='escalation_check',
         replace_existing=True
     )
+
+    def _escalation_timer_tick():
+        # The deadline heap only lives in the lease holder
+        if not lease.is_held():
+            if escalation_timer.active:
+                escalation_timer.stop()
+            return
+        try:
+            with app.app_context():
+                escalation_timer.tick(app.config['db'], should_continue=lease.is_held)
+        except Exception as e:
+            print(f"Error during escalation timer tick: {e}")
+
+    # Escalate complaints within TICK_SECONDS of their deadline; idle ticks
+    # only look at the top of the in-memory heap (see utils/escalation_timer.py)
+    scheduler.add_job(
+        func=_escalation_timer_tick,
+        trigger='interval',
+        seconds=TICK_SECONDS,
+        id='escalation_timer',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+
+    def _reconcile_with_app_context():
+        if not lease.is_held():
+            return
+        try:
+            with app.app_context():
+                reconcile_counters(app.config['db'])
+                backfill_rollups(app.config['db'])
+        except Exception as e:
+            print(f"Error during stats counter reconciliation: {e}")
+
+    # Recompute the admin dashboard counters and daily rollups from scratch once a day
+    scheduler.add_job(
+        func=_reconcile_with_app_context,
+        trigger='interval',
+        hours=24,
+        id='stats_counters_reconcile',
+        replace_existing=True
+    )
+
+    def _backfill_rollups_if_missing():
+        if not lease.is_held():
+            return
+        try:
+            with app.app_context():
+                if not rollups_backfilled(app.config['db']):
+                    backfill_rollups(app.config['db'])
+        except Exception as e:
+            print(f"Error during daily rollup backfill: {e}")
+
+    # Build the daily rollups soon after the first start instead of waiting a day
+    scheduler.add_job(
+        func=_backfill_rollups_if_missing,
+        trigger='interval',
+        minutes=10,
+        id='stats_rollups_bootstrap',
+        next_run_time=datetime.now() + timedelta(seconds=LEASE_RENEW_SECONDS),
+        replace_existing=True
+    )
     
     # Start the scheduler
     scheduler.start()
-    print(f"[{datetime.now()}] Scheduler started. Automatic escalation check will run every hour.")
+    print(f"[{datetime.now()}] Scheduler started. Escalation deadlines are checked every {TICK_SECONDS}s and all active complaints swept hourly while this process holds the scheduler lease.")
+    
+    # Shut down the scheduler when the app is shutting down, then hand the
+    # lease over instead of letting it run out
+    def _shutdown():
+        scheduler.shutdown()
+        lease.release()
+    atexit.register(_shutdown)
     
-    # Shut down the scheduler when the app is shutting down
-    atexit.register(lambda: scheduler.shutdown())
\ No newline at end of file
+    return scheduler
\ No newline at end of file
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.escalation import backfill_escalation_deadlines, due_query, escalation_deadline, threshold_hours
+from utils.memory_db import MemoryDatabase
+
+CREATED = datetime(2024, 5, 1, 9)
+
+
+@pytest.mark.parametrize('priority, hours', [
+    ('high', 24), ('medium', 72), ('low', 120), ('HIGH', 24), (None, 120), ('urgent', 120),
+])
+def test_threshold_hours(priority, hours):
+    assert threshold_hours(priority) == hours
+
+
+def test_escalation_deadline():
+    assert escalation_deadline({'createdAt': CREATED, 'priority': 'high'}) == CREATED + timedelta(hours=24)
+    assert escalation_deadline({'createdAt': CREATED}) == CREATED + timedelta(hours=120)
+
+
+def test_escalation_deadline_without_created_at():
+    assert escalation_deadline({'priority': 'high'}) is None
+    assert escalation_deadline({'createdAt': None, 'priority': 'high'}) is None
+
+
+def test_due_query_selects_active_complaints_past_their_deadline():
+    db = MemoryDatabase('test')
+    now = CREATED + timedelta(hours=48)
+    complaints = [
+        {'_id': 'due', 'status': 'pending', 'priority': 'high', 'createdAt': CREATED},
+        {'_id': 'not-yet', 'status': 'in-progress', 'priority': 'medium', 'createdAt': CREATED},
+        {'_id': 'resolved', 'status': 'resolved', 'priority': 'high', 'createdAt': CREATED},
+    ]
+    db.complaints.insert_many([dict(c, escalateAt=escalation_deadline(c)) for c in complaints])
+    assert [c['_id'] for c in db.complaints.find(due_query(now))] == ['due']
+
+
+def test_backfill_escalation_deadlines():
+    db = MemoryDatabase('test')
+    already = CREATED + timedelta(hours=1)
+    db.complaints.insert_many([
+        {'_id': 1, 'status': 'pending', 'priority': 'medium', 'createdAt': CREATED},
+        {'_id': 2, 'status': 'pending', 'priority': 'high', 'createdAt': CREATED, 'escalateAt': already},
+        {'_id': 3, 'status': 'pending', 'priority': 'high'},
+        {'_id': 4, 'status': 'resolved', 'priority': 'low', 'createdAt': CREATED},
+    ])
+
+    assert backfill_escalation_deadlines(db, {'status': 'pending'}, batch_size=1) == 1
+
+    deadlines = {c['_id']: c.get('escalateAt') for c in db.complaints.find()}
+    assert deadlines == {1: CREATED + timedelta(hours=72), 2: already, 3: None, 4: None}
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.escalation_rules import (
+    DEADLINE_RULES, SERVICE_LEVEL_RULES, compile_rules, evaluate_rules, validate_rules
+)
+from utils.memory_db import MemoryDatabase
+
+NOW = datetime(2024, 5, 1, 12)
+
+
+def test_compile_single_rule_is_a_plain_query():
+    assert compile_rules(DEADLINE_RULES, NOW) == {
+        'status': {'$in': ['pending', 'in-progress']},
+        'escalateAt': {'$lte': NOW}
+    }
+
+
+def test_compile_rule_set_is_an_or():
+    query = compile_rules(SERVICE_LEVEL_RULES, NOW)
+    assert [clause['status'] for clause in query['$or']] == [
+        {'$in': ['pending']}, {'$in': ['in-progress']}, {'$in': ['pending']}
+    ]
+    first_response, resolution, high_priority = query['$or']
+    assert first_response['createdAt'] == {'$lte': NOW - timedelta(hours=2)}
+    assert resolution['is_complex'] == {'$ne': True}
+    assert high_priority['priority'] == {'$in': ['high']}
+
+
+@pytest.mark.parametrize('rules', [
+    [{'name': 'a', 'status': ['pending'], 'colour': 'red'}],
+    [{'status': ['pending']}],
+    [{'name': 'a'}],
+    [{'name': 'a', 'status': ['pending']}, {'name': 'a', 'status': ['resolved']}],
+])
+def test_invalid_rules(rules):
+    with pytest.raises(ValueError):
+        validate_rules(rules)
+
+
+def test_evaluate_service_level_rules():
+    db = MemoryDatabase('test')
+    hours_ago = lambda hours: NOW - timedelta(hours=hours)
+    db.complaints.insert_many([
+        {'_id': 'fresh', 'status': 'pending', 'priority': 'low', 'createdAt': hours_ago(1)},
+        {'_id': 'waiting', 'status': 'pending', 'priority': 'low', 'createdAt': hours_ago(3)},
+        {'_id': 'urgent', 'status': 'pending', 'priority': 'high', 'createdAt': hours_ago(3)},
+        {'_id': 'slow', 'status': 'in-progress', 'priority': 'medium', 'createdAt': hours_ago(30)},
+        {'_id': 'complex', 'status': 'in-progress', 'priority': 'medium', 'createdAt': hours_ago(30),
+         'is_complex': True},
+        {'_id': 'undated', 'status': 'in-progress', 'priority': 'low'},
+        {'_id': 'done', 'status': 'resolved', 'priority': 'high', 'createdAt': hours_ago(30)},
+    ])
+
+    complaints, elapsed_ms = evaluate_rules(db, SERVICE_LEVEL_RULES, NOW)
+
+    matched = {complaint['_id']: complaint['matchedRules'] for complaint in complaints}
+    assert matched == {
+        'waiting': ['first_response'],
+        'urgent': ['first_response', 'high_priority'],
+        'slow': ['resolution'],
+    }
+    urgent = next(complaint for complaint in complaints if complaint['_id'] == 'urgent')
+    assert urgent['escalationReasons'] == [
+        'No response within 2 hours', 'High priority ticket requires immediate attention'
+    ]
+    assert elapsed_ms >= 0
+
+
+def test_evaluate_deadline_rules_with_query_and_projection():
+    db = MemoryDatabase('test')
+    db.complaints.insert_many([
+        {'_id': 1, 'status': 'pending', 'priority': 'Medium', 'subject': 'a', 'escalateAt': NOW},
+        {'_id': 2, 'status': 'pending', 'priority': 'high', 'subject': 'b', 'escalateAt': NOW},
+        {'_id': 3, 'status': 'pending', 'priority': 'low', 'subject': 'c', 'escalateAt': NOW + timedelta(hours=1)},
+    ])
+
+    complaints, _ = evaluate_rules(db, DEADLINE_RULES, NOW, query={'_id': 1}, projection={'priority': 1})
+
+    assert complaints == [{
+        '_id': 1,
+        'priority': 'Medium',
+        'matchedRules': ['priority_threshold'],
+        'escalationReasons': [
+            'Complaint automatically escalated due to exceeding time threshold for medium priority.'
+        ]
+    }]
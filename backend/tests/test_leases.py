@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import utils.leases as leases
+from utils.leases import Lease, lease_status
+from utils.memory_db import MemoryDatabase
+
+
+@pytest.fixture
+def db():
+    return MemoryDatabase('test')
+
+
+def expire(db, name):
+    db.leases.update_one({'_id': name}, {'$set': {'expiresAt': datetime.utcnow() - timedelta(seconds=1)}})
+
+
+def test_acquire_and_renew(db):
+    lease = Lease(db, 'scheduler')
+    assert lease.renew() and lease.is_held()
+    acquired_at = db.leases.find_one({'_id': 'scheduler'})['acquiredAt']
+
+    assert lease.renew()
+    document = db.leases.find_one({'_id': 'scheduler'})
+    assert document['owner'] == lease.owner
+    assert document['acquiredAt'] == acquired_at
+    assert document['expiresAt'] > datetime.utcnow()
+
+
+def test_held_lease_is_not_taken(db):
+    holder, standby = Lease(db, 'scheduler'), Lease(db, 'scheduler')
+    assert holder.renew()
+    assert not standby.renew() and not standby.is_held()
+    assert holder.renew()
+
+
+def test_expired_lease_is_taken_over(db):
+    holder, standby = Lease(db, 'scheduler'), Lease(db, 'scheduler')
+    assert holder.renew()
+    expire(db, 'scheduler')
+
+    assert standby.renew() and standby.is_held()
+    assert not holder.renew() and not holder.is_held()
+
+
+def test_release_lets_a_standby_take_over(db):
+    holder, standby = Lease(db, 'scheduler'), Lease(db, 'scheduler')
+    assert holder.renew()
+    holder.release()
+    assert not holder.is_held()
+    assert standby.renew()
+
+
+def test_leases_are_independent(db):
+    assert Lease(db, 'scheduler').renew()
+    assert Lease(db, 'other').renew()
+
+
+def test_holder_stops_when_its_term_runs_out_unrenewed(db, monkeypatch):
+    lease = Lease(db, 'scheduler', ttl_seconds=60)
+    clock = [1000.0]
+    monkeypatch.setattr(leases.time, 'monotonic', lambda: clock[0])
+    assert lease.renew()
+
+    def unreachable(*args, **kwargs):
+        raise ConnectionError('no route to host')
+    monkeypatch.setattr(db.leases, 'find_one_and_update', unreachable)
+
+    clock[0] += 30
+    assert lease.renew() and lease.is_held()
+    clock[0] += 31
+    assert not lease.renew() and not lease.is_held()
+
+
+def test_lease_status(db):
+    holder, standby = Lease(db, 'scheduler'), Lease(db, 'scheduler')
+    assert lease_status(db, 'scheduler')['owner'] is None
+    holder.renew()
+
+    status = lease_status(db, 'scheduler', standby)
+    assert status['owner'] == holder.owner
+    assert status['thisProcess'] == standby.owner
+    assert not status['heldByThisProcess']
+    assert lease_status(db, 'scheduler', holder)['heldByThisProcess']
+
+    expire(db, 'scheduler')
+    assert lease_status(db, 'scheduler', holder)['owner'] is None
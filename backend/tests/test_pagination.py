@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from utils.memory_db import MemoryDatabase
+from utils.pagination import (
+    InvalidCursor, decode_cursor, encode_cursor, keyset_filter, paginate, parse_limit, parse_order
+)
+
+
+def test_cursor_round_trip():
+    doc = {'_id': ObjectId(), 'createdAt': datetime(2024, 5, 1, 12, 30, 15, 250000)}
+    token = encode_cursor(doc)
+    assert '=' not in token
+    assert decode_cursor(token) == (doc['createdAt'], doc['_id'])
+
+
+def test_cursor_without_created_at():
+    doc = {'_id': ObjectId()}
+    assert decode_cursor(encode_cursor(doc)) == (None, doc['_id'])
+
+
+@pytest.mark.parametrize('token', ['', 'not-a-cursor', 'eyJjIjpudWxsfQ', 'eyJjIjpudWxsLCJpIjoieCJ9'])
+def test_invalid_cursor(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token)
+
+
+def test_invalid_cursor_is_a_value_error():
+    with pytest.raises(ValueError):
+        keyset_filter('garbage')
+
+
+def test_parse_limit():
+    assert parse_limit(None) == 50
+    assert parse_limit('') == 50
+    assert parse_limit('10') == 10
+    assert parse_limit('0') == 1
+    assert parse_limit('1000') == 200
+    with pytest.raises(ValueError):
+        parse_limit('ten')
+
+
+def test_parse_order():
+    assert parse_order(None) == -1
+    assert parse_order('desc') == -1
+    assert parse_order('asc') == 1
+    with pytest.raises(ValueError):
+        parse_order('up')
+
+
+@pytest.mark.parametrize('order', [-1, 1])
+def test_paginate_visits_every_document_once(order):
+    db = MemoryDatabase('test')
+    now = datetime(2024, 5, 1)
+    # Ties on createdAt and documents without one are ordered by _id
+    db.complaints.insert_many([
+        {'n': i, 'createdAt': None if i % 5 == 0 else now - timedelta(hours=i % 3)}
+        for i in range(17)
+    ])
+    expected = sorted(
+        db.complaints.find(),
+        key=lambda doc: (doc['createdAt'] is not None, doc['createdAt'] or now, doc['_id']),
+        reverse=order == -1
+    )
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = paginate(db.complaints, {}, 4, cursor, order=order)
+        assert len(page) <= 4
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert [doc['_id'] for doc in seen] == [doc['_id'] for doc in expected]
+
+
+def test_paginate_keeps_created_at_in_inclusion_projection():
+    db = MemoryDatabase('test')
+    db.complaints.insert_many([{'subject': str(i), 'createdAt': datetime(2024, 5, i + 1)} for i in range(3)])
+    page, cursor = paginate(db.complaints, {}, 2, projection={'subject': 1})
+    assert all('createdAt' in doc for doc in page)
+    page, cursor = paginate(db.complaints, {}, 2, cursor, projection={'subject': 1})
+    assert [doc['subject'] for doc in page] == ['0'] and cursor is None
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils.memory_db import MemoryDatabase
+from utils.rollups import (
+    backfill_rollups, latency_key, range_stats, resolution_hours, rollup_contribution, rollup_updates
+)
+
+CREATED = datetime(2024, 5, 1, 22)
+
+
+def resolved(hours, **fields):
+    return dict({
+        'status': 'resolved', 'category': 'network', 'priority': 'high',
+        'createdAt': CREATED, 'resolvedAt': CREATED + timedelta(hours=hours)
+    }, **fields)
+
+
+def buckets(db):
+    return {
+        document['_id']: {key: value for key, value in document.items() if key not in ('_id', 'updatedAt')}
+        for document in db.stats_daily.find()
+    }
+
+
+@pytest.mark.parametrize('hours, key', [
+    (0, 'h1'), (0.99, 'h1'), (1, 'h4'), (23.5, 'h24'), (72, 'h168'), (168, 'slower'), (1000, 'slower'),
+])
+def test_latency_key(hours, key):
+    assert latency_key(hours) == key
+
+
+def test_resolution_hours():
+    assert resolution_hours(resolved(5)) == 5
+    assert resolution_hours(resolved(5, status='in-progress')) is None
+    assert resolution_hours(resolved(5, createdAt=None)) is None
+
+
+def test_contribution_buckets_by_event_day():
+    contribution = rollup_contribution(resolved(3, escalatedAt=CREATED + timedelta(hours=2)))
+    assert contribution == {
+        ('2024-05-01', 'network', 'high'): {'created': 1},
+        ('2024-05-02', 'network', 'high'): {
+            'escalated': 1, 'resolved': 1, 'resolutionHours': 3, 'resolutionCount': 1, 'latency.h4': 1
+        },
+    }
+
+
+def test_contribution_of_missing_fields():
+    assert rollup_contribution(None) == {}
+    assert rollup_contribution({'status': 'pending'}) == {}
+    assert rollup_contribution({'status': 'pending', 'createdAt': CREATED}) == {
+        ('2024-05-01', 'null', 'null'): {'created': 1}
+    }
+
+
+def test_updates_move_counts_between_buckets():
+    db = MemoryDatabase('test')
+    before = {'status': 'pending', 'category': 'network', 'priority': 'low', 'createdAt': CREATED}
+    db.stats_daily.bulk_write(rollup_updates([(None, before)]))
+    after = dict(before, priority='high')
+    db.stats_daily.bulk_write(rollup_updates([(before, after)]))
+
+    assert buckets(db) == {
+        '2024-05-01|network|low': {'day': '2024-05-01', 'category': 'network', 'priority': 'low', 'created': 0},
+        '2024-05-01|network|high': {'day': '2024-05-01', 'category': 'network', 'priority': 'high', 'created': 1},
+    }
+    assert rollup_updates([(after, after)]) == []
+
+
+def test_backfill_corrects_buckets_and_keeps_live_increments():
+    complaints = [resolved(2), resolved(30, category='power'), {'status': 'pending', 'createdAt': CREATED}]
+    clean = MemoryDatabase('clean')
+    clean.complaints.insert_many(complaints)
+    backfill_rollups(clean)
+
+    db = MemoryDatabase('test')
+    db.complaints.insert_many(complaints)
+    # A stale count and a bucket no complaint accounts for
+    db.stats_daily.insert_one({'_id': '2024-05-01|network|high', 'day': '2024-05-01',
+                               'category': 'network', 'priority': 'high', 'created': 7})
+    db.stats_daily.insert_one({'_id': '2024-04-01|network|high', 'day': '2024-04-01',
+                               'category': 'network', 'priority': 'high', 'created': 2})
+
+    assert backfill_rollups(db, batch_size=2) == {'complaints': 3, 'buckets': 5, 'corrected': 6}
+    assert buckets(db) == buckets(clean)
+
+    # A complaint written after the scan read the others is $inc'd, not overwritten
+    late = {'status': 'pending', 'category': 'network', 'priority': 'high', 'createdAt': CREATED}
+    db.complaints.insert_one(late)
+    db.stats_daily.bulk_write(rollup_updates([(None, late)]))
+    assert db.stats_daily.find_one({'_id': '2024-05-01|network|high'})['created'] == 2
+
+    # Nothing is left to correct
+    assert backfill_rollups(db)['corrected'] == 0
+
+
+def test_backfill_removes_buckets_of_deleted_complaints():
+    db = MemoryDatabase('test')
+    db.stats_daily.bulk_write(rollup_updates([(None, resolved(2))]))
+    assert len(buckets(db)) == 2
+
+    assert backfill_rollups(db) == {'complaints': 0, 'buckets': 0, 'corrected': 2}
+    assert buckets(db) == {}
+
+
+def test_range_stats():
+    db = MemoryDatabase('test')
+    now = CREATED + timedelta(days=1)
+    assert range_stats(db, 7, now)['backfilled'] is False
+
+    db.complaints.insert_many([resolved(2), resolved(6)])
+    backfill_rollups(db)
+    stats = range_stats(db, 7, now)
+
+    assert stats['backfilled'] is True
+    assert (stats['created'], stats['resolved'], stats['escalated']) == (2, 2, 0)
+    assert stats['avgResolutionTime'] == 4
+    assert stats['resolutionHistogram']['h4'] == 1 and stats['resolutionHistogram']['h24'] == 1
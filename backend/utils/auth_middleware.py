@@ -1,150 +1,214 @@
 from flask import request, jsonify, current_app
 import jwt
+from datetime import datetime, timedelta
 from bson.objectid import ObjectId
 from functools import wraps
+from utils.principal_cache import principal_cache
+from utils.token_versions import token_versions
+
+def get_token_from_header():
+    """Return the bearer token from the Authorization header, or None"""
+    auth_header = request.headers.get('Authorization')
+    if auth_header and auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+    return None
+
+def load_principal(user_id):
+    """
+    Resolve the user behind a token subject, using the principal cache.
+
+    Returns a dict with the fields the decorators need, or None if the
+    user does not exist.
+    """
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    # Get user from database
+    db = current_app.config['db']
+    user = db.users.find_one(
+        {'_id': ObjectId(user_id)},
+        {'name': 1, 'email': 1, 'is_admin': 1, 'is_worker': 1, 'role': 1, 'token_version': 1}
+    )
+
+    if not user:
+        return None
+
+    principal = {
+        'id': str(user['_id']),
+        'name': user.get('name'),
+        'email': user['email'],
+        'is_admin': user.get('is_admin', False),
+        'is_worker': user.get('is_worker', False),
+        'role': user.get('role'),
+        'token_version': user.get('token_version', 0)
+    }
+    principal_cache.set(user_id, principal)
+    return principal
+
+def generate_token(user_id, is_admin=False, is_worker=False, name=None, email=None, token_version=0):
+    """
+    Issue a JWT for a user. Identity claims (name, email, token version) let
+    the auth middleware skip the user lookup when JWT_STATELESS is enabled,
+    so a change to them must bump the user's token version (revoke_tokens)
+    and issue a new token.
+    """
+    print(f"Generating token for user {user_id} with is_admin={is_admin}, is_worker={is_worker}")
+    payload = {
+        'exp': datetime.utcnow() + timedelta(days=1),
+        'iat': datetime.utcnow(),
+        'sub': str(user_id),
+        'admin': is_admin,
+        'worker': is_worker,
+        'ver': token_version
+    }
+    if email:
+        payload['name'] = name
+        payload['email'] = email
+    return jwt.encode(
+        payload,
+        current_app.config['SECRET_KEY'],
+        algorithm='HS256'
+    )
+
+def principal_from_claims(payload):
+    """
+    Build a principal from verified token claims for stateless mode.
+
+    Returns None for tokens issued without the identity claims, so they
+    fall back to a database lookup.
+    """
+    if 'email' not in payload or 'ver' not in payload:
+        return None
+
+    return {
+        'id': payload['sub'],
+        'name': payload.get('name'),
+        'email': payload['email'],
+        'is_admin': payload.get('admin', False),
+        'is_worker': payload.get('worker', False),
+        'role': 'worker' if payload.get('worker', False) else None,
+        'token_version': payload['ver']
+    }
+
+def invalidate_principal(user_id):
+    """Drop any cached principal for a user whose record has changed"""
+    principal_cache.invalidate(user_id)
+
+def revoke_tokens(user_id):
+    """Bump a user's token version so every token issued so far is rejected"""
+    invalidate_principal(user_id)
+    return token_versions.bump(current_app.config['db'], user_id)
+
+def authenticate_request(token=None):
+    """
+    Verify the bearer token (or ``token``) and resolve the principal behind it.
+
+    In stateless mode (``JWT_STATELESS``) the principal comes from the signed
+    claims and only the in-memory token version set is consulted. Otherwise
+    the user is loaded through the principal cache.
+
+    Returns a ``(principal, payload, error_response)`` tuple.
+    """
+    if token is None:
+        token = get_token_from_header()
+
+    if not token:
+        return None, None, (jsonify({'error': 'Token is missing'}), 401)
+
+    try:
+        # Decode token
+        payload = jwt.decode(
+            token,
+            current_app.config['SECRET_KEY'],
+            algorithms=['HS256']
+        )
+    except jwt.ExpiredSignatureError:
+        return None, None, (jsonify({'error': 'Token has expired'}), 401)
+    except jwt.InvalidTokenError:
+        return None, None, (jsonify({'error': 'Invalid token'}), 401)
+
+    user = None
+    if current_app.config.get('JWT_STATELESS'):
+        user = principal_from_claims(payload)
+        if user and user['token_version'] < token_versions.current_version(current_app.config['db'], user['id']):
+            return None, None, (jsonify({'error': 'Token has been revoked'}), 401)
+
+    if user is None:
+        user = load_principal(payload['sub'])
+
+        if not user:
+            return None, None, (jsonify({'error': 'User not found'}), 404)
+
+        if payload.get('ver', 0) < user['token_version']:
+            return None, None, (jsonify({'error': 'Token has been revoked'}), 401)
+
+    return user, payload, None
 
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        # Get token from Authorization header
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-        
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-        
-        try:
-            # Decode token
-            payload = jwt.decode(
-                token,
-                current_app.config['SECRET_KEY'],
-                algorithms=['HS256']
-            )
-            
-            # Get user from database
-            db = current_app.config['db']
-            user = db.users.find_one({'_id': ObjectId(payload['sub'])})
-            
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-            
-            # Create current_user object
-            current_user = {
-                'id': str(user['_id']),
-                'name': user.get('name', 'Unknown'),
-                'email': user['email'],
-                'is_admin': user.get('is_admin', False),
-                'is_worker': user.get('is_worker', False)
-            }
-            
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-        
+        user, payload, error = authenticate_request()
+        if error:
+            return error
+
+        # Create current_user object
+        current_user = {
+            'id': user['id'],
+            'name': user['name'] or 'Unknown',
+            'email': user['email'],
+            'is_admin': user['is_admin'],
+            'is_worker': user['is_worker']
+        }
+
         return f(current_user, *args, **kwargs)
-    
+
     return decorated
 
 def admin_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        # Get token from Authorization header
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-        
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-        
-        try:
-            # Decode token
-            payload = jwt.decode(
-                token,
-                current_app.config['SECRET_KEY'],
-                algorithms=['HS256']
-            )
-            
-            # Get user from database
-            db = current_app.config['db']
-            user = db.users.find_one({'_id': ObjectId(payload['sub'])})
-            
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-            
-            # Check if user is admin
-            if not user.get('is_admin', False):
-                return jsonify({'error': 'Admin privileges required'}), 403
-            
-            # Create current_user object
-            current_user = {
-                'id': str(user['_id']),
-                'name': user.get('name', 'Unknown'),
-                'email': user['email'],
-                'is_admin': True
-            }
-            
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-        
+        user, payload, error = authenticate_request()
+        if error:
+            return error
+
+        # Check if user is admin
+        if not user['is_admin']:
+            return jsonify({'error': 'Admin privileges required'}), 403
+
+        # Create current_user object
+        current_user = {
+            'id': user['id'],
+            'name': user['name'] or 'Unknown',
+            'email': user['email'],
+            'is_admin': True
+        }
+
         return f(current_user, *args, **kwargs)
-    
+
     return decorated
 
 def worker_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        
-        # Get token from Authorization header
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-        
-        if not token:
-            return jsonify({'error': 'Token is missing'}), 401
-        
-        try:
-            # Decode token
-            payload = jwt.decode(
-                token,
-                current_app.config['SECRET_KEY'],
-                algorithms=['HS256']
-            )
-            
-            # Get user from database
-            db = current_app.config['db']
-            user = db.users.find_one({'_id': ObjectId(payload['sub'])})
-            
-            if not user:
-                return jsonify({'error': 'User not found'}), 404
-            
-            # Check if user is a worker
-            is_worker = user.get('role') == 'worker' or user.get('is_worker', False) or payload.get('worker', False)
-            if not is_worker and not user.get('is_admin', False):
-                return jsonify({'error': 'Worker privileges required'}), 403
-            
-            # Create current_user object
-            current_user = {
-                'id': str(user['_id']),
-                'email': user['email'],
-                'name': user.get('name', ''),
-                'is_admin': user.get('is_admin', False),
-                'is_worker': is_worker
-            }
-            
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({'error': 'Invalid token'}), 401
-        
+        user, payload, error = authenticate_request()
+        if error:
+            return error
+
+        # Check if user is a worker
+        is_worker = user['role'] == 'worker' or user['is_worker'] or payload.get('worker', False)
+        if not is_worker and not user['is_admin']:
+            return jsonify({'error': 'Worker privileges required'}), 403
+
+        # Create current_user object
+        current_user = {
+            'id': user['id'],
+            'email': user['email'],
+            'name': user['name'] or '',
+            'is_admin': user['is_admin'],
+            'is_worker': is_worker
+        }
+
         return f(current_user, *args, **kwargs)
-    
-    return decorated
\ No newline at end of file
+
+    return decorated
\ No newline at end of file
@@ -0,0 +1,43 @@
+from utils.etags import bump_list_version
+from utils.stats_counters import record_complaint_changes
+
+# Bookkeeping after a complaint write.
+#
+# Every write to the complaints collection is followed by one call here:
+# complaint_written() with the complaint before and after an insert, update
+# or delete, comment_added() after a write that only pushes a comment. They
+# invalidate the list ETags (utils/etags.py), applies the
+# counter and rollup difference (utils/stats_counters.py) and let the
+# escalation timer follow the complaint's deadline (utils/escalation_timer.py),
+# so a new write path only has one thing to remember.
+#
+# Marking a complaint viewed (lastViewedAt) is not recorded: it doesn't set
+# updatedAt, and a list version bump on every view would make list ETags
+# useless.
+
+
+def complaints_written(db, changes):
+    """
+    Record several complaint writes. ``changes`` is a list of (before,
+    after) pairs; before is None for a created complaint and after is None
+    for a deleted one.
+    """
+    # escalation_timer imports utils.escalation, which records its writes here
+    from utils.escalation_timer import escalation_timer
+
+    changes = list(changes)
+    if not changes:
+        return
+    bump_list_version(db.complaints)
+    record_complaint_changes(db, changes)
+    for before, after in changes:
+        escalation_timer.track(before, after)
+
+
+def complaint_written(db, before, after):
+    complaints_written(db, [(before, after)])
+
+
+def comment_added(db):
+    """Record a write that only pushed a comment (and set updatedAt): lists change, counters and deadlines don't"""
+    bump_list_version(db.complaints)
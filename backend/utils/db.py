@@ -0,0 +1,185 @@
+import os
+import threading
+from pymongo import MongoClient, monitoring
+from utils.db_metrics import command_listener
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Counts connection pool events so pool pressure can be reported"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Called for each new client, including in a forked child, so a fresh
+        # lock is created rather than acquiring one the parent may have held
+        self._lock = threading.Lock()
+        self.counters = {
+            'created': 0,
+            'closed': 0,
+            'checkedOut': 0,
+            'checkOuts': 0,
+            'checkOutFailures': 0,
+            'poolsCleared': 0
+        }
+
+    def _bump(self, key, amount=1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counters)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._bump('poolsCleared')
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._bump('created')
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump('closed')
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        # Includes waitQueueTimeoutMS expiries when the pool is exhausted
+        self._bump('checkOutFailures')
+
+    def connection_checked_out(self, event):
+        self._bump('checkOuts')
+        self._bump('checkedOut')
+
+    def connection_checked_in(self, event):
+        self._bump('checkedOut', -1)
+
+
+pool_listener = PoolStatsListener()
+
+_client = None
+_client_pid = None
+_lock = threading.Lock()
+
+
+def _int_env(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def client_options():
+    """
+    MongoClient options, read from the environment.
+
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS and MONGO_COMPRESSORS (comma separated, e.g.
+    "zstd,zlib"; zstd and snappy need their python packages) are passed
+    through when set; pymongo's defaults apply otherwise.
+    """
+    options = {
+        'tls': os.getenv('MONGO_TLS', 'true').lower() == 'true',
+        'tlsAllowInvalidCertificates': True,  # Disable certificate verification (for development only)
+        'serverSelectionTimeoutMS': _int_env('MONGO_SERVER_SELECTION_TIMEOUT_MS') or 5000,
+        'maxPoolSize': _int_env('MONGO_MAX_POOL_SIZE'),
+        'minPoolSize': _int_env('MONGO_MIN_POOL_SIZE'),
+        'maxIdleTimeMS': _int_env('MONGO_MAX_IDLE_TIME_MS'),
+        'waitQueueTimeoutMS': _int_env('MONGO_WAIT_QUEUE_TIMEOUT_MS'),
+        'compressors': os.getenv('MONGO_COMPRESSORS') or None,
+        'event_listeners': [command_listener, pool_listener]
+    }
+    if not options['tls']:
+        options.pop('tlsAllowInvalidCertificates')
+    return {k: v for k, v in options.items() if v is not None}
+
+
+def get_client():
+    """
+    Return this process's MongoClient, creating it on first use.
+
+    MongoClient is not fork-safe, so a client inherited from a parent process
+    (e.g. gunicorn with preload_app) is discarded and a new one is created in
+    the child.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+
+    with _lock:
+        if _client is None or _client_pid != pid:
+            mongo_uri = os.getenv('MONGO_URI')
+            if not mongo_uri:
+                raise RuntimeError('MONGO_URI environment variable is not set')
+            pool_listener.reset()
+            _client = MongoClient(mongo_uri, **client_options())
+            _client_pid = pid
+    return _client
+
+
+def get_db():
+    """Return the default database named in MONGO_URI"""
+    return get_client().get_database()
+
+
+def close_client():
+    global _client, _client_pid
+    with _lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+
+def _forget_client_after_fork():
+    # Never use or close the parent's client in the child; just drop it.
+    # The lock may have been held by another parent thread at fork time.
+    global _client, _client_pid, _lock
+    _client = None
+    _client_pid = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_forget_client_after_fork)
+
+
+class LazyDatabase:
+    """
+    Stand-in for a pymongo Database that resolves the per-process client on access.
+
+    Stored in app.config['db'] so routes keep using ``db.complaints`` etc.
+    while the actual client is only created after any fork.
+    """
+
+    def __getattr__(self, name):
+        return getattr(get_db(), name)
+
+    def __getitem__(self, name):
+        return get_db()[name]
+
+
+def pool_stats():
+    """Connection pool configuration and counters for this process"""
+    options = client_options()
+    return {
+        'pid': os.getpid(),
+        'connected': _client is not None and _client_pid == os.getpid(),
+        'maxPoolSize': options.get('maxPoolSize', 100),
+        'minPoolSize': options.get('minPoolSize', 0),
+        'maxIdleTimeMS': options.get('maxIdleTimeMS'),
+        'waitQueueTimeoutMS': options.get('waitQueueTimeoutMS'),
+        'compressors': options.get('compressors'),
+        **pool_listener.snapshot()
+    }
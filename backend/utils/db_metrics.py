@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import bson
+from flask import g, request, has_request_context
+from pymongo import monitoring
+
+
+class RequestCommandListener(monitoring.CommandListener):
+    """
+    pymongo command listener that attributes database work to the current request.
+
+    pymongo runs these callbacks on the thread that issued the command, so a
+    command issued while handling a request lands on that request's ``g``.
+    Commands issued outside a request (scheduler, CLI scripts) are ignored.
+    """
+
+    def __init__(self, measure_reply_bytes=False):
+        self.measure_reply_bytes = measure_reply_bytes
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        stats = get_request_db_stats()
+        if stats is None:
+            return
+
+        _record(stats, event)
+        if self.measure_reply_bytes:
+            stats['bytes'] = stats.get('bytes', 0) + len(bson.encode(event.reply))
+
+    def failed(self, event):
+        stats = get_request_db_stats()
+        if stats is None:
+            return
+
+        _record(stats, event)
+        stats['failures'] += 1
+
+
+def _record(stats, event):
+    stats['commands'] += 1
+    stats['duration_ms'] += event.duration_micros / 1000
+    stats['by_command'][event.command_name] = stats['by_command'].get(event.command_name, 0) + 1
+
+
+def get_request_db_stats():
+    """Return the database counters for the current request, or None outside one"""
+    if not has_request_context():
+        return None
+    return g.get('db_stats')
+
+
+command_listener = RequestCommandListener(
+    measure_reply_bytes=os.getenv('DB_METRICS_REPLY_BYTES', 'false').lower() == 'true'
+)
+
+
+def init_db_metrics(app):
+    """
+    Register request hooks that reset the counters and report them.
+
+    Every response gets a ``Server-Timing`` header with the DB command count
+    and time, and one JSON log line is printed per request. Reply bytes are
+    reported only with DB_METRICS_REPLY_BYTES enabled.
+    """
+    log_requests = os.getenv('DB_METRICS_LOG', 'true').lower() == 'true'
+
+    @app.before_request
+    def _start_db_stats():
+        g.request_started = time.perf_counter()
+        g.db_stats = {
+            'commands': 0,
+            'failures': 0,
+            'duration_ms': 0.0,
+            'by_command': {}
+        }
+        if command_listener.measure_reply_bytes:
+            g.db_stats['bytes'] = 0
+
+    @app.after_request
+    def _report_db_stats(response):
+        stats = g.get('db_stats')
+        if stats is None:
+            return response
+
+        total_ms = (time.perf_counter() - g.request_started) * 1000
+        desc = f'{stats["commands"]} commands'
+        if 'bytes' in stats:
+            desc += f', {stats["bytes"]} bytes'
+        response.headers.add('Server-Timing', f'db;dur={stats["duration_ms"]:.2f};desc="{desc}"')
+        response.headers.add('Server-Timing', f'total;dur={total_ms:.2f}')
+
+        if log_requests:
+            line = {
+                'event': 'request',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round(total_ms, 2),
+                'db_commands': stats['commands'],
+                'db_failures': stats['failures'],
+                'db_duration_ms': round(stats['duration_ms'], 2),
+                'db_by_command': stats['by_command']
+            }
+            if 'bytes' in stats:
+                line['db_bytes'] = stats['bytes']
+            print(json.dumps(line), flush=True)
+
+        return response
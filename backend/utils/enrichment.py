@@ -0,0 +1,52 @@
+from bson import ObjectId
+
+# Fields read from users when embedding them in complaint responses
+USER_SUMMARY_PROJECTION = {'name': 1, 'email': 1}
+
+# (complaint field holding a user id, key the user block is written to)
+ASSIGNEE = ('assigned_to', 'assignedTo')
+SUBMITTER = ('user_id', 'user')
+
+
+def _as_object_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return None
+
+
+def fetch_users(db, user_ids, projection=None):
+    """Return {_id: user} for the given ids using a single $in query"""
+    ids = {oid for oid in (_as_object_id(uid) for uid in user_ids) if oid is not None}
+    if not ids:
+        return {}
+    users = db.users.find({'_id': {'$in': list(ids)}}, projection or USER_SUMMARY_PROJECTION)
+    return {user['_id']: user for user in users}
+
+
+def user_block(user):
+    return {
+        'id': str(user['_id']),
+        'name': user.get('name', 'Unknown'),
+        'email': user.get('email', '')
+    }
+
+
+def enrich_complaints(db, complaints, fields=(ASSIGNEE,)):
+    """
+    Attach user blocks to a page of complaints.
+
+    Every user id referenced by ``fields`` across the whole page is fetched
+    with one users query, instead of one find_one per complaint. Complaints
+    whose user no longer exists are left without the block.
+    """
+    users = fetch_users(db, (complaint.get(source) for complaint in complaints for source, _ in fields))
+    if not users:
+        return complaints
+    for complaint in complaints:
+        for source, target in fields:
+            user = users.get(_as_object_id(complaint.get(source)))
+            if user:
+                complaint[target] = user_block(user)
+    return complaints
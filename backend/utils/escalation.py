@@ -0,0 +1,219 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+from utils.enrichment import fetch_users
+from utils.escalation_rules import DEADLINE_RULES, evaluate_rules
+from utils.metrics import ESCALATION_PHASE_DURATION
+from utils.notifications import queue_escalation_digest
+from utils.complaint_writes import complaints_written
+
+# Escalation deadlines.
+#
+# Every complaint stores escalateAt = createdAt + the threshold for its
+# priority, set when it is created and whenever its priority changes. The
+# escalation sweep then asks the (status, escalateAt) index for active
+# complaints whose deadline has passed instead of loading every active
+# complaint and comparing ages in Python.
+#
+# Overdue complaints are escalated in batches: one bulk_write per
+# ESCALATION_BATCH_SIZE complaints, one $in query for all their submitters,
+# and one digest email per submitter queued for background delivery.
+
+# Hours a complaint may stay active before it is escalated, by priority
+ESCALATION_THRESHOLD_HOURS = {
+    'high': 24,
+    'medium': 72,
+    'low': 120
+}
+DEFAULT_THRESHOLD_HOURS = 120
+
+ACTIVE_STATUSES = ['pending', 'in-progress']
+
+BACKFILL_BATCH_SIZE = 1000
+
+ESCALATION_BATCH_SIZE = int(os.getenv('ESCALATION_BATCH_SIZE', 500))
+
+_sweep_lock = threading.Lock()
+
+# Complaint fields an escalation reads (no comments/descriptions)
+SWEEP_PROJECTION = {
+    'subject': 1, 'status': 1, 'priority': 1, 'category': 1, 'user_id': 1, 'is_complex': 1,
+    'createdAt': 1, 'resolvedAt': 1, 'escalatedAt': 1, 'escalateAt': 1
+}
+
+
+def threshold_hours(priority):
+    return ESCALATION_THRESHOLD_HOURS.get(str(priority or 'low').lower(), DEFAULT_THRESHOLD_HOURS)
+
+
+def escalation_deadline(complaint):
+    """createdAt plus the priority's threshold, or None without createdAt"""
+    created_at = complaint.get('createdAt')
+    if not created_at:
+        return None
+    return created_at + timedelta(hours=threshold_hours(complaint.get('priority')))
+
+
+def due_query(now):
+    """Active complaints whose escalation deadline has passed (served by the status_1_escalateAt_1 index)"""
+    return {'status': {'$in': ACTIVE_STATUSES}, 'escalateAt': {'$lte': now}}
+
+
+def backfill_escalation_deadlines(db, query=None, batch_size=BACKFILL_BATCH_SIZE):
+    """
+    Set escalateAt on complaints that don't have one.
+
+    ``query`` narrows the complaints considered (e.g. to active ones).
+    Updates are sent with bulk_write in batches. Returns the number of
+    complaints updated.
+    """
+    query = dict(query or {}, escalateAt=None, createdAt={'$ne': None})
+    cursor = db.complaints.find(query, {'createdAt': 1, 'priority': 1}).batch_size(batch_size)
+    updated = 0
+    batch = []
+    for complaint in cursor:
+        batch.append(UpdateOne(
+            {'_id': complaint['_id'], 'escalateAt': None},
+            {'$set': {'escalateAt': escalation_deadline(complaint)}}
+        ))
+        if len(batch) >= batch_size:
+            updated += db.complaints.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += db.complaints.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+@contextmanager
+def _phase(timings, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def apply_escalations(db, escalations, batch_size=None, should_continue=None):
+    """
+    Write escalations with bulk_write, ESCALATION_BATCH_SIZE at a time.
+
+    ``escalations`` is a list of (complaint, fields, comment) where fields
+    are $set on the complaint (including escalatedAt) and comment (or None)
+    is pushed onto its comments. Complaints that are no longer active are
+    left alone. Returns the complaints that were written; only those are
+    recorded (counters, rollups, list version; see utils/complaint_writes.py).
+
+    ``should_continue`` is called before each batch; once it returns False
+    the remaining batches are not written (the scheduler passes its lease's
+    is_held, so a sweep stops when another process takes over).
+    """
+    size = batch_size or ESCALATION_BATCH_SIZE
+    written = []
+    for start in range(0, len(escalations), size):
+        if should_continue is not None and not should_continue():
+            print(f"[{datetime.now()}] Escalation stopped with {len(escalations) - start} complaints left unwritten")
+            break
+        chunk = escalations[start:start + size]
+        requests = []
+        for complaint, fields, comment in chunk:
+            update = {'$set': fields}
+            if comment:
+                update['$push'] = {'comments': comment}
+            requests.append(UpdateOne({'_id': complaint['_id'], 'status': {'$in': ACTIVE_STATUSES}}, update))
+        result = db.complaints.bulk_write(requests, ordered=False)
+        if result.modified_count != len(chunk):
+            print(f"[{datetime.now()}] {len(chunk) - result.modified_count} complaints changed status before they could be escalated")
+            # Read back which complaints carry this write's escalatedAt
+            changed = set()
+            for escalated_at in {fields['escalatedAt'] for _, fields, _ in chunk}:
+                changed.update(row['_id'] for row in db.complaints.find({
+                    '_id': {'$in': [complaint['_id'] for complaint, fields, _ in chunk if fields['escalatedAt'] == escalated_at]},
+                    'escalatedAt': escalated_at
+                }, {'_id': 1}))
+            chunk = [item for item in chunk if item[0]['_id'] in changed]
+        complaints_written(db, [(complaint, dict(complaint, **fields)) for complaint, fields, _ in chunk])
+        written.extend(complaint for complaint, _, _ in chunk)
+    return written
+
+
+def send_escalation_digests(db, complaints):
+    """Queue one digest email per submitter of ``complaints``; returns the number queued"""
+    users = fetch_users(db, (complaint.get('user_id') for complaint in complaints), {'name': 1, 'email': 1})
+    by_user = {}
+    for complaint in complaints:
+        user = users.get(complaint.get('user_id'))
+        if user and user.get('email'):
+            by_user.setdefault(user['_id'], []).append(complaint)
+    for user_id, user_complaints in by_user.items():
+        user = users[user_id]
+        queue_escalation_digest(user['email'], user.get('name', 'Customer'), user_complaints)
+    return len(by_user)
+
+
+def system_comment(content, now):
+    return {
+        '_id': ObjectId(),
+        'content': content,
+        'user_id': ObjectId(),
+        'user': {
+            'name': 'System',
+            'email': 'system@example.com'
+        },
+        'createdAt': now,
+        'isSystem': True
+    }
+
+
+def run_escalation_sweep(db, now=None, notify=True, batch_size=None, complaint_ids=None, dry_run=False,
+                         should_continue=None):
+    """
+    Escalate every active complaint past its escalateAt deadline, or only
+    those among ``complaint_ids`` (the escalation timer's due complaints).
+    Candidates come from DEADLINE_RULES (see utils/escalation_rules.py).
+    ``should_continue`` is checked between batches (see apply_escalations).
+
+    Returns {'escalated': [complaint, ...], 'digests': n, 'timings': {phase: ms}}
+    with timings for the backfill, select, update and notify phases. With
+    ``dry_run`` nothing is written or sent and 'escalated' lists what would be.
+    """
+    now = now or datetime.utcnow()
+    timings = {}
+    query = {'_id': {'$in': list(complaint_ids)}} if complaint_ids is not None else None
+
+    if dry_run:
+        overdue, timings['select'] = evaluate_rules(db, DEADLINE_RULES, now, query, SWEEP_PROJECTION)
+        return {'escalated': overdue, 'digests': 0, 'timings': timings, 'dryRun': True}
+
+    # The hourly sweep, the escalation timer and the admin check may run at
+    # the same time in one process; one at a time selects and writes, so a
+    # later one no longer sees what an earlier one escalated
+    with _sweep_lock:
+        if complaint_ids is None:
+            # Active complaints created before deadlines were stored get one now
+            # (normally none; index-bounded on status and a null escalateAt)
+            with _phase(timings, 'backfill'):
+                backfilled = backfill_escalation_deadlines(db, {'status': {'$in': ACTIVE_STATUSES}})
+            if backfilled:
+                print(f"[{now}] Set escalation deadlines on {backfilled} complaints")
+
+        overdue, timings['select'] = evaluate_rules(db, DEADLINE_RULES, now, query, SWEEP_PROJECTION)
+
+        with _phase(timings, 'update'):
+            fields = {'status': 'escalated', 'escalatedAt': now, 'updatedAt': now}
+            escalated = apply_escalations(db, [
+                (complaint, fields, system_comment(' '.join(complaint['escalationReasons']), now))
+                for complaint in overdue
+            ], batch_size, should_continue)
+
+    digests = 0
+    with _phase(timings, 'notify'):
+        if notify and escalated:
+            digests = send_escalation_digests(db, escalated)
+
+    for name, ms in timings.items():
+        ESCALATION_PHASE_DURATION.labels(phase=name).set(ms / 1000)
+    return {'escalated': escalated, 'digests': digests, 'timings': timings}
@@ -0,0 +1,150 @@
+import time
+from datetime import datetime, timedelta
+
+# Declarative escalation rules.
+#
+# A rule is a dict of conditions that must all hold, plus a name and the
+# reason recorded on an escalated complaint:
+#
+#   status            complaint status is one of these
+#   priority          complaint priority is one of these (optional)
+#   older_than_hours  createdAt is at least this many hours ago (optional)
+#   past_deadline     escalateAt has passed (optional, see utils/escalation.py)
+#   unless            {field: value} pairs the complaint must not have (optional)
+#
+# A rule set compiles into one aggregation: a $match on the $or of the
+# rules' conditions, written as plain query operators so the (status,
+# escalateAt) and (status, createdAt) indexes bound it, followed by an
+# $addFields whose $expr conditions name the rules each document matched.
+# A sweep therefore reads only the complaints that will escalate, in one
+# query, and gets each one's reasons back with it.
+
+RULE_KEYS = {'name', 'reason', 'status', 'priority', 'older_than_hours', 'past_deadline', 'unless'}
+
+# Scheduler, escalation timer and the admin check: the per-priority
+# thresholds stored on each complaint as escalateAt
+DEADLINE_RULES = [
+    {
+        'name': 'priority_threshold',
+        'status': ['pending', 'in-progress'],
+        'past_deadline': True,
+        'reason': 'Complaint automatically escalated due to exceeding time threshold for {priority} priority.'
+    }
+]
+
+# POST /api/complaints/escalation-check: first response and resolution windows
+SERVICE_LEVEL_RULES = [
+    {
+        'name': 'first_response',
+        'status': ['pending'],
+        'older_than_hours': 2,
+        'reason': 'No response within 2 hours'
+    },
+    {
+        'name': 'resolution',
+        'status': ['in-progress'],
+        'older_than_hours': 24,
+        'unless': {'is_complex': True},
+        'reason': 'Not resolved within 24 hours'
+    },
+    {
+        'name': 'high_priority',
+        'status': ['pending'],
+        'priority': ['high'],
+        'reason': 'High priority ticket requires immediate attention'
+    }
+]
+
+
+def validate_rules(rules):
+    """Raise ValueError for a rule set the compiler doesn't understand"""
+    names = set()
+    for rule in rules:
+        unknown = set(rule) - RULE_KEYS
+        if unknown:
+            raise ValueError(f"Unknown escalation rule keys: {', '.join(sorted(unknown))}")
+        if not rule.get('name') or not rule.get('status'):
+            raise ValueError('Escalation rules need a name and a status list')
+        if rule['name'] in names:
+            raise ValueError(f"Duplicate escalation rule: {rule['name']}")
+        names.add(rule['name'])
+    return rules
+
+
+def rule_query(rule, now):
+    """The rule as a query document"""
+    query = {'status': {'$in': list(rule['status'])}}
+    if rule.get('priority'):
+        query['priority'] = {'$in': list(rule['priority'])}
+    if rule.get('older_than_hours') is not None:
+        query['createdAt'] = {'$lte': now - timedelta(hours=rule['older_than_hours'])}
+    if rule.get('past_deadline'):
+        query['escalateAt'] = {'$lte': now}
+    for field, value in (rule.get('unless') or {}).items():
+        query[field] = {'$ne': value}
+    return query
+
+
+def _date_before(field, cutoff):
+    # Aggregation comparisons order null/missing below dates, so check the type too
+    return {'$and': [{'$eq': [{'$type': f'${field}'}, 'date']}, {'$lte': [f'${field}', cutoff]}]}
+
+
+def rule_expression(rule, now):
+    """The rule as an aggregation expression (same meaning as rule_query)"""
+    conditions = [{'$in': ['$status', list(rule['status'])]}]
+    if rule.get('priority'):
+        conditions.append({'$in': ['$priority', list(rule['priority'])]})
+    if rule.get('older_than_hours') is not None:
+        conditions.append(_date_before('createdAt', now - timedelta(hours=rule['older_than_hours'])))
+    if rule.get('past_deadline'):
+        conditions.append(_date_before('escalateAt', now))
+    for field, value in (rule.get('unless') or {}).items():
+        conditions.append({'$ne': [f'${field}', value]})
+    return {'$and': conditions}
+
+
+def compile_rules(rules, now):
+    """One filter matching every complaint at least one rule escalates"""
+    queries = [rule_query(rule, now) for rule in validate_rules(rules)]
+    return queries[0] if len(queries) == 1 else {'$or': queries}
+
+
+def rules_pipeline(rules, now, query=None, projection=None):
+    """
+    The aggregation a sweep runs: the compiled $match (narrowed by
+    ``query``, e.g. to one complaint) and matchedRules on each result.
+    """
+    match = compile_rules(rules, now)
+    if query:
+        match = {'$and': [query, match]}
+    pipeline = [
+        {'$match': match},
+        {'$addFields': {'matchedRules': {'$concatArrays': [
+            {'$cond': [rule_expression(rule, now), [rule['name']], []]} for rule in rules
+        ]}}}
+    ]
+    if projection:
+        pipeline.append({'$project': dict(projection, matchedRules=1)})
+    return pipeline
+
+
+def evaluate_rules(db, rules, now=None, query=None, projection=None):
+    """
+    Complaints the rules escalate, each with matchedRules (rule names) and
+    escalationReasons (their reasons). Returns (complaints, milliseconds).
+    """
+    now = now or datetime.utcnow()
+    started = time.perf_counter()
+    complaints = list(db.complaints.aggregate(rules_pipeline(rules, now, query, projection)))
+    by_name = {rule['name']: rule for rule in rules}
+    for complaint in complaints:
+        priority = str(complaint.get('priority') or 'low').lower()
+        complaint['escalationReasons'] = [
+            by_name[name]['reason'].format(priority=priority) for name in complaint['matchedRules']
+        ]
+    return complaints, round((time.perf_counter() - started) * 1000, 2)
+
+
+validate_rules(DEADLINE_RULES)
+validate_rules(SERVICE_LEVEL_RULES)
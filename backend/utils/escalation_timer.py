@@ -0,0 +1,146 @@
+import os
+import heapq
+import time
+import threading
+from datetime import datetime, timedelta
+from utils.escalation import ACTIVE_STATUSES, run_escalation_sweep
+
+# In-process timer of upcoming escalation deadlines.
+#
+# The process holding the scheduler lease keeps a min-heap of
+# (escalateAt, complaint id) for the active complaints due within the next
+# ESCALATION_TIMER_HORIZON_MINUTES. A tick every ESCALATION_TIMER_TICK_SECONDS
+# only looks at the top of the heap; complaints whose deadline has passed
+# are escalated right away, through the same guarded sweep as the hourly
+# job restricted to their ids, so a stale entry (resolved, re-prioritised)
+# is simply skipped. An idle tick touches no database.
+#
+# The heap is loaded from the (status, escalateAt) index when the lease is
+# taken and reloaded every ESCALATION_TIMER_REFRESH_SECONDS, which picks up
+# deadlines set by other processes and ones that have moved into the
+# horizon. Writes in this process (create, priority change, claim, resolve,
+# escalate, delete) call track() so the heap follows them without waiting
+# for the reload. The hourly sweep stays as a safety net.
+
+TICK_SECONDS = int(os.getenv('ESCALATION_TIMER_TICK_SECONDS', 15))
+REFRESH_SECONDS = int(os.getenv('ESCALATION_TIMER_REFRESH_SECONDS', 60))
+HORIZON_MINUTES = int(os.getenv('ESCALATION_TIMER_HORIZON_MINUTES', 15))
+
+
+class EscalationTimer:
+    def __init__(self, horizon_minutes=HORIZON_MINUTES, refresh_seconds=REFRESH_SECONDS):
+        self.horizon = timedelta(minutes=horizon_minutes)
+        self.refresh_seconds = refresh_seconds
+        self._heap = []        # (escalateAt, complaint id), possibly stale
+        self._deadlines = {}   # complaint id -> its current entry's escalateAt
+        self._pending = None   # changes tracked while a reload is running
+        self._horizon_end = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.escalated = 0
+
+    @property
+    def active(self):
+        return self._loaded_at is not None
+
+    def _set(self, complaint_id, deadline):
+        if deadline is None or deadline > self._horizon_end:
+            self._deadlines.pop(complaint_id, None)
+        elif self._deadlines.get(complaint_id) != deadline:
+            self._deadlines[complaint_id] = deadline
+            heapq.heappush(self._heap, (deadline, complaint_id))
+
+    def track(self, before, after):
+        """
+        Follow a complaint write: (before, after) as passed to
+        complaint_written (utils/complaint_writes.py), after None for a
+        deletion. A no-op unless this process runs the timer.
+        """
+        complaint = after if after is not None else before
+        if (not self.active and self._pending is None) or not complaint or complaint.get('_id') is None:
+            return
+        deadline = None
+        if after is not None and after.get('status') in ACTIVE_STATUSES:
+            deadline = after.get('escalateAt')
+        with self._lock:
+            if self._pending is not None:
+                self._pending[complaint['_id']] = deadline
+            if self.active:
+                self._set(complaint['_id'], deadline)
+
+    def load(self, db, now=None):
+        """(Re)load the deadlines due within the horizon from the index"""
+        now = now or datetime.utcnow()
+        horizon_end = now + self.horizon
+        with self._lock:
+            self._pending = {}
+        try:
+            rows = db.complaints.find(
+                {'status': {'$in': ACTIVE_STATUSES}, 'escalateAt': {'$lte': horizon_end}},
+                {'escalateAt': 1}
+            )
+            deadlines = {row['_id']: row['escalateAt'] for row in rows}
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._horizon_end = horizon_end
+            self._deadlines = deadlines
+            self._heap = [(deadline, complaint_id) for complaint_id, deadline in deadlines.items()]
+            heapq.heapify(self._heap)
+            # Writes made while the query ran win over what it read
+            for complaint_id, deadline in pending.items():
+                self._set(complaint_id, deadline)
+            self._loaded_at = time.monotonic()
+
+    def stop(self):
+        """Forget everything (the lease was lost); track() is a no-op until the next load"""
+        with self._lock:
+            self._heap, self._deadlines = [], {}
+            self._horizon_end = self._loaded_at = None
+
+    def pop_due(self, now):
+        """Ids of the complaints whose deadline is at or before ``now``"""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, complaint_id = heapq.heappop(self._heap)
+                if self._deadlines.get(complaint_id) == deadline:
+                    del self._deadlines[complaint_id]
+                    due.append(complaint_id)
+        return due
+
+    def tick(self, db, now=None, should_continue=None):
+        """
+        Reload when due, then escalate whatever has passed its deadline;
+        returns the number escalated. ``should_continue`` is passed on to
+        the sweep.
+        """
+        if not self.active or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            self.load(db, now)
+        now = now or datetime.utcnow()
+        due = self.pop_due(now)
+        if not due:
+            return 0
+        sweep = run_escalation_sweep(db, now, complaint_ids=due, should_continue=should_continue)
+        escalated = len(sweep['escalated'])
+        self.escalated += escalated
+        if escalated:
+            print(f"[{datetime.now()}] Escalation timer escalated {escalated} of {len(due)} due complaints "
+                  f"({sweep['timings']} ms)")
+        return escalated
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': self.active,
+                'scheduled': len(self._deadlines),
+                'nextDeadline': min(self._deadlines.values(), default=None),
+                'horizonEnd': self._horizon_end,
+                'escalated': self.escalated
+            }
+
+
+escalation_timer = EscalationTimer()
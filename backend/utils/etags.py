@@ -0,0 +1,104 @@
+import hashlib
+from bson import ObjectId
+from flask import current_app, request
+from pymongo.errors import OperationFailure
+
+# Conditional GETs for complaint reads.
+#
+# Every write to a complaint sets updatedAt, so (_id, updatedAt) identifies a
+# version of a complaint. Lists are versioned per collection instead: every
+# write that sets updatedAt, inserts or deletes also bumps a counter in
+# list_versions (bump_list_version, called for complaints by
+# utils/complaint_writes.py), and a list's ETag is its filter plus
+# that counter, so validating a list is one read by _id whatever the filter
+# matches. Any complaint write changes every list's ETag, which costs some
+# 304s but never serves a stale list. Routes compute the ETag before loading
+# anything else and answer 304 Not Modified when the client's If-None-Match
+# still matches, skipping the full fetch, enrichment and serialization.
+# Responses are sent with Cache-Control: private, no-cache so browsers keep
+# the body but revalidate on every request.
+
+# Index that answers version lookups by _id from the index alone (created by
+# init_db.py). The authorization fields are included so that a route can
+# check access before answering 304.
+VERSION_INDEX = [('_id', 1), ('updatedAt', 1), ('user_id', 1), ('assigned_to', 1)]
+VERSION_PROJECTION = {'_id': 1, 'updatedAt': 1, 'user_id': 1, 'assigned_to': 1}
+
+_use_version_index = True
+
+
+def make_etag(*parts):
+    """Strong ETag value (unquoted) from the given parts and the request's query string"""
+    digest = hashlib.sha1()
+    for part in parts + (request.query_string,):
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def document_version(collection, doc_id):
+    """
+    The _id, updatedAt, user_id and assigned_to of one document, or None.
+
+    Hinted to VERSION_INDEX so MongoDB answers it as a covered query. If the
+    index is missing the hint fails, and lookups fall back to the _id index.
+    """
+    global _use_version_index
+    if _use_version_index:
+        try:
+            return collection.find_one({'_id': doc_id}, VERSION_PROJECTION, hint=VERSION_INDEX)
+        except OperationFailure as e:
+            print(f"Version index unavailable, run init_db.py to create it: {e}")
+            _use_version_index = False
+    return collection.find_one({'_id': doc_id}, VERSION_PROJECTION)
+
+
+def document_etag(doc, *extra):
+    """ETag for a single document from its _id and updatedAt"""
+    return make_etag(doc['_id'], doc.get('updatedAt'), *extra)
+
+
+def bump_list_version(collection):
+    """Invalidate the list ETags of ``collection``; call after every write to it"""
+    try:
+        collection.database.list_versions.update_one(
+            {'_id': collection.name},
+            {'$inc': {'version': 1}, '$setOnInsert': {'epoch': ObjectId()}},
+            upsert=True
+        )
+    except Exception as e:
+        print(f"Failed to bump list version of {collection.name}: {e}")
+
+
+def list_version(collection):
+    """(epoch, version) of ``collection``; the epoch changes if the counter is ever lost"""
+    versions = collection.database.list_versions
+    doc = versions.find_one({'_id': collection.name})
+    if doc is None:
+        versions.update_one(
+            {'_id': collection.name},
+            {'$setOnInsert': {'version': 0, 'epoch': ObjectId()}},
+            upsert=True
+        )
+        doc = versions.find_one({'_id': collection.name}) or {}
+    return doc.get('epoch'), doc.get('version', 0)
+
+
+def list_etag(collection, query, *extra):
+    """ETag for the documents matching ``query`` from the collection's list version"""
+    return make_etag(query, *list_version(collection), *extra)
+
+
+def not_modified(etag):
+    """A 304 response if the request's If-None-Match matches ``etag``, else None"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return with_etag(current_app.response_class(status=304), etag)
+
+
+def with_etag(response, etag):
+    """Attach ``etag`` and revalidation caching headers to a response"""
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,200 @@
+import os
+import time
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+# Background jobs with their state in MongoDB.
+#
+# start_job() records a job in the jobs collection and runs it on a small
+# thread pool, so a long sweep doesn't hold the HTTP request (the endpoint
+# answers 202 with the job id). The job document carries its status
+# (queued -> running -> completed | failed), progress checkpoints the job
+# writes as it goes, and the result or error, so any process can report it.
+#
+# A job started with a key is deduplicated: while it is queued or running
+# it has active: true, and a unique index on key (partial on active) lets
+# only one such job exist. A second identical request gets the running job
+# back instead of starting another. While a job is queued or running, a
+# heartbeat thread in its process refreshes updatedAt every third of
+# JOB_STALE_SECONDS, so a job whose document hasn't been touched for
+# JOB_STALE_SECONDS belongs to a dead process; it is marked failed and no
+# longer blocks a new one. Every later state change is conditional on the
+# job still being active, so a job that was given up on never overwrites
+# that outcome.
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', 300))
+
+ACTIVE_JOB_INDEX = [('key', 1)]
+
+_job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='job')
+
+_indexed = set()
+_indexed_lock = threading.Lock()
+
+# Jobs of this process that are queued or running: job id -> db
+_live_jobs = {}
+_live_jobs_lock = threading.Lock()
+_heartbeat_thread = None
+
+
+def _heartbeat():
+    while True:
+        time.sleep(max(JOB_STALE_SECONDS / 3, 0.1))
+        with _live_jobs_lock:
+            by_db = {}
+            for job_id, db in _live_jobs.items():
+                by_db.setdefault(id(db), (db, []))[1].append(job_id)
+        for db, job_ids in by_db.values():
+            try:
+                db.jobs.update_many(
+                    {'_id': {'$in': job_ids}, 'active': True},
+                    {'$set': {'updatedAt': datetime.utcnow()}}
+                )
+            except Exception as e:
+                print(f"[{datetime.now()}] Job heartbeat failed: {e}")
+
+
+def _watch(db, job_id):
+    global _heartbeat_thread
+    with _live_jobs_lock:
+        _live_jobs[job_id] = db
+        if _heartbeat_thread is None:
+            _heartbeat_thread = threading.Thread(target=_heartbeat, name='job-heartbeat', daemon=True)
+            _heartbeat_thread.start()
+
+
+def _unwatch(job_id):
+    with _live_jobs_lock:
+        _live_jobs.pop(job_id, None)
+
+
+def ensure_job_indexes(db):
+    """Create the dedupe index once per database (init_db creates it as well)"""
+    with _indexed_lock:
+        if id(db) in _indexed:
+            return
+        db.jobs.create_index(ACTIVE_JOB_INDEX, unique=True, partialFilterExpression={'active': True})
+        db.jobs.create_index('createdAt')
+        _indexed.add(id(db))
+
+
+def _expire_stale(db, job, now):
+    """Mark an active job whose process stopped updating it as failed; True if it was"""
+    if job['updatedAt'] > now - timedelta(seconds=JOB_STALE_SECONDS):
+        return False
+    result = db.jobs.update_one(
+        {'_id': job['_id'], 'active': True, 'updatedAt': job['updatedAt']},
+        {'$set': {'status': 'failed', 'error': 'Job stopped reporting progress', 'finishedAt': now, 'updatedAt': now},
+         '$unset': {'active': ''}}
+    )
+    return result.modified_count > 0 or db.jobs.count_documents({'_id': job['_id'], 'active': True}) == 0
+
+
+def start_job(app, job_type, target, key=None, params=None, requested_by=None):
+    """
+    Record a job and run ``target(db, checkpoint)`` on the job executor in
+    an app context. ``checkpoint(**progress)`` stores progress fields on the
+    job; target's return value becomes the job's result.
+
+    Returns (job, started): with a ``key`` that already has an active job,
+    that job is returned with started False.
+    """
+    db = app.config['db']
+    ensure_job_indexes(db)
+    for _ in range(2):
+        now = datetime.utcnow()
+        job = {
+            '_id': ObjectId(),
+            'type': job_type,
+            'status': 'queued',
+            'params': params or {},
+            'progress': {},
+            'requestedBy': requested_by,
+            'createdAt': now,
+            'updatedAt': now
+        }
+        job.update(key=key or str(job['_id']), active=True)
+        try:
+            db.jobs.insert_one(job)
+        except DuplicateKeyError:
+            existing = db.jobs.find_one({'key': key, 'active': True})
+            if existing and not _expire_stale(db, existing, now):
+                return existing, False
+            continue
+        _watch(db, job['_id'])
+        try:
+            _job_executor.submit(_run, app, job['_id'], target)
+        except Exception:
+            _unwatch(job['_id'])
+            raise
+        return job, True
+    raise RuntimeError(f'Could not start {job_type} job')
+
+
+def _run(app, job_id, target):
+    try:
+        with app.app_context():
+            _execute(app.config['db'], job_id, target)
+    finally:
+        _unwatch(job_id)
+
+
+def _execute(db, job_id, target):
+    def checkpoint(**progress):
+        fields = {f'progress.{name}': value for name, value in progress.items()}
+        fields['updatedAt'] = datetime.utcnow()
+        db.jobs.update_one({'_id': job_id, 'active': True}, {'$set': fields})
+
+    now = datetime.utcnow()
+    started = db.jobs.update_one({'_id': job_id, 'active': True, 'status': 'queued'}, {'$set': {
+        'status': 'running',
+        'startedAt': now,
+        'updatedAt': now,
+        'worker': f'{socket.gethostname()}:{os.getpid()}'
+    }})
+    if not started.modified_count:
+        print(f"[{datetime.now()}] Job {job_id} was given up on before it started")
+        return
+    try:
+        result = target(db, checkpoint)
+        outcome = {'status': 'completed', 'result': result}
+    except Exception as e:
+        print(f"[{datetime.now()}] Job {job_id} failed: {e}")
+        outcome = {'status': 'failed', 'error': str(e)}
+    now = datetime.utcnow()
+    outcome.update(finishedAt=now, updatedAt=now)
+    finished = db.jobs.update_one(
+        {'_id': job_id, 'active': True, 'status': 'running'},
+        {'$set': outcome, '$unset': {'active': ''}}
+    )
+    if not finished.modified_count:
+        print(f"[{datetime.now()}] Job {job_id} finished after it was given up on; outcome not recorded")
+
+
+def get_job(db, job_id):
+    """The job document, or None for an unknown or malformed id"""
+    try:
+        return db.jobs.find_one({'_id': ObjectId(job_id)})
+    except Exception:
+        return None
+
+
+def format_job(job):
+    """The job as returned by the status endpoints"""
+    return {
+        'job_id': str(job['_id']),
+        'type': job.get('type'),
+        'status': job.get('status'),
+        'progress': job.get('progress', {}),
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'createdAt': job.get('createdAt'),
+        'startedAt': job.get('startedAt'),
+        'finishedAt': job.get('finishedAt'),
+        'updatedAt': job.get('updatedAt')
+    }
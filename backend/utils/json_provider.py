@@ -0,0 +1,70 @@
+from datetime import date, datetime
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional C encoder; the standard library one is used instead
+    orjson = None
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that serializes MongoDB documents directly.
+
+    ObjectId is written as its hex string and datetime/date as ISO 8601
+    (``datetime.isoformat()``), so routes can jsonify documents as they
+    come back from pymongo instead of converting fields by hand. orjson is
+    used when installed; the standard library encoder produces the same
+    output and is the fallback for anything orjson rejects (e.g. integers
+    wider than 64 bits).
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, ObjectId):
+            return str(o)
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def _orjson_option(self, pretty=False):
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and set(kwargs) <= {'indent', 'separators'}:
+            try:
+                return orjson.dumps(obj, default=self.default,
+                                    option=self._orjson_option(bool(kwargs.get('indent')))).decode()
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def dumps_bytes(self, obj, pretty=False):
+        """Serialize to UTF-8 bytes without an intermediate str when orjson is available"""
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_option(pretty))
+            except TypeError:
+                pass
+        return super().dumps(obj, **({'indent': 2} if pretty else {'separators': (',', ':')})).encode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, pretty) + b'\n', mimetype=self.mimetype)
+
+
+def init_json(app):
+    app.json = JSONProvider(app)
+    return app.json
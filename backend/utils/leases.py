@@ -0,0 +1,119 @@
+import os
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+# Leases on singleton work (the scheduler) shared by every process.
+#
+# A lease is one document in the leases collection:
+#   {_id: name, owner, acquiredAt, renewedAt, expiresAt}
+# A process takes it with a single find_one_and_update that only matches
+# when the lease is free (expired) or already its own, upserting when there
+# is no document yet; if another process holds it the filter doesn't match,
+# the upsert collides on _id and DuplicateKeyError means "held elsewhere".
+# The holder renews it every SCHEDULER_LEASE_RENEW_SECONDS, pushing
+# expiresAt SCHEDULER_LEASE_TTL_SECONDS ahead. When the holder dies its
+# lease simply runs out and the next standby to renew takes over.
+#
+# The holder treats the lease as its own only until the TTL has passed on
+# its own monotonic clock, counted from before the renewal was sent, so a
+# holder that can't reach MongoDB stops running jobs before anyone else
+# can take over. expiresAt is compared against the clock of whichever
+# process tries to take the lease, so hosts should keep their clocks in
+# sync to well within the TTL.
+
+LEASE_TTL_SECONDS = int(os.getenv('SCHEDULER_LEASE_TTL_SECONDS', 60))
+LEASE_RENEW_SECONDS = int(os.getenv('SCHEDULER_LEASE_RENEW_SECONDS', 20))
+
+SCHEDULER_LEASE = 'scheduler'
+
+
+def owner_id():
+    """hostname:pid:random, unique per Lease even across forks and restarts"""
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class Lease:
+    def __init__(self, db, name, ttl_seconds=LEASE_TTL_SECONDS):
+        self.db = db
+        self.name = name
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.owner = owner_id()
+        self._held_until = None  # time.monotonic() deadline while held
+        self._lock = threading.Lock()
+
+    def is_held(self):
+        """Whether this process may act as the lease holder right now"""
+        held_until = self._held_until
+        return held_until is not None and time.monotonic() < held_until
+
+    def renew(self):
+        """
+        Acquire the lease, or extend it if already held. Returns True while
+        this process holds it. Transitions are logged.
+        """
+        with self._lock:
+            was_held = self.is_held()
+            started = time.monotonic()
+            now = datetime.utcnow()
+            fields = {'owner': self.owner, 'renewedAt': now, 'expiresAt': now + self.ttl}
+            if not was_held:
+                fields['acquiredAt'] = now
+            try:
+                lease = self.db.leases.find_one_and_update(
+                    {'_id': self.name, '$or': [{'owner': self.owner}, {'expiresAt': {'$lte': now}}]},
+                    {'$set': fields},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+                held = lease is not None and lease.get('owner') == self.owner
+            except DuplicateKeyError:
+                held = False
+            except Exception as e:
+                # Keep what's left of the current term; it runs out on its own
+                print(f"[{datetime.now()}] Could not renew lease '{self.name}': {e}")
+                return self.is_held()
+
+            self._held_until = started + self.ttl.total_seconds() if held else None
+            if held and not was_held:
+                print(f"[{datetime.now()}] Acquired lease '{self.name}' as {self.owner}")
+            elif was_held and not held:
+                print(f"[{datetime.now()}] Lost lease '{self.name}'")
+            return held
+
+    def release(self):
+        """Give the lease up so a standby can take it without waiting for the TTL"""
+        with self._lock:
+            if self._held_until is None:
+                return
+            self._held_until = None
+            try:
+                self.db.leases.update_one(
+                    {'_id': self.name, 'owner': self.owner},
+                    {'$set': {'expiresAt': datetime.utcnow()}}
+                )
+                print(f"[{datetime.now()}] Released lease '{self.name}'")
+            except Exception as e:
+                print(f"[{datetime.now()}] Could not release lease '{self.name}': {e}")
+
+
+def lease_status(db, name, lease=None):
+    """
+    Who holds lease ``name``, for the health endpoint. ``lease`` is this
+    process's Lease on it, if any.
+    """
+    document = db.leases.find_one({'_id': name}) or {}
+    expires_at = document.get('expiresAt')
+    active = expires_at is not None and expires_at > datetime.utcnow()
+    return {
+        'name': name,
+        'owner': document.get('owner') if active else None,
+        'acquiredAt': document.get('acquiredAt') if active else None,
+        'expiresAt': expires_at if active else None,
+        'thisProcess': lease.owner if lease else None,
+        'heldByThisProcess': bool(lease and lease.is_held())
+    }
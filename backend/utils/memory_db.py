@@ -0,0 +1,1374 @@
+import re
+import copy
+import math
+import threading
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.operations import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+# In-memory stand-in for a pymongo Database, used when MONGO_URI is not set
+# (or DB_BACKEND=memory) so the API, load tests and benchmarks run offline.
+#
+# It implements the part of the pymongo API this codebase uses: CRUD with
+# projection/sort/skip/limit, the common query and update operators, upserts,
+# find_one_and_update, bulk_write, unique (optionally partial) indexes, and
+# the aggregation stages and expressions used by the admin and stats
+# endpoints. Everything is kept in process memory behind one lock per
+# database; documents are copied on the way in and out like a real driver.
+
+_MISSING = object()
+
+
+# ─── Values, paths and ordering ────────────────────────────────────────────────
+
+def _type_rank(value):
+    """BSON comparison order: null < numbers < strings < objects < arrays < ObjectId < bool < dates"""
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, (list, tuple)):
+        return 5
+    if isinstance(value, bytes):
+        return 6
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+
+def _sort_key(value):
+    rank = _type_rank(value)
+    if rank == 1:
+        return (rank, 0)
+    if rank == 4:
+        return (rank, tuple((k, _sort_key(v)) for k, v in value.items()))
+    if rank == 5:
+        return (rank, tuple(_sort_key(v) for v in value))
+    if rank == 10:
+        return (rank, str(value))
+    return (rank, value)
+
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return ('__dict__', tuple((k, _hashable(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return ('__list__', tuple(_hashable(v) for v in value))
+    if isinstance(value, bool):
+        return ('__bool__', value)
+    return value
+
+
+def _equals(a, b):
+    if isinstance(a, bool) != isinstance(b, bool):
+        return False
+    if _type_rank(a) != _type_rank(b):
+        return False
+    return _sort_key(a) == _sort_key(b)
+
+
+def _resolve(value, parts):
+    """Value at a dotted path, mapping over arrays the way aggregation field paths do"""
+    for i, part in enumerate(parts):
+        if isinstance(value, dict):
+            if part not in value:
+                return _MISSING
+            value = value[part]
+        elif isinstance(value, list):
+            if part.isdigit():
+                index = int(part)
+                if index >= len(value):
+                    return _MISSING
+                value = value[index]
+                continue
+            resolved = (_resolve(item, parts[i:]) for item in value if isinstance(item, dict))
+            return [item for item in resolved if item is not _MISSING]
+        else:
+            return _MISSING
+    return value
+
+
+def _get(doc, path):
+    return _resolve(doc, path.split('.'))
+
+
+def _lookup(doc, path):
+    """All values a query on ``path`` should consider, descending into arrays"""
+    current = [doc]
+    for part in path.split('.'):
+        found = []
+        for value in current:
+            if isinstance(value, dict):
+                if part in value:
+                    found.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit() and int(part) < len(value):
+                    found.append(value[int(part)])
+                for item in value:
+                    if isinstance(item, dict) and part in item:
+                        found.append(item[part])
+        current = found
+    return current
+
+
+def _set_path(doc, path, value):
+    parts = path.split('.')
+    target = doc
+    for part in parts[:-1]:
+        if isinstance(target, list) and part.isdigit():
+            target = target[int(part)]
+            continue
+        if not isinstance(target.get(part), (dict, list)):
+            target[part] = {}
+        target = target[part]
+    last = parts[-1]
+    if isinstance(target, list) and last.isdigit():
+        index = int(last)
+        while len(target) <= index:
+            target.append(None)
+        target[index] = value
+    else:
+        target[last] = value
+
+
+def _unset_path(doc, path):
+    parts = path.split('.')
+    target = doc
+    for part in parts[:-1]:
+        if isinstance(target, dict):
+            target = target.get(part)
+        elif isinstance(target, list) and part.isdigit() and int(part) < len(target):
+            target = target[int(part)]
+        else:
+            return
+    if isinstance(target, dict):
+        target.pop(parts[-1], None)
+    elif isinstance(target, list) and parts[-1].isdigit() and int(parts[-1]) < len(target):
+        target[int(parts[-1])] = None
+
+
+def _sort_spec(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [tuple(item) if isinstance(item, (list, tuple)) else (item, 1) for item in key_or_list]
+
+
+def _sort_documents(docs, spec):
+    docs = list(docs)
+    for key, direction in reversed(spec):
+        docs.sort(key=lambda doc: _sort_key(_get(doc, key)), reverse=direction == -1)
+    return docs
+
+
+# ─── Queries ───────────────────────────────────────────────────────────────────
+
+def _candidates(values):
+    """Each value plus the elements of any array values"""
+    expanded = []
+    for value in values:
+        expanded.append(value)
+        if isinstance(value, list):
+            expanded.extend(value)
+    return expanded
+
+
+def _match_equal(values, target):
+    if isinstance(target, re.Pattern):
+        return any(isinstance(v, str) and target.search(v) for v in _candidates(values))
+    if target is None and not values:
+        return True
+    return any(_equals(v, target) for v in _candidates(values))
+
+
+def _compare(values, target, test):
+    rank = _type_rank(target)
+    target_key = _sort_key(target)
+    return any(_type_rank(v) == rank and test(_sort_key(v), target_key) for v in _candidates(values))
+
+
+def _regex(pattern, options=''):
+    if isinstance(pattern, re.Pattern):
+        return pattern
+    flags = 0
+    for option, flag in (('i', re.IGNORECASE), ('m', re.MULTILINE), ('s', re.DOTALL), ('x', re.VERBOSE)):
+        if option in options:
+            flags |= flag
+    return re.compile(pattern, flags)
+
+
+def _is_operator_dict(value):
+    return isinstance(value, dict) and bool(value) and all(k.startswith('$') for k in value)
+
+
+def _match_operators(values, conditions):
+    for operator, argument in conditions.items():
+        if operator == '$eq':
+            matched = _match_equal(values, argument)
+        elif operator == '$ne':
+            matched = not _match_equal(values, argument)
+        elif operator == '$gt':
+            matched = _compare(values, argument, lambda a, b: a > b)
+        elif operator == '$gte':
+            matched = _compare(values, argument, lambda a, b: a >= b)
+        elif operator == '$lt':
+            matched = _compare(values, argument, lambda a, b: a < b)
+        elif operator == '$lte':
+            matched = _compare(values, argument, lambda a, b: a <= b)
+        elif operator == '$in':
+            matched = any(_match_equal(values, item) for item in argument)
+        elif operator == '$nin':
+            matched = not any(_match_equal(values, item) for item in argument)
+        elif operator == '$exists':
+            matched = bool(values) == bool(argument)
+        elif operator == '$regex':
+            pattern = _regex(argument, conditions.get('$options', ''))
+            matched = _match_equal(values, pattern)
+        elif operator == '$options':
+            continue
+        elif operator == '$not':
+            if isinstance(argument, dict):
+                matched = not _match_operators(values, argument)
+            else:
+                matched = not _match_equal(values, _regex(argument))
+        elif operator == '$size':
+            matched = any(isinstance(v, list) and len(v) == argument for v in values)
+        elif operator == '$all':
+            matched = all(_match_equal(values, item) for item in argument)
+        elif operator == '$elemMatch':
+            matched = any(
+                isinstance(v, list) and any(_match_element(item, argument) for item in v)
+                for v in values
+            )
+        elif operator == '$type':
+            names = argument if isinstance(argument, list) else [argument]
+            matched = any(_type_name(v) in names for v in _candidates(values))
+        else:
+            raise OperationFailure(f"unknown operator: {operator}", 2)
+        if not matched:
+            return False
+    return True
+
+
+def _match_element(item, condition):
+    if _is_operator_dict(condition):
+        return _match_operators([item], condition)
+    return isinstance(item, dict) and matches(item, condition)
+
+
+def _type_name(value):
+    return {
+        1: 'null', 2: 'double' if isinstance(value, float) else 'int', 3: 'string', 4: 'object',
+        5: 'array', 6: 'binData', 7: 'objectId', 8: 'bool', 9: 'date'
+    }.get(_type_rank(value), 'unknown')
+
+
+def matches(doc, query):
+    """True if ``doc`` satisfies the MongoDB query document ``query``"""
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            if not all(matches(doc, q) for q in condition):
+                return False
+        elif key == '$or':
+            if not any(matches(doc, q) for q in condition):
+                return False
+        elif key == '$nor':
+            if any(matches(doc, q) for q in condition):
+                return False
+        elif key == '$expr':
+            if not _truthy(evaluate(condition, doc)):
+                return False
+        elif key.startswith('$'):
+            raise OperationFailure(f"unknown top level operator: {key}", 2)
+        else:
+            values = _lookup(doc, key)
+            if _is_operator_dict(condition):
+                if not _match_operators(values, condition):
+                    return False
+            elif not _match_equal(values, condition):
+                return False
+    return True
+
+
+# ─── Projection ────────────────────────────────────────────────────────────────
+
+def _copy_path(source, target, parts):
+    head, rest = parts[0], parts[1:]
+    if not isinstance(source, dict) or head not in source:
+        return
+    value = source[head]
+    if not rest:
+        target[head] = copy.deepcopy(value)
+    elif isinstance(value, dict):
+        _copy_path(value, target.setdefault(head, {}), rest)
+    elif isinstance(value, list):
+        items = target.setdefault(head, [{} for item in value if isinstance(item, dict)])
+        for item, projected in zip([item for item in value if isinstance(item, dict)], items):
+            _copy_path(item, projected, rest)
+
+
+def project(doc, projection):
+    """Apply a find() projection, returning a new document"""
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get('_id', 1)
+    fields = {k: v for k, v in projection.items() if k != '_id'}
+
+    if any(_truthy(v) for v in fields.values()):
+        result = {}
+        if include_id and '_id' in doc:
+            result['_id'] = copy.deepcopy(doc['_id'])
+        for path, flag in fields.items():
+            if isinstance(flag, dict) or (isinstance(flag, str) and flag.startswith('$')):
+                # Aggregation expression (find projections accept these since MongoDB 4.4)
+                value = evaluate(flag, doc)
+                if value is not _MISSING:
+                    _set_path(result, path, value)
+            elif _truthy(flag):
+                _copy_path(doc, result, path.split('.'))
+        return result
+
+    result = copy.deepcopy(doc)
+    for path in fields:
+        _unset_path(result, path)
+    if not include_id:
+        result.pop('_id', None)
+    return result
+
+
+# ─── Updates ───────────────────────────────────────────────────────────────────
+
+def _each(value):
+    if isinstance(value, dict) and '$each' in value:
+        return value['$each'], value
+    return [value], {}
+
+
+def apply_update(doc, update, is_insert=False):
+    """Apply an update document to ``doc`` in place"""
+    if not any(key.startswith('$') for key in update):
+        raise OperationFailure('update document requires atomic operators', 9)
+
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            if operator == '$set':
+                _set_path(doc, path, copy.deepcopy(value))
+            elif operator == '$setOnInsert':
+                if is_insert:
+                    _set_path(doc, path, copy.deepcopy(value))
+            elif operator == '$unset':
+                _unset_path(doc, path)
+            elif operator in ('$inc', '$mul'):
+                current = _get(doc, path)
+                if current is _MISSING:
+                    current = 0
+                if not isinstance(current, (int, float)) or isinstance(current, bool):
+                    raise OperationFailure(f"Cannot apply {operator} to a value of non-numeric type", 14)
+                _set_path(doc, path, current + value if operator == '$inc' else current * value)
+            elif operator in ('$min', '$max'):
+                current = _get(doc, path)
+                if current is _MISSING or (
+                    _sort_key(value) < _sort_key(current) if operator == '$min' else _sort_key(value) > _sort_key(current)
+                ):
+                    _set_path(doc, path, copy.deepcopy(value))
+            elif operator == '$currentDate':
+                _set_path(doc, path, datetime.utcnow())
+            elif operator in ('$push', '$addToSet'):
+                current = _get(doc, path)
+                if current is _MISSING:
+                    current = []
+                    _set_path(doc, path, current)
+                if not isinstance(current, list):
+                    raise OperationFailure(f"The field '{path}' must be an array", 2)
+                items, modifiers = _each(value)
+                for item in items:
+                    if operator == '$push' or not any(_equals(item, existing) for existing in current):
+                        current.append(copy.deepcopy(item))
+                if '$slice' in modifiers:
+                    limit = modifiers['$slice']
+                    current[:] = current[:limit] if limit >= 0 else current[limit:]
+            elif operator == '$pull':
+                current = _get(doc, path)
+                if isinstance(current, list):
+                    current[:] = [item for item in current if not _match_element(item, value)
+                                  and not _equals(item, value)]
+            elif operator == '$pop':
+                current = _get(doc, path)
+                if isinstance(current, list) and current:
+                    current.pop(0 if value == -1 else -1)
+            elif operator == '$rename':
+                current = _get(doc, path)
+                if current is not _MISSING:
+                    _unset_path(doc, path)
+                    _set_path(doc, value, current)
+            else:
+                raise OperationFailure(f"Unknown modifier: {operator}", 9)
+
+
+def _upsert_seed(query):
+    """The document an upsert starts from: the equality conditions of its filter"""
+    seed = {}
+    for key, condition in (query or {}).items():
+        if key == '$and':
+            for part in condition:
+                for path, value in _upsert_seed(part).items():
+                    _set_path(seed, path, value)
+        elif key.startswith('$'):
+            continue
+        elif _is_operator_dict(condition):
+            if '$eq' in condition:
+                _set_path(seed, key, copy.deepcopy(condition['$eq']))
+        else:
+            _set_path(seed, key, copy.deepcopy(condition))
+    return seed
+
+
+# ─── Aggregation expressions ───────────────────────────────────────────────────
+
+def _truthy(value):
+    return value not in (None, False, 0, _MISSING)
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _date_to_string(fmt, date):
+    fmt = fmt.replace('%L', f"{date.microsecond // 1000:03d}")
+    return date.strftime(fmt)
+
+
+def evaluate(expr, doc, variables=None):
+    """Evaluate an aggregation expression against ``doc``"""
+    if isinstance(expr, str) and expr.startswith('$$'):
+        name, _, rest = expr[2:].partition('.')
+        if name == 'ROOT' or name == 'CURRENT':
+            base = doc
+        elif name == 'NOW':
+            base = datetime.utcnow()
+        else:
+            base = (variables or {}).get(name, _MISSING)
+        return _resolve(base, rest.split('.')) if rest else base
+    if isinstance(expr, str) and expr.startswith('$'):
+        return _get(doc, expr[1:])
+    if isinstance(expr, list):
+        return [_value(evaluate(item, doc, variables)) for item in expr]
+    if isinstance(expr, dict):
+        if len(expr) == 1:
+            operator, argument = next(iter(expr.items()))
+            if operator.startswith('$'):
+                return _operator(operator, argument, doc, variables)
+        return {key: _value(evaluate(value, doc, variables)) for key, value in expr.items()}
+    return expr
+
+
+def _value(value):
+    return None if value is _MISSING else value
+
+
+def _args(argument, doc, variables):
+    if isinstance(argument, list):
+        return [_value(evaluate(item, doc, variables)) for item in argument]
+    return [_value(evaluate(argument, doc, variables))]
+
+
+def _operator(operator, argument, doc, variables):
+    if operator == '$literal':
+        return argument
+
+    if operator in ('$cond', '$switch', '$filter', '$map', '$reduce', '$let', '$dateToString', '$and', '$or'):
+        return _control_operator(operator, argument, doc, variables)
+
+    args = _args(argument, doc, variables)
+
+    if operator == '$add':
+        dates = [a for a in args if isinstance(a, datetime)]
+        if any(a is None for a in args):
+            return None
+        total = sum(a for a in args if _number(a))
+        return dates[0] + timedelta(milliseconds=total) if dates else total
+    if operator == '$subtract':
+        a, b = args
+        if a is None or b is None:
+            return None
+        if isinstance(a, datetime) and isinstance(b, datetime):
+            return int((a - b).total_seconds() * 1000)
+        if isinstance(a, datetime):
+            return a - timedelta(milliseconds=b)
+        return a - b
+    if operator == '$multiply':
+        if any(a is None for a in args):
+            return None
+        product = 1
+        for a in args:
+            product *= a
+        return product
+    if operator == '$divide':
+        a, b = args
+        if a is None or b is None:
+            return None
+        if b == 0:
+            raise OperationFailure("can't $divide by zero", 2)
+        return a / b
+    if operator == '$mod':
+        a, b = args
+        return None if a is None or b is None else a % b
+    if operator in ('$abs', '$floor', '$ceil'):
+        value = args[0]
+        if value is None:
+            return None
+        return {'$abs': abs, '$floor': math.floor, '$ceil': math.ceil}[operator](value)
+    if operator == '$round':
+        value, places = (args + [0])[:2]
+        return None if value is None else round(value, places)
+    if operator in ('$sum', '$avg', '$min', '$max'):
+        values = args[0] if len(args) == 1 and isinstance(args[0], list) else args
+        return _accumulate(operator, values)
+    if operator in ('$eq', '$ne', '$gt', '$gte', '$lt', '$lte', '$cmp'):
+        a, b = (_sort_key(v) for v in args)
+        return {
+            '$eq': a == b, '$ne': a != b, '$gt': a > b, '$gte': a >= b,
+            '$lt': a < b, '$lte': a <= b, '$cmp': (a > b) - (a < b)
+        }[operator]
+    if operator == '$not':
+        return not _truthy(args[0])
+    if operator == '$in':
+        value, array = args
+        return any(_equals(value, item) for item in array or [])
+    if operator == '$ifNull':
+        return next((a for a in args[:-1] if a is not None), args[-1])
+    if operator == '$size':
+        if not isinstance(args[0], list):
+            raise OperationFailure('The argument to $size must be an array', 17124)
+        return len(args[0])
+    if operator == '$arrayElemAt':
+        array, index = args
+        if not isinstance(array, list) or not -len(array) <= index < len(array):
+            return _MISSING
+        return array[index]
+    if operator in ('$first', '$last'):
+        array = args[0]
+        if not isinstance(array, list) or not array:
+            return _MISSING
+        return array[0] if operator == '$first' else array[-1]
+    if operator == '$concat':
+        return None if any(a is None for a in args) else ''.join(args)
+    if operator == '$concatArrays':
+        return None if any(a is None for a in args) else [item for array in args for item in array]
+    if operator == '$substrCP':
+        value, start, length = args
+        return '' if value is None else str(value)[start:start + length]
+    if operator == '$strLenCP':
+        return len(args[0])
+    if operator in ('$toLower', '$toUpper'):
+        value = '' if args[0] is None else str(args[0])
+        return value.lower() if operator == '$toLower' else value.upper()
+    if operator == '$toString':
+        value = args[0]
+        if value is None:
+            return None
+        return value.isoformat() + 'Z' if isinstance(value, datetime) else str(value)
+    if operator == '$toObjectId':
+        return None if args[0] is None else ObjectId(args[0])
+    if operator in ('$year', '$month', '$dayOfMonth', '$hour', '$minute', '$second', '$dayOfWeek'):
+        date = args[0]
+        if date is None:
+            return None
+        if operator == '$dayOfWeek':
+            return date.isoweekday() % 7 + 1
+        return getattr(date, {'$year': 'year', '$month': 'month', '$dayOfMonth': 'day',
+                              '$hour': 'hour', '$minute': 'minute', '$second': 'second'}[operator])
+    if operator == '$dateTrunc':
+        return _date_trunc(argument, doc, variables)
+    if operator == '$type':
+        return _type_name(args[0])
+    if operator == '$objectToArray':
+        return [{'k': k, 'v': v} for k, v in (args[0] or {}).items()]
+    if operator == '$arrayToObject':
+        return {item['k']: item['v'] if isinstance(item, dict) else item[1] for item in args[0] or []}
+    raise OperationFailure(f"Unrecognized expression '{operator}'", 168)
+
+
+def _control_operator(operator, argument, doc, variables):
+    if operator == '$cond':
+        if isinstance(argument, list):
+            condition, then, otherwise = argument
+        else:
+            condition, then, otherwise = argument['if'], argument['then'], argument['else']
+        chosen = then if _truthy(evaluate(condition, doc, variables)) else otherwise
+        return _value(evaluate(chosen, doc, variables))
+    if operator == '$switch':
+        for branch in argument['branches']:
+            if _truthy(evaluate(branch['case'], doc, variables)):
+                return _value(evaluate(branch['then'], doc, variables))
+        if 'default' not in argument:
+            raise OperationFailure('$switch could not find a matching branch for an input, '
+                                   'and no default was specified.', 40066)
+        return _value(evaluate(argument['default'], doc, variables))
+    if operator == '$and':
+        return all(_truthy(evaluate(item, doc, variables)) for item in argument)
+    if operator == '$or':
+        return any(_truthy(evaluate(item, doc, variables)) for item in argument)
+    if operator in ('$filter', '$map'):
+        array = _value(evaluate(argument['input'], doc, variables))
+        if array is None:
+            return None
+        name = argument.get('as', 'this')
+        results = []
+        for item in array:
+            scope = dict(variables or {}, **{name: item})
+            if operator == '$filter':
+                if _truthy(evaluate(argument['cond'], doc, scope)):
+                    results.append(item)
+            else:
+                results.append(_value(evaluate(argument['in'], doc, scope)))
+        return results
+    if operator == '$reduce':
+        value = _value(evaluate(argument['initialValue'], doc, variables))
+        for item in _value(evaluate(argument['input'], doc, variables)) or []:
+            value = _value(evaluate(argument['in'], doc, dict(variables or {}, this=item, value=value)))
+        return value
+    if operator == '$let':
+        scope = dict(variables or {})
+        for name, expr in argument['vars'].items():
+            scope[name] = _value(evaluate(expr, doc, variables))
+        return _value(evaluate(argument['in'], doc, scope))
+    if operator == '$dateToString':
+        date = _value(evaluate(argument['date'], doc, variables))
+        if date is None:
+            return _value(evaluate(argument.get('onNull'), doc, variables))
+        return _date_to_string(argument.get('format', '%Y-%m-%dT%H:%M:%S.%LZ'), date)
+
+
+def _date_trunc(argument, doc, variables):
+    date = _value(evaluate(argument['date'], doc, variables))
+    if date is None:
+        return None
+    unit = argument['unit']
+    if unit == 'year':
+        return date.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    if unit == 'month':
+        return date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    if unit == 'week':
+        start = date - timedelta(days=(date.weekday() + 1) % 7)
+        return start.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == 'day':
+        return date.replace(hour=0, minute=0, second=0, microsecond=0)
+    if unit == 'hour':
+        return date.replace(minute=0, second=0, microsecond=0)
+    if unit == 'minute':
+        return date.replace(second=0, microsecond=0)
+    raise OperationFailure(f"unsupported $dateTrunc unit: {unit}", 2)
+
+
+def _accumulate(operator, values):
+    if operator == '$sum':
+        return sum(v for v in values if _number(v))
+    if operator == '$avg':
+        numbers = [v for v in values if _number(v)]
+        return sum(numbers) / len(numbers) if numbers else None
+    present = [v for v in values if v is not None and v is not _MISSING]
+    if not present:
+        return None
+    chooser = min if operator == '$min' else max
+    return chooser(present, key=_sort_key)
+
+
+# ─── Aggregation stages ────────────────────────────────────────────────────────
+
+def _project_stage(doc, spec):
+    include_id = spec.get('_id', 1)
+    computed = {}
+    includes = []
+    excludes = []
+    for key, value in spec.items():
+        if key == '_id' and value in (0, 1, True, False):
+            continue
+        if value in (0, False):
+            excludes.append(key)
+        elif value in (1, True) and not isinstance(value, dict):
+            includes.append(key)
+        else:
+            computed[key] = value
+
+    if excludes and not includes and not computed:
+        return project(doc, spec)
+
+    result = {}
+    if _truthy(include_id) and '_id' in doc:
+        result['_id'] = doc['_id']
+    for path in includes:
+        _copy_path(doc, result, path.split('.'))
+    for path, expr in computed.items():
+        value = evaluate(expr, doc)
+        if value is not _MISSING:
+            _set_path(result, path, value)
+    return result
+
+
+def _add_fields(doc, spec):
+    result = copy.deepcopy(doc) if any('.' in key for key in spec) else dict(doc)
+    for path, expr in spec.items():
+        value = evaluate(expr, doc)
+        if value is _MISSING:
+            _unset_path(result, path)
+        else:
+            _set_path(result, path, value)
+    return result
+
+
+def _group(docs, spec):
+    groups = {}
+    accumulators = {name: acc for name, acc in spec.items() if name != '_id'}
+    for doc in docs:
+        key = _value(evaluate(spec['_id'], doc))
+        group = groups.setdefault(_hashable(key), {'_id': key, 'values': {name: [] for name in accumulators}})
+        for name, acc in accumulators.items():
+            operator, expr = next(iter(acc.items()))
+            group['values'][name].append(1 if operator == '$count' else evaluate(expr, doc))
+
+    results = []
+    for group in groups.values():
+        result = {'_id': group['_id']}
+        for name, acc in accumulators.items():
+            operator = next(iter(acc))
+            values = group['values'][name]
+            if operator in ('$sum', '$avg', '$min', '$max'):
+                result[name] = _accumulate(operator, values)
+            elif operator == '$count':
+                result[name] = len(values)
+            elif operator == '$first':
+                result[name] = _value(values[0]) if values else None
+            elif operator == '$last':
+                result[name] = _value(values[-1]) if values else None
+            elif operator == '$push':
+                result[name] = [v for v in values if v is not _MISSING]
+            elif operator == '$addToSet':
+                unique = {}
+                for v in values:
+                    if v is not _MISSING:
+                        unique.setdefault(_hashable(v), v)
+                result[name] = list(unique.values())
+            else:
+                raise OperationFailure(f"unknown group operator '{operator}'", 15952)
+        results.append(result)
+    return results
+
+
+def _unwind(docs, spec):
+    if isinstance(spec, str):
+        spec = {'path': spec}
+    path = spec['path'][1:]
+    preserve = spec.get('preserveNullAndEmptyArrays', False)
+    index_field = spec.get('includeArrayIndex')
+    results = []
+    for doc in docs:
+        value = _get(doc, path)
+        if isinstance(value, list) and value:
+            for index, item in enumerate(value):
+                unwound = copy.deepcopy(doc) if '.' in path else dict(doc)
+                _set_path(unwound, path, item)
+                if index_field:
+                    unwound[index_field] = index
+                results.append(unwound)
+        elif isinstance(value, list) or value is _MISSING or value is None:
+            if preserve:
+                unwound = dict(doc)
+                if isinstance(value, list):
+                    _unset_path(unwound, path)
+                if index_field:
+                    unwound[index_field] = None
+                results.append(unwound)
+        else:
+            unwound = dict(doc)
+            if index_field:
+                unwound[index_field] = None
+            results.append(unwound)
+    return results
+
+
+# ─── Cursors ───────────────────────────────────────────────────────────────────
+
+class MemoryCursor:
+    """Lazy find() cursor supporting sort/skip/limit chaining"""
+
+    def __init__(self, collection, filter=None, projection=None, sort=None, skip=0, limit=0):
+        self.collection = collection
+        self._filter = filter or {}
+        self._projection = projection
+        self._sort = _sort_spec(sort) if sort else None
+        self._skip = skip or 0
+        self._limit = limit or 0
+        self._results = None
+
+    def _check_unstarted(self):
+        if self._results is not None:
+            raise OperationFailure('cannot set options after executing query')
+
+    def sort(self, key_or_list, direction=None):
+        self._check_unstarted()
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, skip):
+        self._check_unstarted()
+        self._skip = skip
+        return self
+
+    def limit(self, limit):
+        self._check_unstarted()
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size):
+        return self
+
+    def hint(self, index):
+        return self
+
+    def max_time_ms(self, max_time_ms):
+        return self
+
+    def allow_disk_use(self, allow_disk_use):
+        return self
+
+    def _execute(self):
+        if self._results is None:
+            docs = self.collection._select(self._filter, self._sort, self._skip, self._limit)
+            self._results = iter([project(doc, self._projection) for doc in docs])
+        return self._results
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._execute())
+
+    next = __next__
+
+    def close(self):
+        self._results = iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryCommandCursor:
+    """Iterator over precomputed aggregate() results"""
+
+    def __init__(self, documents):
+        self._documents = iter(documents)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self._documents)
+
+    next = __next__
+
+    def close(self):
+        self._documents = iter(())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ─── Collections and databases ─────────────────────────────────────────────────
+
+def _index_name(keys):
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+
+class MemoryCollection:
+    """In-memory collection; documents are stored by _id in insertion order"""
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self.full_name = f"{database.name}.{name}"
+        self._documents = {}
+        self._indexes = {'_id_': {'key': [('_id', 1)], 'unique': True}}
+        self._unique_entries = {}
+
+    @property
+    def _lock(self):
+        return self.database._lock
+
+    def with_options(self, **kwargs):
+        return self
+
+    # Reads
+
+    def _matching(self, filter):
+        filter = filter or {}
+        _id = filter.get('_id')
+        if _id is not None and not isinstance(_id, (dict, list, re.Pattern)):
+            doc = self._documents.get(_id)
+            candidates = [doc] if doc is not None else []
+        else:
+            candidates = self._documents.values()
+        return [doc for doc in candidates if matches(doc, filter)]
+
+    def _select(self, filter, sort=None, skip=0, limit=0):
+        with self._lock:
+            docs = self._matching(filter)
+            if sort:
+                docs = _sort_documents(docs, sort)
+            if skip:
+                docs = docs[skip:]
+            if limit:
+                docs = docs[:abs(limit)]
+            return docs
+
+    def find(self, filter=None, projection=None, sort=None, skip=0, limit=0, **kwargs):
+        return MemoryCursor(self, filter, projection, sort, skip, limit)
+
+    def find_one(self, filter=None, *args, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        kwargs['limit'] = 1
+        return next(self.find(filter, *args, **kwargs), None)
+
+    def count_documents(self, filter, skip=0, limit=0, **kwargs):
+        with self._lock:
+            if not filter:
+                count = len(self._documents)
+            else:
+                count = len(self._matching(filter))
+        count = max(0, count - skip)
+        return min(count, limit) if limit else count
+
+    def estimated_document_count(self, **kwargs):
+        return len(self._documents)
+
+    def distinct(self, key, filter=None, **kwargs):
+        values = {}
+        with self._lock:
+            for doc in self._matching(filter):
+                for value in _candidates(_lookup(doc, key)):
+                    if not isinstance(value, list):
+                        values.setdefault(_hashable(value), value)
+        return [copy.deepcopy(v) for v in values.values()]
+
+    # Indexes
+
+    def create_index(self, keys, unique=False, name=None, partialFilterExpression=None, sparse=False, **kwargs):
+        keys = _sort_spec(keys, 1)
+        name = name or _index_name(keys)
+        with self._lock:
+            self.database._created.add(self.name)
+            spec = {'key': keys, 'unique': unique}
+            if partialFilterExpression:
+                spec['partialFilterExpression'] = partialFilterExpression
+            if sparse:
+                spec['sparse'] = True
+            spec.update(kwargs)
+            if unique:
+                entries = {}
+                for doc in self._documents.values():
+                    key = self._unique_key(spec, doc)
+                    if key is None:
+                        continue
+                    if key in entries:
+                        raise DuplicateKeyError(self._duplicate_message(name, spec, doc), 11000)
+                    entries[key] = doc['_id']
+                self._unique_entries[name] = entries
+            self._indexes[name] = spec
+        return name
+
+    def create_indexes(self, indexes, **kwargs):
+        names = []
+        for index in indexes:
+            document = dict(index.document)
+            keys = list(document.pop('key').items())
+            names.append(self.create_index(keys, **document))
+        return names
+
+    def drop_index(self, index_or_name):
+        name = index_or_name if isinstance(index_or_name, str) else _index_name(_sort_spec(index_or_name))
+        with self._lock:
+            if name not in self._indexes or name == '_id_':
+                raise OperationFailure(f"index not found with name [{name}]", 27)
+            del self._indexes[name]
+            self._unique_entries.pop(name, None)
+
+    def drop_indexes(self):
+        with self._lock:
+            self._indexes = {'_id_': self._indexes['_id_']}
+            self._unique_entries = {}
+
+    def index_information(self):
+        with self._lock:
+            return copy.deepcopy(self._indexes)
+
+    def list_indexes(self):
+        return iter([dict(spec, name=name, v=2) for name, spec in self.index_information().items()])
+
+    def _unique_key(self, spec, doc):
+        if spec.get('partialFilterExpression') and not matches(doc, spec['partialFilterExpression']):
+            return None
+        values = [_get(doc, field) for field, _ in spec['key']]
+        if spec.get('sparse') and all(value is _MISSING for value in values):
+            return None
+        return tuple(_hashable(_value(value)) for value in values)
+
+    def _duplicate_message(self, name, spec, doc):
+        dup_key = {field: _value(_get(doc, field)) for field, _ in spec['key']}
+        return f"E11000 duplicate key error collection: {self.full_name} index: {name} dup key: {dup_key}"
+
+    def _check_unique(self, doc, replacing_id=_MISSING):
+        if '_id' in doc and doc['_id'] in self._documents and not _equals(doc['_id'], replacing_id):
+            raise DuplicateKeyError(self._duplicate_message('_id_', self._indexes['_id_'], doc), 11000)
+        for name, entries in self._unique_entries.items():
+            key = self._unique_key(self._indexes[name], doc)
+            if key is None:
+                continue
+            owner = entries.get(key, _MISSING)
+            if owner is not _MISSING and not _equals(owner, replacing_id):
+                raise DuplicateKeyError(self._duplicate_message(name, self._indexes[name], doc), 11000)
+
+    def _index_add(self, doc):
+        for name, entries in self._unique_entries.items():
+            key = self._unique_key(self._indexes[name], doc)
+            if key is not None:
+                entries[key] = doc['_id']
+
+    def _index_remove(self, doc):
+        for name, entries in self._unique_entries.items():
+            key = self._unique_key(self._indexes[name], doc)
+            if key is not None and _equals(entries.get(key, _MISSING), doc['_id']):
+                del entries[key]
+
+    # Writes (callers hold the lock)
+
+    def _insert(self, document):
+        if '_id' not in document:
+            document['_id'] = ObjectId()
+        doc = copy.deepcopy(document)
+        self._check_unique(doc)
+        self._documents[doc['_id']] = doc
+        self._index_add(doc)
+        self.database._created.add(self.name)
+        return doc['_id']
+
+    def _store(self, old, new):
+        if not _equals(old['_id'], new.get('_id', old['_id'])):
+            raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'", 66)
+        new['_id'] = old['_id']
+        self._check_unique(new, replacing_id=old['_id'])
+        self._index_remove(old)
+        self._documents[old['_id']] = new
+        self._index_add(new)
+
+    def _update(self, filter, update, upsert=False, multi=False, replace=False, sort=None):
+        """Returns (matched, modified, upserted_id, before, after)"""
+        docs = self._matching(filter)
+        if sort:
+            docs = _sort_documents(docs, _sort_spec(sort))
+        if not multi:
+            docs = docs[:1]
+
+        if not docs:
+            if not upsert:
+                return 0, 0, None, None, None
+            if replace:
+                new = copy.deepcopy(update)
+                if '_id' in _upsert_seed(filter):
+                    new.setdefault('_id', _upsert_seed(filter)['_id'])
+            else:
+                new = _upsert_seed(filter)
+                apply_update(new, update, is_insert=True)
+            _id = self._insert(new)
+            return 0, 0, _id, None, self._documents[_id]
+
+        modified = 0
+        before = after = None
+        for doc in docs:
+            if replace:
+                if any(key.startswith('$') for key in update):
+                    raise OperationFailure('replacement document must not contain atomic operators', 9)
+                new = copy.deepcopy(update)
+            else:
+                new = copy.deepcopy(doc)
+                apply_update(new, update)
+            if new != doc:
+                self._store(doc, new)
+                modified += 1
+            if before is None:
+                before, after = doc, self._documents[doc['_id']]
+        return len(docs), modified, None, before, after
+
+    def _delete(self, filter, multi=False, sort=None):
+        docs = self._matching(filter)
+        if sort:
+            docs = _sort_documents(docs, _sort_spec(sort))
+        if not multi:
+            docs = docs[:1]
+        for doc in docs:
+            self._index_remove(doc)
+            del self._documents[doc['_id']]
+        return docs
+
+    def insert_one(self, document, **kwargs):
+        with self._lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents, ordered=True, **kwargs):
+        inserted = []
+        errors = []
+        with self._lock:
+            for index, document in enumerate(documents):
+                try:
+                    inserted.append(self._insert(document))
+                except DuplicateKeyError as e:
+                    errors.append({'index': index, 'code': 11000, 'errmsg': str(e), 'op': document})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'writeConcernErrors': [], 'nInserted': len(inserted),
+                                  'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []})
+        return InsertManyResult(inserted, True)
+
+    def _update_result(self, matched, modified, upserted_id):
+        raw = {'n': matched if upserted_id is None else 1, 'nModified': modified, 'ok': 1.0,
+               'updatedExisting': matched > 0}
+        if upserted_id is not None:
+            raw['upserted'] = upserted_id
+        return UpdateResult(raw, True)
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        with self._lock:
+            matched, modified, upserted_id, _, _ = self._update(filter, update, upsert=upsert, sort=kwargs.get('sort'))
+        return self._update_result(matched, modified, upserted_id)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        with self._lock:
+            matched, modified, upserted_id, _, _ = self._update(filter, update, upsert=upsert, multi=True)
+        return self._update_result(matched, modified, upserted_id)
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        with self._lock:
+            matched, modified, upserted_id, _, _ = self._update(filter, replacement, upsert=upsert, replace=True)
+        return self._update_result(matched, modified, upserted_id)
+
+    def delete_one(self, filter, **kwargs):
+        with self._lock:
+            return DeleteResult({'n': len(self._delete(filter)), 'ok': 1.0}, True)
+
+    def delete_many(self, filter, **kwargs):
+        with self._lock:
+            return DeleteResult({'n': len(self._delete(filter, multi=True)), 'ok': 1.0}, True)
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, **kwargs):
+        with self._lock:
+            _, _, _, before, after = self._update(filter, update, upsert=upsert, sort=sort)
+            result = after if return_document == ReturnDocument.AFTER else before
+            return project(result, projection) if result is not None else None
+
+    def find_one_and_replace(self, filter, replacement, projection=None, sort=None, upsert=False,
+                             return_document=ReturnDocument.BEFORE, **kwargs):
+        with self._lock:
+            _, _, _, before, after = self._update(filter, replacement, upsert=upsert, replace=True, sort=sort)
+            result = after if return_document == ReturnDocument.AFTER else before
+            return project(result, projection) if result is not None else None
+
+    def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs):
+        with self._lock:
+            deleted = self._delete(filter, sort=sort)
+            return project(deleted[0], projection) if deleted else None
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        result = {'writeErrors': [], 'writeConcernErrors': [], 'nInserted': 0, 'nUpserted': 0,
+                  'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []}
+        with self._lock:
+            for index, op in enumerate(requests):
+                try:
+                    if isinstance(op, InsertOne):
+                        self._insert(op._doc)
+                        result['nInserted'] += 1
+                    elif isinstance(op, (UpdateOne, UpdateMany, ReplaceOne)):
+                        matched, modified, upserted_id, _, _ = self._update(
+                            op._filter, op._doc, upsert=bool(op._upsert),
+                            multi=isinstance(op, UpdateMany), replace=isinstance(op, ReplaceOne)
+                        )
+                        result['nMatched'] += matched
+                        result['nModified'] += modified
+                        if upserted_id is not None:
+                            result['nUpserted'] += 1
+                            result['upserted'].append({'index': index, '_id': upserted_id})
+                    elif isinstance(op, (DeleteOne, DeleteMany)):
+                        result['nRemoved'] += len(self._delete(op._filter, multi=isinstance(op, DeleteMany)))
+                    else:
+                        raise TypeError(f"{op!r} is not a valid request")
+                except (DuplicateKeyError, OperationFailure) as e:
+                    result['writeErrors'].append({'index': index, 'code': e.code, 'errmsg': str(e)})
+                    if ordered:
+                        break
+        if result['writeErrors']:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    def drop(self):
+        self.database.drop_collection(self.name)
+
+    # Aggregation
+
+    def aggregate(self, pipeline, **kwargs):
+        with self._lock:
+            docs = self._run_pipeline(list(self._documents.values()), pipeline)
+            return MemoryCommandCursor([copy.deepcopy(doc) for doc in docs])
+
+    def _run_pipeline(self, docs, pipeline):
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == '$match':
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif name == '$project':
+                docs = [_project_stage(doc, spec) for doc in docs]
+            elif name in ('$addFields', '$set'):
+                docs = [_add_fields(doc, spec) for doc in docs]
+            elif name == '$unset':
+                docs = [project(doc, {field: 0 for field in ([spec] if isinstance(spec, str) else spec)})
+                        for doc in docs]
+            elif name == '$group':
+                docs = _group(docs, spec)
+            elif name == '$sort':
+                docs = _sort_documents(docs, _sort_spec(spec))
+            elif name == '$skip':
+                docs = docs[spec:]
+            elif name == '$limit':
+                docs = docs[:spec]
+            elif name == '$count':
+                docs = [{spec: len(docs)}] if docs else []
+            elif name == '$sortByCount':
+                docs = _sort_documents(_group(docs, {'_id': spec, 'count': {'$sum': 1}}), [('count', -1)])
+            elif name == '$unwind':
+                docs = _unwind(docs, spec)
+            elif name == '$lookup':
+                docs = self._lookup_stage(docs, spec)
+            elif name == '$facet':
+                docs = [{key: self._run_pipeline(list(docs), sub) for key, sub in spec.items()}]
+            elif name in ('$replaceRoot', '$replaceWith'):
+                expr = spec['newRoot'] if name == '$replaceRoot' else spec
+                docs = [evaluate(expr, doc) for doc in docs]
+            else:
+                raise OperationFailure(f"Unrecognized pipeline stage name: '{name}'", 40324)
+        return docs
+
+    def _lookup_stage(self, docs, spec):
+        foreign = self.database.get_collection(spec['from'])
+        if 'localField' not in spec:
+            sub_pipeline = spec.get('pipeline', [])
+            results = []
+            for doc in docs:
+                variables = {name: _value(evaluate(expr, doc)) for name, expr in spec.get('let', {}).items()}
+                joined = [d for d in foreign._documents.values()]
+                joined = foreign._run_pipeline(joined, _bind_variables(sub_pipeline, variables))
+                results.append(dict(doc, **{spec['as']: joined}))
+            return results
+
+        by_key = {}
+        for foreign_doc in foreign._documents.values():
+            for value in _candidates(_lookup(foreign_doc, spec['foreignField'])) or [None]:
+                by_key.setdefault(_hashable(value), []).append(foreign_doc)
+
+        results = []
+        for doc in docs:
+            joined = {}
+            for value in _candidates(_lookup(doc, spec['localField'])) or [None]:
+                for foreign_doc in by_key.get(_hashable(value), []):
+                    joined.setdefault(id(foreign_doc), foreign_doc)
+            matched = list(joined.values())
+            if spec.get('pipeline'):
+                matched = foreign._run_pipeline(matched, spec['pipeline'])
+            results.append(dict(doc, **{spec['as']: matched}))
+        return results
+
+
+def _bind_variables(pipeline, variables):
+    """Substitute $$name references in a $lookup sub-pipeline with their values"""
+    def bind(value):
+        if isinstance(value, str) and value.startswith('$$'):
+            name, _, rest = value[2:].partition('.')
+            if name in variables:
+                bound = variables[name]
+                return {'$literal': _value(_resolve(bound, rest.split('.'))) if rest else bound}
+        if isinstance(value, dict):
+            return {k: bind(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [bind(v) for v in value]
+        return value
+    return bind(pipeline)
+
+
+class MemoryDatabase:
+    """In-memory stand-in for a pymongo Database (``db.users``, ``db['users']``)"""
+
+    def __init__(self, name='grievai'):
+        self.name = name
+        self._lock = threading.RLock()
+        self._collections = {}
+        self._created = set()
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+    def __getitem__(self, name):
+        return self.get_collection(name)
+
+    def get_collection(self, name, **kwargs):
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = MemoryCollection(self, name)
+            return collection
+
+    def create_collection(self, name, **kwargs):
+        with self._lock:
+            self._created.add(name)
+            return self.get_collection(name)
+
+    def drop_collection(self, name):
+        if not isinstance(name, str):
+            name = name.name
+        with self._lock:
+            self._collections.pop(name, None)
+            self._created.discard(name)
+
+    def list_collection_names(self, **kwargs):
+        with self._lock:
+            return sorted(name for name in self._created if name in self._collections)
+
+    def command(self, command, *args, **kwargs):
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == 'ping':
+            return {'ok': 1.0}
+        if name == 'dbStats':
+            with self._lock:
+                return {'db': self.name, 'collections': len(self.list_collection_names()),
+                        'objects': sum(len(c._documents) for c in self._collections.values()), 'ok': 1.0}
+        raise OperationFailure(f"no such command: '{name}'", 59)
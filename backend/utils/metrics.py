@@ -0,0 +1,96 @@
+import os
+import time
+from flask import g, request
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+    CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+
+# When PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py) every worker
+# process writes its samples to that directory and /api/metrics merges them,
+# so a scrape sees totals for the whole server rather than one worker.
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by endpoint, method and status code',
+    ['endpoint', 'method', 'status']
+)
+
+REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'Requests currently being handled',
+    multiprocess_mode='livesum'
+)
+
+GEMINI_LATENCY = Histogram(
+    'gemini_request_duration_seconds',
+    'Latency of Gemini generate_content calls',
+    ['operation'],
+    buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+)
+
+NOTIFICATION_LATENCY = Histogram(
+    'notification_send_duration_seconds',
+    'Latency of outbound notification sends',
+    ['channel']
+)
+
+NOTIFICATION_FAILURES = Counter(
+    'notification_send_failures_total',
+    'Outbound notification sends that raised',
+    ['channel']
+)
+
+ESCALATION_JOB_LAST_DURATION = Gauge(
+    'escalation_job_last_duration_seconds',
+    'Duration of the most recent scheduled escalation check',
+    multiprocess_mode='mostrecent'
+)
+
+ESCALATION_JOB_LAST_RUN = Gauge(
+    'escalation_job_last_run_timestamp_seconds',
+    'Unix time the most recent scheduled escalation check finished',
+    multiprocess_mode='mostrecent'
+)
+
+ESCALATION_PHASE_DURATION = Gauge(
+    'escalation_sweep_phase_duration_seconds',
+    'Duration of each phase of the most recent escalation sweep',
+    ['phase'],
+    multiprocess_mode='mostrecent'
+)
+
+
+def render_metrics():
+    """Return the metrics exposition body and content type"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_request_metrics(app):
+    """Register request hooks that feed the latency histogram and in-flight gauge"""
+
+    @app.before_request
+    def _start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _observe_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is not None:
+            REQUEST_LATENCY.labels(
+                endpoint=request.endpoint or 'unmatched',
+                method=request.method,
+                status=str(response.status_code)
+            ).observe(time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def _end_request_metrics(error=None):
+        if g.pop('metrics_started', None) is not None:
+            REQUESTS_IN_FLIGHT.dec()
@@ -1,8 +1,16 @@
 from flask import current_app
 from flask_mail import Message
-from twilio.base.exceptions import TwilioRestException
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from utils.metrics import NOTIFICATION_LATENCY, NOTIFICATION_FAILURES
+
+# Background pool for emails that don't need to be sent before the caller
+# returns (e.g. escalation digests); threads start on first use
+_email_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('NOTIFICATION_WORKERS', 2)),
+    thread_name_prefix='notification'
+)
 
 def send_email(recipient_email, subject, body, html=None):
     """
@@ -27,7 +35,12 @@ def send_email(recipient_email, subject, body, html=None):
         
         mail = current_app.extensions.get('mail')
         if mail:
-            mail.send(msg)
+            try:
+                with NOTIFICATION_LATENCY.labels(channel='smtp').time():
+                    mail.send(msg)
+            except Exception:
+                NOTIFICATION_FAILURES.labels(channel='smtp').inc()
+                raise
             return True
         else:
             print("Mail extension not initialized")
@@ -36,6 +49,45 @@ def send_email(recipient_email, subject, body, html=None):
         print(f"Error sending email: {str(e)}")
         return False
 
+def queue_email(recipient_email, subject, body, html=None):
+    """
+    Send an email on the background notification pool
+    
+    Returns:
+        Future: resolves to send_email's result
+    """
+    app = current_app._get_current_object()
+    
+    def _send():
+        with app.app_context():
+            return send_email(recipient_email, subject, body, html)
+    
+    return _email_executor.submit(_send)
+
+def get_twilio_client():
+    """
+    Return the app's Twilio client, creating it on first use.
+
+    twilio.rest is slow to import, so it is only loaded once a WhatsApp
+    message is actually sent. Returns None if Twilio is not configured.
+    """
+    if 'twilio_client' in current_app.extensions:
+        return current_app.extensions['twilio_client']
+    
+    twilio_client = None
+    account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+    auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+    if account_sid and auth_token:
+        try:
+            from twilio.rest import Client
+            twilio_client = Client(account_sid, auth_token)
+            print('Successfully initialized Twilio client')
+        except Exception as e:
+            print(f'Failed to initialize Twilio client: {str(e)}')
+    
+    current_app.extensions['twilio_client'] = twilio_client
+    return twilio_client
+
 def send_whatsapp(to_number, message):
     """
     Send a WhatsApp message using Twilio
@@ -49,7 +101,7 @@ def send_whatsapp(to_number, message):
     """
     try:
         # Get Twilio client from app context
-        twilio_client = current_app.config.get('twilio_client')
+        twilio_client = get_twilio_client()
         from_whatsapp_number = os.getenv('TWILIO_WHATSAPP_NUMBER')
         
         if not twilio_client or not from_whatsapp_number:
@@ -61,18 +113,27 @@ def send_whatsapp(to_number, message):
         to_whatsapp = f"whatsapp:{to_number}"
         
         # Send message
-        twilio_client.messages.create(
-            body=message,
-            from_=from_whatsapp,
-            to=to_whatsapp
-        )
+        try:
+            with NOTIFICATION_LATENCY.labels(channel='twilio').time():
+                twilio_client.messages.create(
+                    body=message,
+                    from_=from_whatsapp,
+                    to=to_whatsapp
+                )
+        except Exception:
+            NOTIFICATION_FAILURES.labels(channel='twilio').inc()
+            raise
         
         return True
-    except TwilioRestException as e:
-        print(f"Twilio error: {str(e)}")
-        return False
     except Exception as e:
-        print(f"Error sending WhatsApp message: {str(e)}")
+        try:
+            from twilio.base.exceptions import TwilioRestException
+        except ImportError:
+            TwilioRestException = ()
+        if isinstance(e, TwilioRestException):
+            print(f"Twilio error: {str(e)}")
+        else:
+            print(f"Error sending WhatsApp message: {str(e)}")
         return False
 
 def send_ticket_creation_notification(user_email, user_name, ticket_id, subject, category, priority):
@@ -390,6 +451,52 @@ Support Team
     
     return send_email(user_email, email_subject, email_body, html_body)
 
+def queue_escalation_digest(user_email, user_name, complaints):
+    """
+    Queue one email telling a user that several of their tickets were escalated
+    
+    Args:
+        user_email (str): The user's email address
+        user_name (str): The user's name
+        complaints (list): Escalated complaints (_id, subject, priority)
+    
+    Returns:
+        Future: resolves to send_email's result
+    """
+    tickets = [(str(c['_id'])[-6:].upper(), c.get('subject', 'No subject'), c.get('priority', 'medium')) for c in complaints]
+    count = len(tickets)
+    email_subject = "Your complaint has been escalated" if count == 1 else f"{count} of your complaints have been escalated"
+    
+    ticket_lines = "\n".join(f"- #{number}: {subject} ({priority} priority)" for number, subject, priority in tickets)
+    email_body = f"""
+Dear {user_name},
+
+The following {'ticket has' if count == 1 else 'tickets have'} been escalated due to exceeding the resolution time threshold:
+
+{ticket_lines}
+
+Our senior support team will review {'it' if count == 1 else 'them'} as a priority.
+
+Best regards,
+Support Team
+    """
+    
+    ticket_items = "".join(f"<li><strong>#{number}</strong> {subject} ({priority} priority)</li>" for number, subject, priority in tickets)
+    html_body = f"""
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto;">
+        <h2 style="color: #dc2626;">{'Ticket' if count == 1 else 'Tickets'} Escalated</h2>
+        <p>Dear {user_name},</p>
+        <p>The following {'ticket has' if count == 1 else 'tickets have'} been escalated due to exceeding the resolution time threshold:</p>
+        <div style="background-color: #fef2f2; padding: 20px; border-radius: 8px; margin: 20px 0; border-left: 4px solid #dc2626;">
+            <ul style="padding-left: 20px;">{ticket_items}</ul>
+        </div>
+        <p>Our senior support team will review {'it' if count == 1 else 'them'} as a priority.</p>
+        <p><strong>Best regards,<br>Support Team</strong></p>
+    </div>
+    """
+    
+    return queue_email(user_email, email_subject, email_body, html_body)
+
 def send_thank_you_notifications(user_email, user_phone=None):
     """
     Send thank you notifications to the user via email and WhatsApp (if available)
@@ -0,0 +1,126 @@
+import json
+import base64
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Keyset (seek) pagination over (createdAt, _id), newest first by default
+# (order=asc pages oldest first).
+#
+# A page is fetched with sort [('createdAt', -1), ('_id', -1)] (or both
+# ascending) and the position of its last document is handed back as an
+# opaque cursor. The next
+# page starts strictly after that position, so each page costs one index
+# range scan no matter how deep the client pages, unlike skip/limit, and
+# documents inserted meanwhile don't shift later pages.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+KEYSET_SORT = [('createdAt', -1), ('_id', -1)]
+
+ORDERS = {'desc': -1, 'asc': 1}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(doc):
+    """Opaque token for the position just after ``doc``"""
+    created_at = doc.get('createdAt')
+    payload = {
+        'c': created_at.isoformat() if isinstance(created_at, datetime) else None,
+        'i': str(doc['_id'])
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return (createdAt, _id) from a cursor token, raising InvalidCursor"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(payload['c']) if payload.get('c') else None
+        return created_at, ObjectId(payload['i'])
+    except (ValueError, TypeError, KeyError, InvalidId) as e:
+        raise InvalidCursor('Invalid cursor') from e
+
+
+def keyset_sort(order=-1):
+    """The (createdAt, _id) sort for ``order`` (-1 newest first, 1 oldest first)"""
+    return KEYSET_SORT if order == -1 else [('createdAt', 1), ('_id', 1)]
+
+
+def parse_order(value):
+    """Sort order from a query-string value: 'desc' (default) -> -1, 'asc' -> 1"""
+    if value in (None, ''):
+        return -1
+    if value not in ORDERS:
+        raise ValueError('order must be "asc" or "desc"')
+    return ORDERS[value]
+
+
+def keyset_filter(token, order=-1):
+    """Query condition selecting documents that sort after the cursor position"""
+    created_at, last_id = decode_cursor(token)
+    if order == 1:
+        # Documents without createdAt sort first, by _id, then the dated ones
+        if created_at is None:
+            return {'$or': [{'createdAt': None, '_id': {'$gt': last_id}}, {'createdAt': {'$ne': None}}]}
+        return {'$or': [
+            {'createdAt': {'$gt': created_at}},
+            {'createdAt': created_at, '_id': {'$gt': last_id}}
+        ]}
+    if created_at is None:
+        # Documents without createdAt sort last; page through them by _id alone
+        return {'createdAt': None, '_id': {'$lt': last_id}}
+    return {'$or': [
+        {'createdAt': {'$lt': created_at}},
+        {'createdAt': created_at, '_id': {'$lt': last_id}},
+        {'createdAt': None}
+    ]}
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Page size from a query-string value, clamped to 1..maximum"""
+    if value in (None, ''):
+        return default
+    try:
+        return max(1, min(int(value), maximum))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+
+
+def paginate(collection, query, limit, cursor=None, projection=None, order=-1):
+    """
+    Fetch one page of ``collection`` matching ``query`` in ``order``
+    (see keyset_sort); the cursor must come from a page in the same order.
+
+    Returns (documents, next_cursor); next_cursor is None on the last page.
+    One extra document is read to tell whether another page exists.
+    """
+    if cursor:
+        after = keyset_filter(cursor, order)
+        query = {'$and': [query, after]} if query else after
+    if projection and 'createdAt' not in projection and any(
+        value not in (0, False) for key, value in projection.items() if key != '_id'
+    ):
+        # The cursor is built from createdAt, so inclusion projections must keep it
+        projection = dict(projection, createdAt=1)
+    docs = list(collection.find(query, projection).sort(keyset_sort(order)).limit(limit + 1))
+    return split_page(docs, limit)
+
+
+def keyset_stages(limit, cursor=None):
+    """Aggregation stages selecting one page, for use inside a larger pipeline"""
+    stages = [{'$match': keyset_filter(cursor)}] if cursor else []
+    return stages + [{'$sort': dict(KEYSET_SORT)}, {'$limit': limit + 1}]
+
+
+def split_page(docs, limit):
+    """(documents, next_cursor) from up to limit + 1 documents in keyset order"""
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1])
+    return docs, None
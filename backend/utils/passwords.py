@@ -0,0 +1,98 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from passlib.hash import pbkdf2_sha256
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing executor's queue is full"""
+
+
+class PasswordHasher:
+    """
+    Runs pbkdf2 hashing and verification on a bounded executor.
+
+    At most ``max_workers`` hashes run at once and at most ``max_queue`` more
+    may wait. Beyond that, calls fail fast with PasswordHasherBusy so the
+    route can answer 503 instead of pinning every request thread on CPU work.
+    """
+
+    def __init__(self, rounds=29000, max_workers=2, max_queue=16):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.policy = pbkdf2_sha256.using(rounds=rounds)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._rejected_lock = threading.Lock()
+        self.rejected = 0
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._rejected_lock:
+                self.rejected += 1
+            raise PasswordHasherBusy('Password hashing queue is full')
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        """Hash a password with the current rounds policy"""
+        return self._run(self.policy.hash, password)
+
+    def verify(self, password, stored_hash):
+        """
+        Check a password against a stored hash.
+
+        Supports pbkdf2_sha256 (the app's scheme) and bcrypt (used by
+        add_worker.py). Returns False for malformed or unknown hashes.
+        """
+        return self._run(_verify, password, stored_hash)
+
+    def needs_update(self, stored_hash):
+        """True if the stored hash is not pbkdf2 at the configured rounds"""
+        try:
+            return self.policy.needs_update(stored_hash)
+        except (ValueError, TypeError):
+            return True
+
+    def stats(self):
+        return {
+            'rounds': self.rounds,
+            'maxWorkers': self.max_workers,
+            'maxQueue': self.max_queue,
+            'rejected': self.rejected
+        }
+
+
+def _verify(password, stored_hash):
+    try:
+        # Try pbkdf2_sha256 first (the main app's hashing method)
+        if pbkdf2_sha256.verify(password, stored_hash):
+            return True
+    except (ValueError, TypeError):
+        pass
+
+    # Try bcrypt (used by add_worker.py script)
+    try:
+        import bcrypt
+        return bcrypt.checkpw(
+            password.encode('utf-8'),
+            stored_hash.encode('utf-8') if isinstance(stored_hash, str) else stored_hash
+        )
+    except Exception:
+        return False
+
+
+password_hasher = PasswordHasher(
+    rounds=int(os.getenv('PASSWORD_HASH_ROUNDS', 29000)),
+    # Per process; every gunicorn worker has its own executor
+    max_workers=int(os.getenv('PASSWORD_HASH_WORKERS', 2)),
+    max_queue=int(os.getenv('PASSWORD_HASH_QUEUE', 16))
+)
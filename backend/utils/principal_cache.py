@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+class PrincipalCache:
+    """
+    Bounded TTL + LRU cache of resolved principals keyed by token subject.
+
+    The auth decorators resolve the user behind a JWT on every request. Caching
+    the handful of fields they need (id, name, email, role flags) saves a
+    MongoDB round-trip per request. Entries expire after ``ttl`` seconds so a
+    change made by another worker process is picked up within that window;
+    changes made in this process call ``invalidate`` directly.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id):
+        """Return the cached principal for ``user_id`` or None"""
+        if self.max_size <= 0:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, principal = entry
+            if expires_at <= now:
+                del self._entries[user_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return dict(principal)
+
+    def set(self, user_id, principal):
+        """Store a principal, evicting the least recently used entry if full"""
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, dict(principal))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        """Drop the cached principal for ``user_id`` if present"""
+        with self._lock:
+            self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and current size for tuning"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxSize': self.max_size,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRatio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Shared cache used by utils.auth_middleware
+principal_cache = PrincipalCache(
+    max_size=int(os.getenv('PRINCIPAL_CACHE_SIZE', 1024)),
+    ttl=float(os.getenv('PRINCIPAL_CACHE_TTL', 60))
+)
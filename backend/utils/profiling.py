@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import random
+import cProfile
+import threading
+from collections import Counter
+from datetime import datetime
+from flask import g, request
+
+# cProfile hooks the interpreter's profiling events, and since Python 3.12
+# only one Profile may be enabled at a time; sampled requests take this lock
+# without waiting, and one that can't get it is stack-sampled instead
+_cprofile_lock = threading.Lock()
+
+
+class StackSampler:
+    """
+    Statistical stack sampler for in-flight requests.
+
+    A single daemon thread wakes every ``interval`` seconds and records the
+    current stack of each registered request thread as a collapsed
+    ``file:function;...`` string. The cost is one ``sys._current_frames()``
+    call per tick while requests are in flight and nothing when idle. Each
+    request's samples are thrown away unless it turns out to be slow.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._stacks = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def register(self, thread_id):
+        with self._lock:
+            self._stacks[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def unregister(self, thread_id):
+        with self._lock:
+            return self._stacks.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                thread_ids = list(self._stacks)
+            if not thread_ids:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            frames = sys._current_frames()
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = _collapse(frame)
+                with self._lock:
+                    counter = self._stacks.get(thread_id)
+                    if counter is not None:
+                        counter[stack] += 1
+            time.sleep(self.interval)
+
+
+def _collapse(frame):
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+class RequestProfiler:
+    """
+    Captures profiles of the slow tail and a random sample of requests.
+
+    - Requests slower than ``slow_ms`` are captured by the stack sampler and
+      written as collapsed stacks (``.folded``, flamegraph.pl compatible).
+    - One in ``sample_rate`` requests is run under cProfile and written as a
+      ``.prof`` file (open with pstats or snakeviz). Only one request is
+      under cProfile at a time; a sampled request that finds it busy falls
+      back to the stack sampler.
+
+    Each profile gets a ``.json`` sidecar with the route, status, duration and
+    the request's MongoDB command counts. Only the newest ``max_files``
+    profiles are kept in ``directory``.
+    """
+
+    def __init__(self, directory, slow_ms=0, sample_rate=0, max_files=200, interval_ms=10):
+        self.directory = directory
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self.max_files = max_files
+        self.sampler = StackSampler(interval=interval_ms / 1000) if slow_ms > 0 else None
+        self._write_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.slow_ms > 0 or self.sample_rate > 0
+
+    def start(self):
+        g.profile_started = time.perf_counter()
+        if self.sample_rate > 0 and random.randrange(self.sample_rate) == 0 and _start_cprofile():
+            return
+        if self.sampler:
+            self.sampler.register(threading.get_ident())
+
+    def finish(self, response):
+        started = g.pop('profile_started', None)
+        if started is None:
+            return
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            _stop_cprofile(profiler)
+            self._write('sampled', duration_ms, response, lambda path: profiler.dump_stats(path), '.prof')
+            return
+
+        stacks = self.sampler.unregister(threading.get_ident()) if self.sampler else None
+        if stacks and duration_ms >= self.slow_ms:
+            def write_folded(path):
+                with open(path, 'w') as f:
+                    for stack, count in stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+            self._write('slow', duration_ms, response, write_folded, '.folded')
+
+    def abort(self):
+        """Release profiling state for a request that never produced a response"""
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            _stop_cprofile(profiler)
+        if g.pop('profile_started', None) is not None and self.sampler:
+            self.sampler.unregister(threading.get_ident())
+
+    def _write(self, kind, duration_ms, response, write_data, extension):
+        endpoint = request.endpoint or 'unmatched'
+        name = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{kind}-{endpoint}-{int(duration_ms)}ms"
+        metadata = {
+            'kind': kind,
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'db': g.get('db_stats'),
+            'timestamp': datetime.utcnow().isoformat()
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write_data(os.path.join(self.directory, name + extension))
+            with open(os.path.join(self.directory, name + '.json'), 'w') as f:
+                json.dump(metadata, f, indent=2)
+            self._rotate()
+        except Exception as e:
+            print(f"Error writing request profile: {str(e)}")
+
+    def _rotate(self):
+        with self._write_lock:
+            profiles = sorted(f[:-5] for f in os.listdir(self.directory) if f.endswith('.json'))
+            for name in profiles[:max(0, len(profiles) - self.max_files)]:
+                for extension in ('.json', '.prof', '.folded'):
+                    try:
+                        os.remove(os.path.join(self.directory, name + extension))
+                    except FileNotFoundError:
+                        pass
+
+
+def _start_cprofile():
+    """Run the current request under cProfile (g.profiler) unless another request is; True if started"""
+    if not _cprofile_lock.acquire(blocking=False):
+        return False
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler (not ours) is active in this interpreter
+        _cprofile_lock.release()
+        return False
+    g.profiler = profiler
+    return True
+
+
+def _stop_cprofile(profiler):
+    try:
+        profiler.disable()
+    finally:
+        _cprofile_lock.release()
+
+
+def init_profiling(app):
+    """Register the profiling request hooks if PROFILE_SLOW_MS or PROFILE_SAMPLE_RATE is set"""
+    profiler = RequestProfiler(
+        directory=os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'profiles')),
+        slow_ms=float(os.getenv('PROFILE_SLOW_MS', 0)),
+        sample_rate=int(os.getenv('PROFILE_SAMPLE_RATE', 0)),
+        max_files=int(os.getenv('PROFILE_MAX_FILES', 200)),
+        interval_ms=float(os.getenv('PROFILE_INTERVAL_MS', 10))
+    )
+    if not profiler.enabled:
+        return None
+
+    @app.before_request
+    def _start_profile():
+        profiler.start()
+
+    @app.after_request
+    def _finish_profile(response):
+        profiler.finish(response)
+        return response
+
+    @app.teardown_request
+    def _abort_profile(error=None):
+        profiler.abort()
+
+    app.extensions['request_profiler'] = profiler
+    return profiler
@@ -0,0 +1,57 @@
+# Named projections for complaint endpoints.
+#
+# List views only render a handful of columns, so they ask MongoDB for just
+# those fields instead of whole documents; the unbounded comments array,
+# detectedObjects and full descriptions are never read off the wire.
+
+# Complaint fields a client may request with ?fields=
+COMPLAINT_FIELDS = frozenset([
+    'subject', 'description', 'category', 'subcategory', 'subcategoryName', 'problem',
+    'status', 'priority', 'user_id', 'user', 'assigned_to',
+    'createdAt', 'updatedAt', 'assignedAt', 'inProgressAt', 'resolvedAt', 'escalatedAt', 'lastViewedAt',
+    'comments', 'imageUrl', 'detectedObjects', 'resolution', 'notes'
+])
+
+DESCRIPTION_PREVIEW_LENGTH = 200
+
+COMPLAINT_VIEWS = {
+    # Table/card columns; description is cut to a preview by the server
+    'summary': {
+        'subject': 1,
+        'description': {'$substrCP': ['$description', 0, DESCRIPTION_PREVIEW_LENGTH]},
+        'category': 1,
+        'subcategoryName': 1,
+        'status': 1,
+        'priority': 1,
+        'user_id': 1,
+        'user': 1,
+        'assigned_to': 1,
+        'createdAt': 1,
+        'updatedAt': 1,
+        'resolvedAt': 1,
+        'escalatedAt': 1
+    },
+    # Whole document
+    'detail': None
+}
+
+
+def complaint_projection(args, default_view='summary'):
+    """
+    Projection for a complaint query from the request's query string.
+
+    ``fields`` (comma separated, checked against COMPLAINT_FIELDS) takes
+    precedence over ``view`` (a COMPLAINT_VIEWS name). Raises ValueError for
+    unknown names.
+    """
+    fields = [name.strip() for name in args.get('fields', '').split(',') if name.strip()]
+    if fields:
+        unknown = sorted(set(fields) - COMPLAINT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return {name: 1 for name in fields}
+
+    view = args.get('view', default_view)
+    if view not in COMPLAINT_VIEWS:
+        raise ValueError(f"view must be one of: {', '.join(COMPLAINT_VIEWS)}")
+    return COMPLAINT_VIEWS[view]
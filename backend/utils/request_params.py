@@ -0,0 +1,10 @@
+from flask import request
+
+# Request flags read by more than one blueprint.
+
+
+def dry_run_requested(data=None):
+    """True for ?dry_run=1 or {"dry_run": true} in the JSON body"""
+    if request.args.get('dry_run', '').lower() in ('1', 'true'):
+        return True
+    return bool((data or {}).get('dry_run'))
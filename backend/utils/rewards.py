@@ -138,6 +138,32 @@ def award_points(user_id, action_type, complaint_id=None):
     finally:
         print(f"Awarded {points} points to user {user_id} for action {action_type}")
 
+def format_reward(reward):
+    formatted_reward = {
+        'id': reward['_id'],
+        'points': reward['points'],
+        'action_type': reward['action_type'],
+        'description': reward['description'],
+        'timestamp': reward['timestamp']
+    }
+    
+    if reward.get('complaint_id'):
+        formatted_reward['complaint_id'] = reward['complaint_id']
+    
+    return formatted_reward
+
+def reward_history_cursor(user_id):
+    """
+    Cursor over a user's rewards, newest first
+    
+    Args:
+        user_id (str or ObjectId): The user's ID
+    """
+    db = current_app.config['db']
+    if isinstance(user_id, str):
+        user_id = ObjectId(user_id)
+    return db.rewards.find({'user_id': user_id}).sort('timestamp', -1)
+
 def get_user_rewards(user_id):
     """
     Get a user's reward history and total points
@@ -160,24 +186,8 @@ def get_user_rewards(user_id):
         if not user:
             return {'error': 'User not found'}
         
-        # Get reward history
-        rewards = list(db.rewards.find({'user_id': user_id}).sort('timestamp', -1))
-        
-        # Format rewards for response
-        formatted_rewards = []
-        for reward in rewards:
-            formatted_reward = {
-                'id': str(reward['_id']),
-                'points': reward['points'],
-                'action_type': reward['action_type'],
-                'description': reward['description'],
-                'timestamp': reward['timestamp'].isoformat()
-            }
-            
-            if reward.get('complaint_id'):
-                formatted_reward['complaint_id'] = str(reward['complaint_id'])
-            
-            formatted_rewards.append(formatted_reward)
+        # Get reward history, formatted for response
+        formatted_rewards = [format_reward(reward) for reward in reward_history_cursor(user_id)]
         
         return {
             'total_points': user.get('reward_points', 0),
@@ -0,0 +1,272 @@
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import UpdateOne
+
+# Daily complaint rollups for dashboard timelines and resolution analytics.
+#
+# stats_daily holds one document per (UTC day, category, priority) with the
+# complaints created, resolved and escalated that day, the sum and count of
+# their resolution hours (createdAt -> resolvedAt) and a histogram of those
+# hours. A complaint contributes to the bucket of its createdAt day, and,
+# once resolved or escalated, to the buckets of its resolvedAt/escalatedAt
+# days. Writes apply the difference between a complaint's contributions
+# before and after the change (see utils/stats_counters.record_complaint_changes),
+# so category/priority edits, reopenings and deletions move or remove counts
+# exactly. backfill_rollups() recounts everything from the complaints
+# collection and $incs the buckets by what they were off, so it can run
+# while complaints are being written; it is run by backfill_rollups.py and
+# the scheduler, never in a request, and until it has run once the
+# dashboard ranges are empty.
+#
+# A date-range query reads at most days x categories x priorities small
+# documents through the day index and never touches complaints.
+
+# Upper bounds (hours) of the resolution latency histogram buckets; the
+# last bucket counts everything slower
+LATENCY_BUCKETS = (1, 4, 24, 72, 168)
+LATENCY_KEYS = tuple(f'h{bound}' for bound in LATENCY_BUCKETS) + ('slower',)
+
+ROLLUP_FIELDS = ('created', 'resolved', 'escalated', 'resolutionHours', 'resolutionCount') + \
+    tuple(f'latency.{key}' for key in LATENCY_KEYS)
+
+DAY_FORMAT = '%Y-%m-%d'
+
+MAX_RANGE_DAYS = 366
+
+# stats_counters document recording the last completed backfill
+BACKFILL_STATE_ID = 'rollups'
+
+
+def _day(value):
+    return value.strftime(DAY_FORMAT) if isinstance(value, datetime) else None
+
+
+def _bucket(day, complaint):
+    category = complaint.get('category') or 'null'
+    priority = complaint.get('priority') or 'null'
+    return (day, str(category), str(priority))
+
+
+def _bucket_id(bucket):
+    return '|'.join(bucket)
+
+
+def resolution_hours(complaint):
+    """Hours from createdAt to resolvedAt for a resolved complaint, else None"""
+    if complaint.get('status') != 'resolved':
+        return None
+    created_at, resolved_at = complaint.get('createdAt'), complaint.get('resolvedAt')
+    if not isinstance(created_at, datetime) or not isinstance(resolved_at, datetime):
+        return None
+    return (resolved_at - created_at).total_seconds() / 3600
+
+
+def latency_key(hours):
+    for bound, key in zip(LATENCY_BUCKETS, LATENCY_KEYS):
+        if hours < bound:
+            return key
+    return LATENCY_KEYS[-1]
+
+
+def rollup_contribution(complaint):
+    """{(day, category, priority): {field: n}} that one complaint in its current state accounts for"""
+    contribution = {}
+    if not complaint:
+        return contribution
+
+    def add(day, field, value=1):
+        if day is None:
+            return
+        fields = contribution.setdefault(_bucket(day, complaint), {})
+        fields[field] = fields.get(field, 0) + value
+
+    add(_day(complaint.get('createdAt')), 'created')
+    add(_day(complaint.get('escalatedAt')), 'escalated')
+
+    hours = resolution_hours(complaint)
+    if hours is not None:
+        resolved_day = _day(complaint['resolvedAt'])
+        add(resolved_day, 'resolved')
+        add(resolved_day, 'resolutionHours', hours)
+        add(resolved_day, 'resolutionCount')
+        add(resolved_day, f'latency.{latency_key(hours)}')
+    return contribution
+
+
+def _merge(total, contribution, sign):
+    for bucket, fields in contribution.items():
+        target = total.setdefault(bucket, {})
+        for field, value in fields.items():
+            target[field] = target.get(field, 0) + sign * value
+
+
+def rollup_updates(changes):
+    """UpdateOne upserts applying the rollup difference of (before, after) complaint pairs"""
+    total = {}
+    for before, after in changes:
+        _merge(total, rollup_contribution(after), 1)
+        _merge(total, rollup_contribution(before), -1)
+
+    now = datetime.utcnow()
+    updates = []
+    for bucket, fields in total.items():
+        inc = {field: value for field, value in fields.items() if value}
+        if not inc:
+            continue
+        day, category, priority = bucket
+        updates.append(UpdateOne(
+            {'_id': _bucket_id(bucket)},
+            {'$inc': inc, '$set': {'updatedAt': now},
+             '$setOnInsert': {'day': day, 'category': category, 'priority': priority}},
+            upsert=True
+        ))
+    return updates
+
+
+def _flat_bucket(document):
+    """{field: value} of a stats_daily document, latency fields dotted as in ROLLUP_FIELDS"""
+    fields = {}
+    for field in ROLLUP_FIELDS:
+        group, _, key = field.partition('.')
+        value = (document.get(group) or {}).get(key) if key else document.get(field)
+        if value:
+            fields[field] = value
+    return fields
+
+
+def backfill_rollups(db, batch_size=1000):
+    """
+    Correct stats_daily from the complaints collection.
+
+    The stored buckets are read first, then complaints are scanned in
+    batches with only the fields the rollups need and their buckets
+    accumulated in memory (one entry per day/category/priority). The
+    difference between the two is applied with $inc, the same way complaint
+    writes update the rollups, so writes made while the scan runs are kept
+    rather than overwritten. A complaint written during the scan is counted
+    once if the scan read it before the write; if the scan read it after,
+    its change is counted twice until the next run corrects it. Buckets left
+    at zero are removed (only while still zero). Returns the number of
+    complaints and buckets.
+    """
+    backfill_id = ObjectId()
+    started = datetime.utcnow()
+    stored = {}
+    for document in db.stats_daily.find({}):
+        bucket = (document.get('day'), document.get('category'), document.get('priority'))
+        if None not in bucket:
+            stored[bucket] = _flat_bucket(document)
+
+    totals = {}
+    scanned = 0
+    cursor = db.complaints.find({}, {
+        'status': 1, 'category': 1, 'priority': 1,
+        'createdAt': 1, 'resolvedAt': 1, 'escalatedAt': 1
+    }).batch_size(batch_size)
+    for complaint in cursor:
+        _merge(totals, rollup_contribution(complaint), 1)
+        scanned += 1
+
+    correction = {}
+    _merge(correction, totals, 1)
+    _merge(correction, stored, -1)
+    requests = []
+    emptied = []
+    for bucket, fields in correction.items():
+        inc = {field: value for field, value in fields.items() if value}
+        if bucket not in totals:
+            emptied.append(_bucket_id(bucket))
+        if not inc:
+            continue
+        day, category, priority = bucket
+        requests.append(UpdateOne(
+            {'_id': _bucket_id(bucket)},
+            {'$inc': inc, '$set': {'updatedAt': started},
+             '$setOnInsert': {'day': day, 'category': category, 'priority': priority}},
+            upsert=True
+        ))
+
+    for start in range(0, len(requests), batch_size):
+        db.stats_daily.bulk_write(requests[start:start + batch_size], ordered=False)
+    # Counts only; resolutionHours may keep a float remainder
+    zero = {field: {'$in': [0, None]} for field in ROLLUP_FIELDS if field != 'resolutionHours'}
+    for start in range(0, len(emptied), batch_size):
+        db.stats_daily.delete_many(dict(zero, _id={'$in': emptied[start:start + batch_size]}))
+    db.stats_counters.replace_one(
+        {'_id': BACKFILL_STATE_ID},
+        {'backfillId': backfill_id, 'backfilledAt': started, 'complaints': scanned,
+         'buckets': len(totals), 'corrected': len(requests)},
+        upsert=True
+    )
+    print(f"[{datetime.now()}] Corrected {len(requests)} of {len(totals)} daily rollups from {scanned} complaints")
+    return {'complaints': scanned, 'buckets': len(totals), 'corrected': len(requests)}
+
+
+def rollups_backfilled(db):
+    """Whether backfill_rollups has completed at least once"""
+    return db.stats_counters.find_one({'_id': BACKFILL_STATE_ID}, {'_id': 1}) is not None
+
+
+def parse_range_days(value, default=30):
+    """Range length in days from a query-string value, clamped to 1..MAX_RANGE_DAYS"""
+    if value in (None, ''):
+        return default
+    try:
+        return max(1, min(int(value), MAX_RANGE_DAYS))
+    except ValueError:
+        raise ValueError('days must be an integer')
+
+
+def range_stats(db, days, now=None):
+    """
+    Per-day timeline and range totals for the last ``days`` days (today
+    included), from the rollups. All zero (backfilled False) until the
+    first backfill has run.
+    """
+    now = now or datetime.utcnow()
+    start = _day(now - timedelta(days=days - 1))
+    if not rollups_backfilled(db):
+        # Incremental updates alone would give partial (even negative) numbers
+        return {
+            'days': days, 'from': start, 'timeline': [], 'backfilled': False,
+            'created': 0, 'resolved': 0, 'escalated': 0, 'avgResolutionTime': 0,
+            'resolutionHistogram': {key: 0 for key in LATENCY_KEYS}
+        }
+    totals_group = {'_id': None}
+    for field in ROLLUP_FIELDS:
+        totals_group[field.replace('.', '_')] = {'$sum': f'${field}'}
+
+    result = next(db.stats_daily.aggregate([
+        {'$match': {'day': {'$gte': start}}},
+        {'$facet': {
+            'timeline': [
+                {'$group': {
+                    '_id': '$day',
+                    'created': {'$sum': '$created'},
+                    'resolved': {'$sum': '$resolved'},
+                    'escalated': {'$sum': '$escalated'}
+                }},
+                {'$sort': {'_id': 1}}
+            ],
+            'totals': [{'$group': totals_group}]
+        }}
+    ]), None) or {}
+
+    timeline = [
+        {'date': row['_id'], 'count': row['created'], 'resolved': row['resolved'], 'escalated': row['escalated']}
+        for row in result.get('timeline', [])
+        if row['created'] or row['resolved'] or row['escalated']
+    ]
+    totals = (result.get('totals') or [{}])[0]
+    resolved_count = totals.get('resolutionCount', 0)
+    return {
+        'days': days,
+        'from': start,
+        'timeline': timeline,
+        'backfilled': True,
+        'created': totals.get('created', 0),
+        'resolved': totals.get('resolved', 0),
+        'escalated': totals.get('escalated', 0),
+        'avgResolutionTime': round(totals.get('resolutionHours', 0) / resolved_count, 2) if resolved_count else 0,
+        'resolutionHistogram': {key: totals.get(f'latency_{key}', 0) for key in LATENCY_KEYS}
+    }
@@ -0,0 +1,100 @@
+from bson import ObjectId
+
+# Dashboard statistics computed in MongoDB.
+#
+# Each dashboard asks for its numbers with one aggregation: a $group on
+# status gives every status count (and the total) in a single pass, and
+# $facet runs the worker dashboard's differently-filtered parts (its own
+# complaints, the unassigned pool, resolution times) over one $match.
+
+# Complaint status -> response key
+STATUS_KEYS = {
+    'pending': 'pending',
+    'in-progress': 'inProgress',
+    'resolved': 'resolved',
+    'escalated': 'escalated'
+}
+
+MS_PER_HOUR = 3600 * 1000
+
+
+def _as_object_id(user_id):
+    return user_id if isinstance(user_id, ObjectId) else ObjectId(user_id)
+
+
+def _status_group():
+    return {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+
+
+def _status_counts(rows):
+    """{'total': n, 'pending': n, 'inProgress': n, ...} from $group-by-status rows"""
+    counts = {'total': 0}
+    counts.update({key: 0 for key in STATUS_KEYS.values()})
+    for row in rows:
+        counts['total'] += row['count']
+        key = STATUS_KEYS.get(row['_id'])
+        if key:
+            counts[key] += row['count']
+    return counts
+
+
+def user_complaint_stats(db, user_id):
+    """Complaint counts by status for one submitter"""
+    rows = db.complaints.aggregate([
+        {'$match': {'user_id': _as_object_id(user_id)}},
+        _status_group()
+    ])
+    return _status_counts(rows)
+
+
+def user_complaint_count(db, user_id):
+    """Number of complaints one submitter has filed"""
+    return db.complaints.count_documents({'user_id': _as_object_id(user_id)})
+
+
+def worker_complaint_stats(db, worker_id):
+    """
+    Worker dashboard numbers: counts of the worker's complaints by status,
+    unassigned pending complaints available to claim, and the average hours
+    from assignedAt to resolvedAt over the worker's resolved complaints.
+    """
+    worker_id = _as_object_id(worker_id)
+    available = {'assigned_to': None, 'status': 'pending'}
+    result = next(db.complaints.aggregate([
+        {'$match': {'$or': [{'assigned_to': worker_id}, available]}},
+        {'$facet': {
+            'byStatus': [
+                {'$match': {'assigned_to': worker_id}},
+                _status_group()
+            ],
+            'available': [
+                {'$match': available},
+                {'$count': 'count'}
+            ],
+            'resolution': [
+                {'$match': {
+                    'assigned_to': worker_id,
+                    'status': 'resolved',
+                    'assignedAt': {'$exists': True},
+                    'resolvedAt': {'$exists': True}
+                }},
+                {'$group': {
+                    '_id': None,
+                    'avgHours': {'$avg': {'$divide': [{'$subtract': ['$resolvedAt', '$assignedAt']}, MS_PER_HOUR]}}
+                }}
+            ]
+        }}
+    ]), None) or {}
+
+    counts = _status_counts(result.get('byStatus', []))
+    available_rows = result.get('available', [])
+    resolution_rows = result.get('resolution', [])
+    avg_hours = resolution_rows[0]['avgHours'] if resolution_rows else None
+    return {
+        'assigned': counts['total'],
+        'pending': counts['pending'],
+        'inProgress': counts['inProgress'],
+        'resolved': counts['resolved'],
+        'available': available_rows[0]['count'] if available_rows else 0,
+        'avgResolutionTime': round(avg_hours, 2) if avg_hours is not None else 0
+    }
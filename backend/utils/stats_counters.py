@@ -0,0 +1,189 @@
+from datetime import datetime
+from utils.rollups import resolution_hours, rollup_updates
+
+# Incrementally maintained complaint counters for the admin dashboard.
+#
+# One document in stats_counters holds the totals /api/admin/stats reports:
+# complaint count, counts by status and by category, and the count and sum
+# of resolution hours behind the average resolution time. Every lifecycle
+# write passes the complaint before and after the write to
+# record_complaint_changes() (through utils/complaint_writes.py), and the
+# difference is applied with a single atomic $inc, so the dashboard reads
+# one document instead of scanning complaints. The same call keeps the
+# daily rollups in stats_daily current (see utils/rollups.py).
+#
+# The $inc is not in a transaction with the complaint write, so concurrent
+# updates of the same complaint or a crash between the two writes can leave
+# the counters off. reconcile_counters() recomputes them from the complaints
+# collection, reports any drift and overwrites the document; the scheduler
+# runs it daily together with backfill_rollups().
+
+COUNTERS_ID = 'complaints'
+
+MS_PER_HOUR = 3600 * 1000
+
+# Float sums of resolution hours are compared with this tolerance
+HOURS_TOLERANCE = 1e-6
+
+
+def _field_key(value):
+    """Map a status/category value to a safe field name ('.' and a leading '$' are not allowed)"""
+    key = 'null' if value is None else str(value)
+    key = key.replace('.', '．')
+    if key.startswith('$'):
+        key = '＄' + key[1:]
+    return key or 'null'
+
+
+def _field_value(key):
+    key = key.replace('．', '.')
+    if key.startswith('＄'):
+        key = '$' + key[1:]
+    return key
+
+
+def complaint_contribution(complaint):
+    """The counter increments one complaint in its current state accounts for"""
+    if not complaint:
+        return {}
+    contribution = {
+        'total': 1,
+        f"status.{_field_key(complaint.get('status'))}": 1,
+        f"category.{_field_key(complaint.get('category'))}": 1
+    }
+    hours = resolution_hours(complaint)
+    if hours is not None:
+        contribution['resolution.count'] = 1
+        contribution['resolution.hours'] = hours
+    return contribution
+
+
+def _merge(inc, contribution, sign):
+    for path, value in contribution.items():
+        inc[path] = inc.get(path, 0) + sign * value
+
+
+def record_complaint_changes(db, changes):
+    """
+    Apply the counter difference of several complaint writes in one $inc.
+
+    ``changes`` is an iterable of (before, after) pairs; before is None for
+    a created complaint and after is None for a deleted one.
+    """
+    changes = list(changes)
+    inc = {}
+    for before, after in changes:
+        _merge(inc, complaint_contribution(after), 1)
+        _merge(inc, complaint_contribution(before), -1)
+    inc = {path: value for path, value in inc.items() if value}
+    # The complaint write already happened; on failure the next
+    # reconciliation fixes the counters and rollups
+    if inc:
+        try:
+            db.stats_counters.update_one({'_id': COUNTERS_ID}, {'$inc': inc}, upsert=True)
+        except Exception as e:
+            print(f"Failed to update stats counters: {e}")
+    updates = rollup_updates(changes)
+    if updates:
+        try:
+            db.stats_daily.bulk_write(updates, ordered=False)
+        except Exception as e:
+            print(f"Failed to update daily rollups: {e}")
+
+
+def record_complaint_change(db, before, after):
+    record_complaint_changes(db, [(before, after)])
+
+
+def compute_counters(db):
+    """Counters recomputed from the complaints collection in one aggregation"""
+    result = next(db.complaints.aggregate([
+        {'$facet': {
+            'status': [{'$group': {'_id': '$status', 'count': {'$sum': 1}}}],
+            'category': [{'$group': {'_id': '$category', 'count': {'$sum': 1}}}],
+            'resolution': [
+                {'$match': {'status': 'resolved', 'createdAt': {'$type': 'date'}, 'resolvedAt': {'$type': 'date'}}},
+                {'$group': {
+                    '_id': None,
+                    'count': {'$sum': 1},
+                    'hours': {'$sum': {'$divide': [{'$subtract': ['$resolvedAt', '$createdAt']}, MS_PER_HOUR]}}
+                }}
+            ]
+        }}
+    ]), None) or {}
+
+    resolution = (result.get('resolution') or [{}])[0]
+    return {
+        'total': sum(row['count'] for row in result.get('status', [])),
+        'status': {_field_key(row['_id']): row['count'] for row in result.get('status', [])},
+        'category': {_field_key(row['_id']): row['count'] for row in result.get('category', [])},
+        'resolution': {'count': resolution.get('count', 0), 'hours': resolution.get('hours', 0)}
+    }
+
+
+def _flatten(counters):
+    flat = {'total': counters.get('total', 0)}
+    for group in ('status', 'category', 'resolution'):
+        for key, value in (counters.get(group) or {}).items():
+            flat[f'{group}.{key}'] = value
+    return flat
+
+
+def counters_drift(stored, actual):
+    """{path: {'stored': n, 'actual': n}} for every counter that differs"""
+    stored_flat, actual_flat = _flatten(stored or {}), _flatten(actual)
+    drift = {}
+    for path in sorted(set(stored_flat) | set(actual_flat)):
+        stored_value, actual_value = stored_flat.get(path, 0), actual_flat.get(path, 0)
+        tolerance = HOURS_TOLERANCE if path == 'resolution.hours' else 0
+        if abs(stored_value - actual_value) > tolerance:
+            drift[path] = {'stored': stored_value, 'actual': actual_value}
+    return drift
+
+
+def reconcile_counters(db):
+    """
+    Recompute the counters from scratch, replace the stored document and
+    return a report of the drift that was corrected.
+    """
+    started = datetime.utcnow()
+    stored = db.stats_counters.find_one({'_id': COUNTERS_ID})
+    actual = compute_counters(db)
+    drift = counters_drift(stored, actual)
+    db.stats_counters.replace_one(
+        {'_id': COUNTERS_ID},
+        dict(actual, reconciledAt=started),
+        upsert=True
+    )
+    if drift:
+        print(f"[{datetime.now()}] Stats counters drifted on {len(drift)} fields: {drift}")
+    return {'drift': drift, 'missing': stored is None, 'reconciledAt': started}
+
+
+def read_counters(db):
+    """
+    The admin dashboard numbers from the counters document, which is built
+    on first use. The daily rollups are not: they are left to
+    backfill_rollups.py and the scheduler.
+    """
+    counters = db.stats_counters.find_one({'_id': COUNTERS_ID})
+    if counters is None:
+        reconcile_counters(db)
+        counters = db.stats_counters.find_one({'_id': COUNTERS_ID}) or {}
+
+    status = {_field_value(key): count for key, count in (counters.get('status') or {}).items()}
+    resolution = counters.get('resolution') or {}
+    resolved_count = resolution.get('count', 0)
+    return {
+        'statusCounts': {
+            'total': counters.get('total', 0),
+            'pending': status.get('pending', 0),
+            'inProgress': status.get('in-progress', 0),
+            'resolved': status.get('resolved', 0),
+            'escalated': status.get('escalated', 0)
+        },
+        'categoryCounts': {
+            _field_value(key): count for key, count in (counters.get('category') or {}).items() if count
+        },
+        'avgResolutionTime': round(resolution.get('hours', 0) / resolved_count, 2) if resolved_count else 0
+    }
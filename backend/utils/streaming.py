@@ -0,0 +1,75 @@
+import os
+from flask import current_app, request, stream_with_context
+
+# Streamed list responses.
+#
+# Instead of list(cursor) -> formatted list -> jsonify, a streamed response
+# pulls the cursor in batches of STREAM_BATCH_SIZE, formats and serializes
+# one batch at a time and yields it, so memory stays bounded by the batch
+# size however large the result set is. The body is either NDJSON (one JSON
+# document per line) or a JSON array written in chunks.
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', 500))
+
+
+def wants_ndjson():
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def stream_requested():
+    """True for ``Accept: application/x-ndjson`` or ``?stream=1`` (chunked JSON array)"""
+    return wants_ndjson() or request.args.get('stream', '').lower() in ('1', 'true')
+
+
+def _batches(cursor, size):
+    batch = []
+    for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_response(cursor, transform=None, batch_size=None):
+    """
+    Stream the documents of a pymongo cursor as the response body.
+
+    ``transform`` receives each batch (a list of documents) and returns the
+    rows to send, which lets per-row formatting and batched lookups such as
+    utils.enrichment.enrich_complaints run once per batch. The body is
+    NDJSON if the client accepts it and a JSON array otherwise.
+    """
+    size = batch_size or STREAM_BATCH_SIZE
+    cursor = cursor.batch_size(size)
+    provider = current_app.json
+    ndjson = wants_ndjson()
+
+    def generate():
+        try:
+            first = True
+            if not ndjson:
+                yield b'['
+            for batch in _batches(cursor, size):
+                rows = transform(batch) if transform else batch
+                chunk = []
+                for row in rows:
+                    body = provider.dumps_bytes(row)
+                    if ndjson:
+                        chunk.append(body + b'\n')
+                    else:
+                        chunk.append(body if first else b',' + body)
+                        first = False
+                yield b''.join(chunk)
+            if not ndjson:
+                yield b']\n'
+        finally:
+            cursor.close()
+
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype=NDJSON_MIMETYPE if ndjson else 'application/json'
+    )
@@ -0,0 +1,76 @@
+import os
+import time
+import threading
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+
+
+class TokenVersionRegistry:
+    """
+    In-memory view of users whose ``token_version`` has been bumped.
+
+    Tokens carry the user's ``token_version`` in the ``ver`` claim. Bumping the
+    version in MongoDB revokes every token issued before the bump. Only users
+    with a non-zero version are tracked, so the set stays small. It is reloaded
+    from the database at most every ``refresh_interval`` seconds, which bounds
+    how long a revocation made by another process takes to apply here.
+    """
+
+    def __init__(self, refresh_interval=30):
+        self.refresh_interval = refresh_interval
+        self._versions = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def refresh(self, db):
+        """Reload the bumped versions from the users collection"""
+        versions = {
+            str(user['_id']): user['token_version']
+            for user in db.users.find({'token_version': {'$gt': 0}}, {'token_version': 1})
+        }
+        with self._lock:
+            self._versions = versions
+            self._loaded_at = time.monotonic()
+
+    def _refresh_if_stale(self, db):
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+            if stale:
+                # Claim the refresh so concurrent requests keep using the old set
+                self._loaded_at = time.monotonic()
+        if stale:
+            try:
+                self.refresh(db)
+            except Exception as e:
+                print(f"Error refreshing token versions: {str(e)}")
+
+    def current_version(self, db, user_id):
+        """Return the minimum token version accepted for ``user_id``"""
+        self._refresh_if_stale(db)
+        with self._lock:
+            return self._versions.get(str(user_id), 0)
+
+    def bump(self, db, user_id):
+        """Increment a user's token version, revoking their existing tokens"""
+        user = db.users.find_one_and_update(
+            {'_id': ObjectId(user_id)},
+            {'$inc': {'token_version': 1}},
+            projection={'token_version': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if user:
+            with self._lock:
+                self._versions[str(user['_id'])] = user['token_version']
+        return user['token_version'] if user else None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'revokedUsers': len(self._versions),
+                'refreshIntervalSeconds': self.refresh_interval
+            }
+
+
+token_versions = TokenVersionRegistry(
+    refresh_interval=float(os.getenv('TOKEN_VERSION_REFRESH_SECONDS', 30))
+)
@@ -138,8 +138,13 @@ export const AuthProvider = ({ children }) => {
 		return user && (user.is_worker === true || user.worker === true);
 	};
 
-	// Update user data after profile changes
+	// Update user data after profile changes. A name or password change
+	// revokes the old token and the response carries its replacement.
 	const updateUser = (userData) => {
+		if (userData.token) {
+			localStorage.setItem('token', userData.token);
+			axios.defaults.headers.common['Authorization'] = `Bearer ${userData.token}`;
+		}
 		setUser(prevUser => ({
 			...prevUser,
 			name: userData.name,
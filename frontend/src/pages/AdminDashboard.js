@@ -106,8 +106,7 @@ const AdminDashboard = () => {
 			try {
 				await axios.delete(`/api/admin/complaints/${complaintId}`);
 				toast.success('Complaint deleted successfully!');
-				const complaintsResponse = await axios.get('/api/admin/complaints');
-				setComplaints(complaintsResponse.data);
+				await fetchComplaints();
 			} catch (error) {
 				console.error('Error deleting complaint:', error);
 				toast.error('Failed to delete complaint');
@@ -116,6 +115,8 @@ const AdminDashboard = () => {
 	};
 
 	const [complaints, setComplaints] = useState([]);
+	const [nextCursor, setNextCursor] = useState(null);
+	const [loadingMore, setLoadingMore] = useState(false);
 	const [stats, setStats] = useState({ total: 0, pending: 0, inProgress: 0, resolved: 0, escalated: 0, userCount: 0, avgResolutionTime: 0 });
 	const [categoryStats, setCategoryStats] = useState({});
 	// const [timelineStats, setTimelineStats] = useState([]);
@@ -129,11 +130,41 @@ const AdminDashboard = () => {
 	const [sortBy, setSortBy] = useState('createdAt');
 	const [sortOrder, setSortOrder] = useState('desc');
 
+	// The complaint list is paginated, filtered and ordered by creation date
+	// server-side: fetch the first page, or append the page after `cursor`
+	const fetchComplaints = async (cursor = null) => {
+		const params = { order: sortBy === 'createdAt' ? sortOrder : 'desc' };
+		if (filterStatus !== 'all') params.status = filterStatus;
+		if (filterPriority !== 'all') params.priority = filterPriority;
+		if (cursor) params.cursor = cursor;
+		const response = await axios.get('/api/admin/complaints', { params });
+		setComplaints(prev => (cursor ? [...prev, ...response.data.complaints] : response.data.complaints));
+		setNextCursor(response.data.next_cursor);
+	};
+
+	const handleLoadMore = async () => {
+		setLoadingMore(true);
+		try {
+			await fetchComplaints(nextCursor);
+		} catch (error) {
+			console.error('Error loading more complaints:', error);
+			toast.error('Failed to load more complaints');
+		} finally {
+			setLoadingMore(false);
+		}
+	};
+
+	// A filter or order change starts again from the first page
+	useEffect(() => {
+		fetchComplaints().catch(error => {
+			console.error('Error fetching complaints:', error);
+			toast.error('Failed to load complaints');
+		});
+	}, [filterStatus, filterPriority, sortBy, sortOrder]); // eslint-disable-line react-hooks/exhaustive-deps
+
 	useEffect(() => {
 		const fetchData = async () => {
 			try {
-				const complaintsResponse = await axios.get('/api/admin/complaints');
-				setComplaints(complaintsResponse.data);
 				const statsResponse = await axios.get('/api/admin/stats');
 				setStats({ ...statsResponse.data.statusCounts, userCount: statsResponse.data.userCount, avgResolutionTime: statsResponse.data.avgResolutionTime });
 				setCategoryStats(statsResponse.data.categoryCounts);
@@ -146,7 +177,7 @@ const AdminDashboard = () => {
 			}
 		};
 		fetchData();
-	}, []);
+	}, []); // eslint-disable-line react-hooks/exhaustive-deps
 
 	// Manual escalation check
 	const handleEscalationCheck = async () => {
@@ -155,8 +186,7 @@ const AdminDashboard = () => {
 			// Use the correct endpoint from the backend
 			const response = await axios.get('/api/complaint_updates/check-escalations');
 			toast.success(response.data.message || 'Escalation check completed');
-			const complaintsResponse = await axios.get('/api/admin/complaints');
-			setComplaints(complaintsResponse.data);
+			await fetchComplaints();
 			const statsResponse = await axios.get('/api/admin/stats');
 			setStats({ ...statsResponse.data.statusCounts, userCount: statsResponse.data.userCount, avgResolutionTime: statsResponse.data.avgResolutionTime });
 			setCategoryStats(statsResponse.data.categoryCounts);
@@ -184,23 +214,20 @@ const AdminDashboard = () => {
 
 	// const closeEscalationModal = () => setShowEscalationModal(false);
 
-	// Filter/sort
+	// Status, priority and creation-date order are applied by the server;
+	// search and the priority sort only cover the pages loaded so far
 	const filteredComplaints = complaints
 		.filter(complaint => {
-			const matchesSearch =
+			return (
 				searchTerm === '' ||
 				complaint._id.toLowerCase().includes(searchTerm.toLowerCase()) ||
 				complaint.subject.toLowerCase().includes(searchTerm.toLowerCase()) ||
-				complaint.user?.name.toLowerCase().includes(searchTerm.toLowerCase());
-			const matchesStatus = filterStatus === 'all' || complaint.status === filterStatus;
-			const matchesPriority = filterPriority === 'all' || complaint.priority === filterPriority;
-			return matchesSearch && matchesStatus && matchesPriority;
+				complaint.user?.name.toLowerCase().includes(searchTerm.toLowerCase())
+			);
 		})
 		.sort((a, b) => {
-			if (sortBy === 'createdAt') {
-				return sortOrder === 'desc' ? new Date(b.createdAt) - new Date(a.createdAt) : new Date(a.createdAt) - new Date(b.createdAt);
-			} else if (sortBy === 'priority') {
-				const priorityOrder = { high: 3, medium: 2, low: 1 };
+			if (sortBy === 'priority') {
+				const priorityOrder = { urgent: 4, high: 3, medium: 2, low: 1 };
 				return sortOrder === 'desc' ? priorityOrder[b.priority] - priorityOrder[a.priority] : priorityOrder[a.priority] - priorityOrder[b.priority];
 			}
 			return 0;
@@ -307,7 +334,7 @@ const AdminDashboard = () => {
 					<h2 className="text-lg font-semibold">All Complaints</h2>
 					<div className="mt-4 flex flex-col md:flex-row gap-4">
 						<div className="flex-1">
-							<input type="text" placeholder="Search by ID, subject, or user..." className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-primary-500" value={searchTerm} onChange={e => setSearchTerm(e.target.value)} />
+							<input type="text" placeholder="Search loaded complaints by ID, subject, or user..." className="w-full px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-primary-500" value={searchTerm} onChange={e => setSearchTerm(e.target.value)} />
 						</div>
 						<div className="flex gap-2">
 							<select className="px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-primary-500" value={filterStatus} onChange={e => setFilterStatus(e.target.value)}>
@@ -327,8 +354,8 @@ const AdminDashboard = () => {
 							<select className="px-3 py-2 border border-gray-300 rounded-md focus:outline-none focus:ring-2 focus:ring-primary-500" value={`${sortBy}-${sortOrder}`} onChange={e => { const [newSortBy, newSortOrder] = e.target.value.split('-'); setSortBy(newSortBy); setSortOrder(newSortOrder); }}>
 								<option value="createdAt-desc">Newest First</option>
 								<option value="createdAt-asc">Oldest First</option>
-								<option value="priority-desc">Highest Priority</option>
-								<option value="priority-asc">Lowest Priority</option>
+								<option value="priority-desc">Highest Priority (loaded rows)</option>
+								<option value="priority-asc">Lowest Priority (loaded rows)</option>
 							</select>
 						</div>
 					</div>
@@ -376,6 +403,13 @@ const AdminDashboard = () => {
 						</tbody>
 					</table>
 				</div>
+				{nextCursor && (
+					<div className="px-6 py-4 text-center border-t border-gray-200">
+						<button onClick={handleLoadMore} disabled={loadingMore} className="text-sm font-medium text-primary-600 hover:text-primary-800 disabled:opacity-50">
+							{loadingMore ? 'Loading...' : 'Load more complaints'}
+						</button>
+					</div>
+				)}
 			</div>
 		</div>
 	);